@@ -0,0 +1,233 @@
+"""Сборка статики: имена с хэшем содержимого, сжатые копии и манифест.
+
+    python assets.py [--src static] [--out build/static]
+
+Каждый файл из static/ копируется как name.<хэш>.ext, рядом — .br и .gz
+(для текстовых типов, если копия меньше оригинала), для PNG — ещё WebP.
+manifest.json связывает исходный путь с собранным; шаблоны берут URL через
+static() в Jinja, а AssetFiles отдаёт собранные файлы с immutable-кэшем и
+сжатой копией по Accept-Encoding. Без сборки всё работает по исходным путям.
+"""
+
+import argparse
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+import stat
+from typing import Optional
+
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+from settings import BASE_DIR, Settings
+
+try:
+    import brotli
+except ImportError:  # Без brotli собираются только .gz
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:  # Без Pillow WebP не собирается, страница берёт PNG
+    Image = None
+
+
+MANIFEST = "manifest.json"
+COMPRESSIBLE = (".css", ".js", ".svg", ".json", ".txt", ".html")
+# Расширение сжатой копии → Content-Encoding; порядок — предпочтение сервера
+ENCODINGS = {".br": "br", ".gz": "gzip"}
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(path: str, digest: str, ext: Optional[str] = None) -> str:
+    root, original_ext = os.path.splitext(path)
+    return f"{root}.{digest}{ext or original_ext}"
+
+
+def write(out_dir: str, path: str, data: bytes) -> None:
+    target = os.path.join(out_dir, path)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    with open(target, "wb") as f:
+        f.write(data)
+
+
+def compress(out_dir: str, path: str, data: bytes) -> list[str]:
+    # Сжатые копии рядом с файлом; бессмысленные (не меньше оригинала) не пишутся
+    variants = {".gz": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants[".br"] = brotli.compress(data, quality=11)
+    written = []
+    for ext, packed in variants.items():
+        if len(packed) < len(data):
+            write(out_dir, path + ext, packed)
+            written.append(ENCODINGS[ext])
+    return written
+
+
+def to_webp(source: str) -> Optional[bytes]:
+    if Image is None:
+        return None
+    out = io.BytesIO()
+    with Image.open(source) as image:
+        image.save(out, "WEBP", quality=80, method=6)
+    return out.getvalue()
+
+
+def build(src_dir: str, out_dir: str) -> dict:
+    """Собрать static/ в out_dir; возвращает манифест (он же manifest.json)."""
+    shutil.rmtree(out_dir, ignore_errors=True)
+    files = {}
+    for root, _, names in os.walk(src_dir):
+        for name in sorted(names):
+            source = os.path.join(root, name)
+            path = os.path.relpath(source, src_dir).replace(os.sep, "/")
+            with open(source, "rb") as f:
+                data = f.read()
+
+            entry = {"path": hashed_name(path, fingerprint(data))}
+            write(out_dir, entry["path"], data)
+            if path.endswith(COMPRESSIBLE):
+                entry["encodings"] = compress(out_dir, entry["path"], data)
+            if path.endswith(".png"):
+                webp = to_webp(source)
+                if webp is not None and len(webp) < len(data):
+                    entry["webp"] = hashed_name(path, fingerprint(webp), ".webp")
+                    write(out_dir, entry["webp"], webp)
+            files[path] = entry
+
+    manifest = {"files": files}
+    write(out_dir, MANIFEST, json.dumps(manifest, ensure_ascii=False, indent=2).encode())
+    return manifest
+
+
+class Assets:
+    """URL статики по манифесту сборки; без сборки — исходные пути."""
+
+    def __init__(self, out_dir: str, prefix: str = "/static/"):
+        self.prefix = prefix
+        try:
+            with open(os.path.join(out_dir, MANIFEST)) as f:
+                self.files: dict[str, dict] = json.load(f)["files"]
+        except FileNotFoundError:
+            self.files = {}
+        # Собранный путь → сжатые копии; по нему же узнаём immutable-файлы
+        self.built: dict[str, list[str]] = {}
+        for entry in self.files.values():
+            self.built[entry["path"]] = entry.get("encodings", [])
+            if "webp" in entry:
+                self.built[entry["webp"]] = []
+
+    def url(self, path: str, variant: Optional[str] = None) -> Optional[str]:
+        # static("style.css") в шаблоне; variant="webp" — None, если такой копии нет
+        entry = self.files.get(path)
+        if variant is not None:
+            return self.prefix + entry[variant] if entry and variant in entry else None
+        return self.prefix + (entry["path"] if entry else path)
+
+
+class AssetFiles(StaticFiles):
+    """StaticFiles поверх собранной статики с запасным каталогом исходников.
+
+    Собранные файлы (имя с хэшем) отдаются с Cache-Control: immutable и,
+    если клиент принимает, сжатой копией (.br/.gz) с Content-Encoding;
+    остальные — как обычно, с обязательной перепроверкой по ETag.
+    """
+
+    def __init__(self, assets: Assets, directory: str, fallback: str):
+        self.assets = assets
+        self.fallback = fallback
+        super().__init__(directory=directory, check_dir=False)
+
+    def get_directories(self, directory=None, packages=None) -> list:
+        # Сначала сборка (если она есть), затем исходный static/
+        return [d for d in (directory, self.fallback) if d and os.path.isdir(d)]
+
+    async def check_config(self) -> None:
+        # Каталога сборки может не быть (сборку не запускали) — хватит исходников
+        if not self.all_directories:
+            raise RuntimeError(f"Нет каталога статики: {self.directory} или {self.fallback}")
+
+    async def get_response(self, path: str, scope: Scope):
+        response = await super().get_response(path, scope)
+        if path in self.assets.built:
+            response.headers["Cache-Control"] = IMMUTABLE
+        else:
+            response.headers.setdefault("Cache-Control", "no-cache")
+        return response
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200):
+        # lookup_path отдаёт realpath — сравниваем с realpath каталога сборки
+        path = os.path.relpath(full_path, os.path.realpath(self.directory)).replace(os.sep, "/")
+        encodings = self.assets.built.get(path) or []
+        if encodings:
+            accepted = accepted_encodings(scope)
+            for ext, encoding in ENCODINGS.items():
+                if encoding not in encodings or encoding not in accepted:
+                    continue
+                variant = f"{full_path}{ext}"
+                try:
+                    variant_stat = os.stat(variant)
+                except FileNotFoundError:
+                    continue
+                if not stat.S_ISREG(variant_stat.st_mode):
+                    continue
+                response = super().file_response(variant, variant_stat, scope, status_code)
+                if response.status_code != 304:
+                    response.headers["Content-Type"] = content_type(full_path)
+                    response.headers["Content-Encoding"] = encoding
+                response.headers["Vary"] = "Accept-Encoding"
+                return response
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if encodings:
+            response.headers["Vary"] = "Accept-Encoding"
+        return response
+
+
+def accepted_encodings(scope: Scope) -> set[str]:
+    header = ""
+    for name, value in scope["headers"]:
+        if name == b"accept-encoding":
+            header = value.decode("latin-1")
+            break
+    accepted = set()
+    for token in header.split(","):
+        name, _, params = token.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def content_type(path) -> str:
+    media_type = mimetypes.guess_type(str(path))[0] or "application/octet-stream"
+    if media_type.startswith("text/") or media_type == "application/javascript":
+        media_type += "; charset=utf-8"
+    return media_type
+
+
+def main() -> None:
+    settings = Settings.from_env()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--src", default=settings.static_dir)
+    parser.add_argument("--out", default=settings.assets_dir)
+    args = parser.parse_args()
+
+    manifest = build(args.src, args.out)
+    source = sum(os.path.getsize(os.path.join(args.src, p)) for p in manifest["files"])
+    print(f"{len(manifest['files'])} файлов ({source / 1024:.0f} КБ) → {os.path.relpath(args.out, BASE_DIR)}")
+    for path, entry in manifest["files"].items():
+        extras = entry.get("encodings", []) + (["webp"] if "webp" in entry else [])
+        print(f"  {path:<24} → {entry['path']}  {' '.join(extras)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import jwt
+
+from cache import MISSING, ReadCache
+
+
+# Асимметричные алгоритмы, для которых ключ берётся из JWKS; алгоритм
+# проверки задаёт ключ из JWKS, а не заголовок токена
+JWKS_ALGORITHMS = frozenset({"RS256", "RS384", "RS512", "ES256", "ES384", "ES512", "EdDSA"})
+
+
+# ── Пользователь из claims токена ────────────────────────────────────────
+@dataclass(frozen=True)
+class AuthUser:
+    id: str
+    email: Optional[str] = None
+    role: Optional[str] = None
+    exp: float = 0
+
+
+class TokenVerifier:
+    """Локальная проверка access_token (JWT Supabase) с кэшем по токену.
+
+    HS256-токены проверяются секретом проекта (SUPABASE_JWT_SECRET),
+    асимметричные (RS256/ES256) — ключами из JWKS, которые кэширует PyJWKClient
+    (загрузка — в потоке, не в цикле событий). Токен, который не удалось
+    проверить локально, проверяет Auth API — это не выход из аккаунта.
+    С shared ответы Auth API и выход из аккаунта видны всем воркерам хоста;
+    в общем кэше ключ — хэш токена, не сам токен.
+    """
+
+    def __init__(
+        self,
+        supabase_url: str,
+        jwt_secret: Optional[str] = None,
+        audience: str = "authenticated",
+        cache_size: int = 4096,
+        cache_ttl: int = 300,
+        leeway: int = 10,
+        shared=None,
+    ):
+        self.jwt_secret = jwt_secret
+        self.audience = audience
+        self.leeway = leeway
+        self.jwks = jwt.PyJWKClient(
+            f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json",
+            cache_keys=True,
+            lifespan=3600,
+            timeout=5,
+        )
+        self.cache = ReadCache(maxsize=cache_size, ttl=cache_ttl, name="auth", shared=shared)
+
+    def can_verify(self, token: str) -> bool:
+        # HS256 без секрета и незнакомые алгоритмы локально не проверить —
+        # нужен запрос в Auth API
+        try:
+            alg = jwt.get_unverified_header(token).get("alg")
+        except jwt.PyJWTError:
+            return False
+        if alg == "HS256":
+            return bool(self.jwt_secret)
+        return alg in JWKS_ALGORITHMS
+
+    def cached(self, token: str) -> Optional[AuthUser]:
+        user = self.cache.get(cache_key(token))
+        if user is MISSING:
+            return None
+        if user.exp and user.exp <= time.time():
+            self.cache.drop([cache_key(token)])
+            return None
+        return user
+
+    def remember(self, token: str, user: AuthUser, share: bool = True) -> AuthUser:
+        return self.cache.set(cache_key(token), user, share=share)
+
+    def expired(self, token: str) -> bool:
+        exp = unverified_exp(token)
+        return bool(exp) and exp + self.leeway <= time.time()
+
+    def forget(self, token: str) -> None:
+        self.cache.invalidate(cache_key(token))
+
+    async def verify(self, token: str) -> Optional[AuthUser]:
+        # None — локально проверить не вышло (подпись, срок, ключ, JWKS недоступен)
+        user = self.cached(token)
+        if user is not None:
+            return user
+        try:
+            claims = await self.decode(token)
+        except (jwt.PyJWTError, KeyError, TypeError, ValueError):
+            return None
+        # Локальная проверка дешевле похода в общий кэш — только в процессе
+        return self.remember(token, user_from_claims(claims), share=False)
+
+    async def decode(self, token: str) -> dict:
+        if jwt.get_unverified_header(token).get("alg") == "HS256":
+            if not self.jwt_secret:
+                raise jwt.InvalidTokenError("SUPABASE_JWT_SECRET не задан")
+            key, algorithm = self.jwt_secret, "HS256"
+        else:
+            # PyJWKClient ходит за JWKS синхронно (при промахе своего кэша)
+            signing_key = await asyncio.to_thread(self.jwks.get_signing_key_from_jwt, token)
+            key, algorithm = signing_key.key, signing_key.algorithm_name
+            if algorithm not in JWKS_ALGORITHMS:
+                raise jwt.InvalidAlgorithmError(f"Алгоритм ключа {algorithm} не поддерживается")
+        return jwt.decode(
+            token,
+            key,
+            algorithms=[algorithm],
+            audience=self.audience,
+            leeway=self.leeway,
+            options={"require": ["exp", "sub"]},
+        )
+
+
+def cache_key(token: str) -> tuple:
+    return ("auth", hashlib.sha256(token.encode()).hexdigest())
+
+
+def user_from_claims(claims: dict) -> AuthUser:
+    return AuthUser(
+        id=str(claims["sub"]),
+        email=claims.get("email"),
+        role=claims.get("role"),
+        exp=float(claims.get("exp") or 0),
+    )
+
+
+def unverified_exp(token: str) -> float:
+    try:
+        claims = jwt.decode(token, options={"verify_signature": False})
+    except jwt.PyJWTError:
+        return 0
+    return float(claims.get("exp") or 0)
@@ -0,0 +1,572 @@
+import asyncio
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+from functools import lru_cache
+
+import jwt
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+from storage.base import count_item, empty_stats
+
+
+# Вложенные выборки PostgREST, которые использует приложение:
+# (таблица, связь) → (вид, целевая таблица, внешний ключ)
+RELATIONS = {
+    ("wishlists", "wishlist_items"): ("many", "wishlist_items", "wishlist_id"),
+    ("wishlists", "wishlist_suggestions"): ("many", "wishlist_suggestions", "wishlist_id"),
+    ("holidays", "holiday_wishlists"): ("many", "holiday_wishlists", "holiday_id"),
+    ("holiday_wishlists", "wishlists"): ("one", "wishlists", "wishlist_id"),
+}
+
+DEFAULTS = {
+    "wishlists": {"description": None, "is_shared": False},
+    "wishlist_items": {
+        "description": None,
+        "url": None,
+        "price": None,
+        "currency": "€",
+        "priority": 3,
+        "reserved_by": None,
+        "reserved_at": None,
+        "suggested_by": None,
+    },
+    "wishlist_suggestions": {
+        "description": None,
+        "url": None,
+        "price": None,
+        "currency": "€",
+        "comment": None,
+        "status": "pending",
+    },
+    "holidays": {"description": None, "recurrence": None},
+    "holiday_wishlists": {},
+}
+
+CASCADE = {
+    "wishlists": [
+        ("wishlist_items", "wishlist_id"),
+        ("wishlist_suggestions", "wishlist_id"),
+        ("holiday_wishlists", "wishlist_id"),
+    ],
+    "holidays": [("holiday_wishlists", "holiday_id")],
+}
+
+# Колонки из миграций sql/: без них (rpcs=False) выборка отвечает 42703
+MIGRATED_COLUMNS = {
+    "holidays": {"recurrence"},
+    "wishlists": {"item_count", "reserved_count", "totals", "version"},
+}
+
+# Служебные параметры запроса, которые не являются фильтрами
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def split_top(text: str) -> list[str]:
+    # Разбивает по запятым верхнего уровня: без учёта скобок и кавычек
+    parts, depth, quoted, current = [], 0, False, []
+    for ch in text:
+        if ch == '"':
+            quoted = not quoted
+        elif not quoted and ch == "(":
+            depth += 1
+        elif not quoted and ch == ")":
+            depth -= 1
+        elif not quoted and depth == 0 and ch == ",":
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(ch)
+    if current:
+        parts.append("".join(current))
+    return [p.strip() for p in parts if p.strip()]
+
+
+def unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def as_text(value) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+@lru_cache(maxsize=64)
+def in_values(operand: str) -> frozenset:
+    # in.(a,b,...) разбирается один раз на запрос, а не для каждой строки
+    return frozenset(unquote(v) for v in split_top(operand.strip("()")))
+
+
+def compare(value, op: str, operand: str) -> bool:
+    if op == "not":
+        op, operand = operand.split(".", 1)
+        return not compare(value, op, operand)
+    if op == "is":
+        return as_text(value) == operand.lower()
+    if op == "in":
+        return as_text(value) in in_values(operand)
+
+    operand = unquote(operand)
+    if value is None:
+        return False
+    left, right = as_text(value), operand
+    if isinstance(value, bool):
+        # Postgres принимает true/True/TRUE
+        right = operand.lower()
+    elif isinstance(value, (int, float)):
+        left, right = float(value), float(operand)
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    raise ValueError(f"Оператор {op} не поддерживается")
+
+
+def parse_condition(text: str):
+    # col.op.value, or(...) и and(...) — как в параметре or= у PostgREST
+    for logic in ("or", "and"):
+        if text.startswith(logic + "("):
+            return parse_logic(logic, text[len(logic) + 1:-1])
+    column, op, operand = text.split(".", 2)
+    return lambda row: compare(row.get(column), op, operand)
+
+
+def parse_logic(logic: str, inner: str):
+    conditions = [parse_condition(part) for part in split_top(inner)]
+    if logic == "or":
+        return lambda row: any(c(row) for c in conditions)
+    return lambda row: all(c(row) for c in conditions)
+
+
+def parse_order(text: str) -> list[tuple[str, bool]]:
+    order = []
+    for part in split_top(text):
+        column, *modifiers = part.split(".")
+        order.append((column, "desc" in modifiers))
+    return order
+
+
+def sort_rows(rows: list[dict], order: list[tuple[str, bool]]) -> list[dict]:
+    # Сортировки применяются с последней, чтобы первая была главной
+    for column, desc in reversed(order):
+        rows = sorted(
+            rows,
+            key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else ""),
+            reverse=desc,
+        )
+    return rows
+
+
+class MissingColumn(Exception):
+    pass
+
+
+class FakeSupabase:
+    """Локальная замена PostgREST и Auth для бенчмарков.
+
+    Понимает то подмножество запросов, которое строит приложение: фильтры,
+    or=(...), сортировку, limit, вложенные выборки, RPC и колонки из sql/
+    (rpcs=False — база без миграций). Каждый
+    вызов задерживается на latency (+ случайный jitter) и учитывается в calls.
+    """
+
+    def __init__(
+        self,
+        jwt_secret: str,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        rpcs: bool = True,
+    ):
+        self.jwt_secret = jwt_secret
+        self.latency = latency
+        self.jitter = jitter
+        self.rpcs = rpcs
+        self.tables: dict[str, list[dict]] = {name: [] for name in DEFAULTS}
+        self.users: dict[str, dict] = {}
+        self.calls: list[tuple[str, str]] = []
+        self.app = self.build_app()
+
+    # ── Данные ───────────────────────────────────────────────────────────
+    def add_user(self, email: str, password: str) -> dict:
+        user = {"id": new_id(), "email": email, "password": password, "created_at": now()}
+        self.users[email] = user
+        return user
+
+    def insert(self, table: str, row: dict) -> dict:
+        row = {"id": new_id(), "created_at": now(), **DEFAULTS[table], **row}
+        if table == "wishlists":
+            row.update(empty_stats())
+            if self.rpcs:
+                row["version"] = 1
+        self.tables[table].append(row)
+        self.count_item(table, row, 1)
+        self.bump_version(table, row)
+        return row
+
+    def update(self, table: str, row: dict, changes: dict) -> None:
+        self.count_item(table, row, -1)
+        row.update(changes)
+        self.count_item(table, row, 1)
+        self.bump_version(table, row)
+
+    def count_item(self, table: str, row: dict, sign: int) -> None:
+        # Триггер wishlist_items_stats из sql/006_wishlist_stats.sql
+        if table != "wishlist_items":
+            return
+        for wishlist in self.find("wishlists", id=row["wishlist_id"]):
+            count_item(wishlist, row, sign)
+
+    def bump_version(self, table: str, row: dict) -> None:
+        # Триггеры версии из sql/008_wishlist_version.sql
+        if table == "wishlists":
+            wishlists = [row]
+        elif table in ("wishlist_items", "wishlist_suggestions"):
+            wishlists = self.find("wishlists", id=row["wishlist_id"])
+        else:
+            return
+        for wishlist in wishlists:
+            if "version" in wishlist:
+                wishlist["version"] += 1
+
+    def find(self, table: str, **filters) -> list[dict]:
+        return [
+            r for r in self.tables[table]
+            if all(str(r.get(k)) == str(v) for k, v in filters.items())
+        ]
+
+    def delete_rows(self, table: str, rows: list[dict]) -> None:
+        ids = {id(r) for r in rows}
+        self.tables[table] = [r for r in self.tables[table] if id(r) not in ids]
+        for row in rows:
+            self.count_item(table, row, -1)
+            self.bump_version(table, row)
+        for child, fk in CASCADE.get(table, []):
+            parent_ids = {str(r["id"]) for r in rows}
+            self.delete_rows(child, [r for r in self.tables[child] if str(r[fk]) in parent_ids])
+
+    # ── PostgREST ────────────────────────────────────────────────────────
+    def project(self, table: str, row: dict, select: str, embed_order: dict) -> dict:
+        out = {}
+        for item in split_top(select):
+            if item == "*":
+                out.update(row)
+                continue
+            if "(" not in item:
+                if not self.rpcs and item in MIGRATED_COLUMNS.get(table, ()):
+                    raise MissingColumn(f"column {table}.{item} does not exist")
+                out[item] = row.get(item)
+                continue
+
+            name, inner = item.split("(", 1)
+            name, inner = name.split("!")[0].strip(), inner[:-1].strip()
+            kind, target, fk = RELATIONS[(table, name)]
+            if kind == "one":
+                match = self.find(target, id=row[fk])
+                out[name] = self.project(target, match[0], inner, embed_order) if match else None
+                continue
+
+            children = self.find(target, **{fk: row["id"]})
+            if inner == "count":
+                out[name] = [{"count": len(children)}]
+                continue
+            children = sort_rows(children, embed_order.get(name, []))
+            out[name] = [self.project(target, c, inner, embed_order) for c in children]
+        return out
+
+    def select_rows(self, table: str, params: list[tuple[str, str]]) -> list[dict]:
+        conditions = []
+        for key, value in params:
+            if key in RESERVED_PARAMS or "." in key:
+                continue
+            if key in ("or", "and"):
+                # Только внешние скобки: strip("()") съел бы и скобку вложенного and(...)
+                conditions.append(parse_logic(key, value[1:-1]))
+            else:
+                op, operand = value.split(".", 1)
+                conditions.append(
+                    lambda row, k=key, o=op, v=operand: compare(row.get(k), o, v)
+                )
+        return [r for r in self.tables[table] if all(c(r) for c in conditions)]
+
+    async def rest(self, request: Request, table: str):
+        if table not in self.tables:
+            return JSONResponse(
+                {"code": "42P01", "message": f'relation "{table}" does not exist'},
+                status_code=404,
+            )
+        params = list(request.query_params.multi_items())
+        query = dict(params)
+        method = request.method
+
+        if method == "POST":
+            body = await request.json()
+            rows = [self.insert(table, r) for r in (body if isinstance(body, list) else [body])]
+            return self.respond(request, rows, status_code=201)
+
+        rows = self.select_rows(table, params)
+
+        if method == "PATCH":
+            changes = await request.json()
+            for row in rows:
+                self.update(table, row, changes)
+            return self.respond(request, rows)
+
+        if method == "DELETE":
+            self.delete_rows(table, rows)
+            return self.respond(request, rows)
+
+        embed_order = {
+            key.split(".")[0]: parse_order(value)
+            for key, value in params if key.endswith(".order")
+        }
+        rows = sort_rows(rows, parse_order(query.get("order", "")))
+        offset = int(query.get("offset", 0))
+        if "limit" in query:
+            rows = rows[offset:offset + int(query["limit"])]
+        select = query.get("select", "*")
+        try:
+            if not self.rpcs:
+                # Как PostgREST: колонки нет — ошибка и на пустой выборке
+                for item in split_top(select):
+                    if item in MIGRATED_COLUMNS.get(table, ()):
+                        raise MissingColumn(f"column {table}.{item} does not exist")
+            rows = [self.project(table, r, select, embed_order) for r in rows]
+        except MissingColumn as e:
+            return JSONResponse(
+                {"code": "42703", "message": str(e), "details": None, "hint": None},
+                status_code=400,
+            )
+        return self.respond(request, rows)
+
+    def respond(self, request: Request, rows: list[dict], status_code: int = 200):
+        if "vnd.pgrst.object" in request.headers.get("accept", ""):
+            if len(rows) != 1:
+                return JSONResponse(
+                    {
+                        "code": "PGRST116",
+                        "message": "JSON object requested, multiple (or no) rows returned",
+                        "details": f"The result contains {len(rows)} rows",
+                        "hint": None,
+                    },
+                    status_code=406,
+                )
+            return JSONResponse(rows[0], status_code=status_code)
+        return JSONResponse(rows, status_code=status_code)
+
+    async def rpc(self, request: Request, fn: str):
+        handler = getattr(self, f"rpc_{fn}", None)
+        if not self.rpcs or handler is None:
+            return JSONResponse(
+                {
+                    "code": "PGRST202",
+                    "message": f"Could not find the function public.{fn} in the schema cache",
+                    "details": None,
+                    "hint": None,
+                },
+                status_code=404,
+            )
+        return JSONResponse(handler(**await request.json()))
+
+    # ── RPC из sql/ ──────────────────────────────────────────────────────
+    def rpc_reserve_item(self, p_item_id, p_wishlist_id, p_user_id):
+        items = self.find("wishlist_items", id=p_item_id, wishlist_id=p_wishlist_id)
+        if not items:
+            return "not_found"
+        item = items[0]
+        if item["reserved_by"]:
+            return "already_yours" if str(item["reserved_by"]) == str(p_user_id) else "taken"
+        self.update("wishlist_items", item, {"reserved_by": p_user_id, "reserved_at": now()})
+        return "reserved"
+
+    def rpc_release_item(self, p_item_id, p_wishlist_id, p_user_id):
+        items = self.find("wishlist_items", id=p_item_id, wishlist_id=p_wishlist_id)
+        wishlists = self.find("wishlists", id=p_wishlist_id)
+        if not items or not wishlists:
+            return "not_found"
+        item = items[0]
+        if not item["reserved_by"]:
+            return "not_reserved"
+        if str(p_user_id) not in (str(item["reserved_by"]), str(wishlists[0]["user_id"])):
+            return "forbidden"
+        self.update("wishlist_items", item, {"reserved_by": None, "reserved_at": None})
+        return "released"
+
+    def rpc_toggle_wishlist_share(self, p_wishlist_id, p_user_id):
+        wishlists = self.find("wishlists", id=p_wishlist_id, user_id=p_user_id)
+        if not wishlists:
+            return None
+        self.update("wishlists", wishlists[0], {"is_shared": not wishlists[0]["is_shared"]})
+        return wishlists[0]["is_shared"]
+
+    def rpc_link_holiday_wishlists(self, p_holiday_id, p_user_id, p_wishlist_ids):
+        linked = []
+        for wid in dict.fromkeys(p_wishlist_ids):
+            if self.find("wishlists", id=wid, user_id=p_user_id):
+                self.insert("holiday_wishlists", {"holiday_id": p_holiday_id, "wishlist_id": wid})
+                linked.append(wid)
+        return linked
+
+    def rpc_create_holiday_with_links(
+        self, p_user_id, p_title, p_date, p_description, p_wishlist_ids, p_recurrence=None
+    ):
+        holiday = self.insert("holidays", {
+            "user_id": p_user_id,
+            "title": p_title,
+            "date": p_date,
+            "description": p_description,
+            "recurrence": p_recurrence,
+        })
+        self.rpc_link_holiday_wishlists(holiday["id"], p_user_id, p_wishlist_ids)
+        return holiday["id"]
+
+    def rpc_moderate_suggestions(self, p_wishlist_id, p_user_id, p_accept, p_reject):
+        if not self.find("wishlists", id=p_wishlist_id, user_id=p_user_id):
+            return {"owner": False}
+
+        def pending(ids):
+            ids = set(map(str, ids))
+            return [
+                s for s in self.find("wishlist_suggestions", wishlist_id=p_wishlist_id, status="pending")
+                if str(s["id"]) in ids
+            ]
+
+        accepted = pending(p_accept)
+        rejected = [s for s in pending(p_reject) if s not in accepted]
+        items = []
+        for s in accepted:
+            self.update("wishlist_suggestions", s, {"status": "accepted"})
+            items.append(self.insert("wishlist_items", {
+                "wishlist_id": p_wishlist_id,
+                "title": s["title"],
+                "description": s.get("description"),
+                "url": s.get("url"),
+                "price": s.get("price"),
+                "currency": s.get("currency") or "€",
+                "priority": 3,
+                "suggested_by": s["suggested_by"],
+            }))
+        for s in rejected:
+            self.update("wishlist_suggestions", s, {"status": "rejected"})
+        return {
+            "owner": True,
+            "items": items,
+            "accepted": [s["id"] for s in accepted],
+            "rejected": [s["id"] for s in rejected],
+        }
+
+    # ── Auth ─────────────────────────────────────────────────────────────
+    def user_json(self, user: dict) -> dict:
+        return {
+            "id": user["id"],
+            "aud": "authenticated",
+            "role": "authenticated",
+            "email": user["email"],
+            "app_metadata": {"provider": "email"},
+            "user_metadata": {},
+            "created_at": user["created_at"],
+        }
+
+    def issue(self, user: dict, expires_in: int = 3600) -> dict:
+        expires_at = int(time.time()) + expires_in
+        token = jwt.encode(
+            {
+                "sub": user["id"],
+                "email": user["email"],
+                "role": "authenticated",
+                "aud": "authenticated",
+                "exp": expires_at,
+            },
+            self.jwt_secret,
+            algorithm="HS256",
+        )
+        return {
+            "access_token": token,
+            "token_type": "bearer",
+            "expires_in": expires_in,
+            "expires_at": expires_at,
+            "refresh_token": new_id(),
+            "user": self.user_json(user),
+        }
+
+    def auth_error(self, message: str, code: str, status_code: int = 400):
+        return JSONResponse(
+            {"code": status_code, "error_code": code, "msg": message},
+            status_code=status_code,
+        )
+
+    async def token(self, request: Request):
+        body = await request.json()
+        user = self.users.get(body.get("email"))
+        if not user or user["password"] != body.get("password"):
+            return self.auth_error("Invalid login credentials", "invalid_credentials")
+        return JSONResponse(self.issue(user))
+
+    async def signup(self, request: Request):
+        body = await request.json()
+        if body.get("email") in self.users:
+            return self.auth_error("User already registered", "user_already_exists", 422)
+        user = self.add_user(body["email"], body["password"])
+        return JSONResponse(self.user_json(user))
+
+    async def user(self, request: Request):
+        token = request.headers.get("authorization", "").removeprefix("Bearer ")
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.InvalidTokenError:
+            return self.auth_error("invalid JWT", "bad_jwt", 401)
+        user = self.users.get(claims.get("email"))
+        if not user:
+            return self.auth_error("User not found", "user_not_found", 404)
+        return JSONResponse(self.user_json(user))
+
+    # ── Приложение ───────────────────────────────────────────────────────
+    def build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Supabase", openapi_url=None)
+
+        @app.middleware("http")
+        async def simulate_network(request: Request, call_next):
+            if request.url.path.startswith("/__bench"):
+                return await call_next(request)
+            self.calls.append((request.method, request.url.path))
+            delay = self.latency + random.uniform(0, self.jitter)
+            if delay:
+                await asyncio.sleep(delay)
+            return await call_next(request)
+
+        # Счётчик для раннера, который живёт в другом процессе; сам не считается
+        app.add_api_route("/__bench/calls", lambda: len(self.calls), methods=["GET"])
+        app.add_api_route("/auth/v1/token", self.token, methods=["POST"])
+        app.add_api_route("/auth/v1/signup", self.signup, methods=["POST"])
+        app.add_api_route("/auth/v1/user", self.user, methods=["GET"])
+        app.add_api_route(
+            "/auth/v1/logout", lambda: Response(status_code=204), methods=["POST"]
+        )
+        app.add_api_route("/rest/v1/rpc/{fn}", self.rpc, methods=["POST"])
+        app.add_api_route(
+            "/rest/v1/{table}", self.rest, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]
+        )
+        return app
+
@@ -0,0 +1,402 @@
+"""Нагрузочный прогон приложения против локальной замены Supabase.
+
+    python -m bench.run [--latency 0.005] [--requests 200] [--concurrency 10]
+                        [--no-rpc] [--shared-cache] [--json results.json]
+
+Для каждого сценария печатает p50/p95/p99, пропускную способность и число
+обращений к PostgREST/Auth на один запрос. Код выхода 1 — какой-то сценарий
+вышел за бюджет обращений или задержки.
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import re
+import socket
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Callable, Optional
+
+import httpx
+import jwt
+import uvicorn
+
+from bench.fake_supabase import FakeSupabase
+
+
+JWT_SECRET = "bench-jwt-secret-bench-jwt-secret"
+PASSWORD = "bench-password"
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Путь строится по фикстурам: ids → путь
+    path: Callable[[dict], str]
+    client: str = "owner"
+    form: Optional[Callable[[dict], dict]] = None
+    status: int = 200
+    # Повторный GET с If-None-Match из ответа прогрева
+    revalidate: bool = False
+    # Бюджет обращений к бэкенду на один запрос (с миграциями из sql/ и без)
+    round_trips: int = 1
+    fallback_round_trips: Optional[int] = None
+    # Допустимая p95 сверх задержки бэкенда: p95 ≤ overhead_ms + round_trips × latency
+    overhead_ms: float = 50.0
+
+
+@dataclass
+class Result:
+    scenario: Scenario
+    latencies: list[float] = field(default_factory=list)
+    round_trips: list[int] = field(default_factory=list)
+    errors: int = 0
+    elapsed: float = 0.0
+    violations: list[str] = field(default_factory=list)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return 0.0
+        index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+        return ordered[index] * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "name": self.scenario.name,
+            "requests": len(self.latencies),
+            "errors": self.errors,
+            "p50_ms": round(self.percentile(50), 2),
+            "p95_ms": round(self.percentile(95), 2),
+            "p99_ms": round(self.percentile(99), 2),
+            "rps": round(len(self.latencies) / self.elapsed, 1) if self.elapsed else 0,
+            "round_trips": max(self.round_trips, default=0),
+            "violations": self.violations,
+        }
+
+
+today = date.today()
+
+SCENARIOS = [
+    Scenario(
+        "login", "POST", lambda f: "/login",
+        client="anonymous",
+        form=lambda f: {"email": "owner@bench.local", "password": PASSWORD},
+        status=303,
+    ),
+    Scenario("wishlist_index", "GET", lambda f: "/wishlist", fallback_round_trips=2),
+    Scenario(
+        "wishlist_detail_owner", "GET", lambda f: f"/wishlist/{f['private_wishlist']}",
+        round_trips=2,
+    ),
+    Scenario(
+        # Кэша снимка у приватного списка нет: строка списка, без предметов
+        "wishlist_detail_304", "GET", lambda f: f"/wishlist/{f['private_wishlist']}",
+        revalidate=True,
+        status=304,
+        fallback_round_trips=2,
+    ),
+    Scenario(
+        "wishlist_detail_shared", "GET", lambda f: f"/wishlist/{f['shared_wishlist']}",
+        client="guest",
+        round_trips=2,
+    ),
+    Scenario(
+        "reserve", "POST", lambda f: f"/wishlist/{f['shared_wishlist']}/item/{f['item']}/reserve",
+        client="guest",
+        status=303,
+        fallback_round_trips=2,
+    ),
+    Scenario(
+        "unreserve", "POST", lambda f: f"/wishlist/{f['shared_wishlist']}/item/{f['item']}/unreserve",
+        client="guest",
+        status=303,
+        fallback_round_trips=3,
+    ),
+    Scenario(
+        "reserve_api", "POST",
+        lambda f: f"/api/v1/wishlists/{f['shared_wishlist']}/items/{f['item']}/reserve",
+        client="guest",
+        fallback_round_trips=2,
+    ),
+    Scenario(
+        "unreserve_api", "POST",
+        lambda f: f"/api/v1/wishlists/{f['shared_wishlist']}/items/{f['item']}/unreserve",
+        client="guest",
+        fallback_round_trips=3,
+    ),
+    Scenario(
+        # Прогрев принимает всю пачку, дальше — те же id, уже рассмотренные
+        "moderate", "POST", lambda f: f"/wishlist/{f['private_wishlist']}/suggestions/moderate",
+        form=lambda f: {"decision": "accept", "ids": f["suggestions"]},
+        status=303,
+        fallback_round_trips=3,
+    ),
+    Scenario(
+        "export_ndjson", "GET", lambda f: f"/wishlist/{f['private_wishlist']}/export",
+        round_trips=2,
+    ),
+    Scenario(
+        "calendar", "GET", lambda f: f"/calendar?month={today.month}&year={today.year}",
+    ),
+    Scenario(
+        "calendar_events", "GET", lambda f: f"/calendar/events/{today.year}/{today.month}",
+    ),
+    Scenario(
+        "calendar_events_year", "GET", lambda f: f"/calendar/events?from={today.year}-01&to={today.year}-12",
+    ),
+    Scenario(
+        # Повторяющийся праздник со связью: праздник и связи — один вызов RPC
+        "add_holiday_recurring", "POST", lambda f: "/calendar/add",
+        form=lambda f: {
+            "title": "Зарплата",
+            "date_str": today.isoformat(),
+            "recurrence": "monthly:last",
+            "wishlist_ids": [f["private_wishlist"]],
+        },
+        status=303,
+        fallback_round_trips=3,
+    ),
+    Scenario("public", "GET", lambda f: "/public", client="anonymous"),
+    Scenario("public_page_2", "GET", lambda f: f"/public?after={f['public_cursor']}", client="anonymous"),
+    Scenario("public_304", "GET", lambda f: "/public", client="anonymous", revalidate=True, status=304),
+]
+
+
+def seed(fake: FakeSupabase) -> dict:
+    owner = fake.add_user("owner@bench.local", PASSWORD)
+    guest = fake.add_user("guest@bench.local", PASSWORD)
+
+    wishlists = [
+        fake.insert("wishlists", {
+            "user_id": owner["id"],
+            "title": f"Список {n}",
+            "description": "Для бенчмарка",
+            "is_shared": n % 2 == 0,
+        })
+        for n in range(60)
+    ]
+    private, shared = wishlists[1], wishlists[0]
+    for wishlist in (private, shared):
+        for n in range(30):
+            fake.insert("wishlist_items", {
+                "wishlist_id": wishlist["id"],
+                "title": f"Подарок {n}",
+                "price": 10 + n,
+                "priority": n % 5 + 1,
+            })
+
+    suggestions = [
+        fake.insert("wishlist_suggestions", {
+            "wishlist_id": private["id"],
+            "suggested_by": guest["id"],
+            "title": f"Предложение {n}",
+            "price": 5 + n,
+        })
+        for n in range(20)
+    ]
+
+    first_day = today.replace(day=1)
+    for n in range(12):
+        holiday = fake.insert("holidays", {
+            "user_id": owner["id"],
+            "title": f"Праздник {n}",
+            "date": (first_day + timedelta(days=n * 2)).isoformat(),
+        })
+        for wishlist in wishlists[n:n + 3]:
+            fake.insert("holiday_wishlists", {"holiday_id": holiday["id"], "wishlist_id": wishlist["id"]})
+
+    # Повторяющиеся праздники, заведённые в прошлые годы
+    for n, rule in enumerate(["yearly", "monthly", "monthly:last-fri", "yearly:2-sun", "weekly"]):
+        fake.insert("holidays", {
+            "user_id": owner["id"],
+            "title": f"Повторяющийся {n}",
+            "date": first_day.replace(year=first_day.year - 3).isoformat(),
+            "recurrence": rule,
+        })
+
+    return {
+        "private_wishlist": private["id"],
+        "shared_wishlist": shared["id"],
+        "item": fake.find("wishlist_items", wishlist_id=shared["id"])[0]["id"],
+        "suggestions": [s["id"] for s in suggestions],
+    }
+
+
+def serve_fake(args, ready: multiprocessing.Queue) -> None:
+    # Отдельный процесс: замена Supabase не делит GIL с приложением
+    fake = FakeSupabase(JWT_SECRET, latency=args.latency, jitter=args.jitter, rpcs=not args.no_rpc)
+    fixtures = seed(fake)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    host, port = sock.getsockname()
+    ready.put((f"http://{host}:{port}", fixtures))
+    uvicorn.Server(uvicorn.Config(fake.app, log_level="warning", lifespan="off")).run(sockets=[sock])
+
+
+def start_fake(args) -> tuple[multiprocessing.Process, str, dict]:
+    ready = multiprocessing.Queue()
+    process = multiprocessing.Process(target=serve_fake, args=(args, ready), daemon=True)
+    process.start()
+    url, fixtures = ready.get(timeout=30)
+    for _ in range(300):
+        try:
+            httpx.get(f"{url}/__bench/calls")
+            break
+        except httpx.TransportError:
+            time.sleep(0.01)
+    return process, url, fixtures
+
+
+async def login(app, email: str) -> httpx.AsyncClient:
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+    if email:
+        res = await client.post("/login", data={"email": email, "password": PASSWORD})
+        if res.status_code != 303:
+            raise RuntimeError(f"Не удалось войти как {email}: {res.status_code}")
+    return client
+
+
+async def send(
+    client: httpx.AsyncClient, scenario: Scenario, fixtures: dict, headers: Optional[dict] = None
+) -> httpx.Response:
+    return await client.request(
+        scenario.method,
+        scenario.path(fixtures),
+        data=scenario.form(fixtures) if scenario.form else None,
+        headers=headers,
+    )
+
+
+async def run_scenario(
+    scenario: Scenario,
+    client: httpx.AsyncClient,
+    counter: httpx.AsyncClient,
+    fixtures: dict,
+    args,
+) -> Result:
+    result = Result(scenario)
+
+    # Прогрев (кэши, проба RPC), затем последовательный проход:
+    # обращения к бэкенду на каждый запрос
+    res = await send(client, scenario, fixtures)
+    headers = {"If-None-Match": res.headers["etag"]} if scenario.revalidate else None
+    for _ in range(args.samples):
+        before = (await counter.get("/__bench/calls")).json()
+        await send(client, scenario, fixtures, headers)
+        result.round_trips.append((await counter.get("/__bench/calls")).json() - before)
+
+    queue = asyncio.Queue()
+    for _ in range(args.requests):
+        queue.put_nowait(None)
+
+    async def worker():
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            res = await send(client, scenario, fixtures, headers)
+            result.latencies.append(time.perf_counter() - started)
+            if res.status_code != scenario.status:
+                result.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    result.elapsed = time.perf_counter() - started
+
+    budget = scenario.round_trips
+    if args.no_rpc and scenario.fallback_round_trips is not None:
+        budget = scenario.fallback_round_trips
+    if max(result.round_trips) > budget:
+        result.violations.append(f"обращений к бэкенду {max(result.round_trips)} > {budget}")
+
+    overhead_ms = args.overhead_ms if args.overhead_ms is not None else scenario.overhead_ms
+    latency_budget = overhead_ms + budget * args.latency * 1000
+    if result.percentile(95) > latency_budget:
+        result.violations.append(f"p95 {result.percentile(95):.1f} мс > {latency_budget:.1f} мс")
+    if result.errors:
+        result.violations.append(f"{result.errors} ответов не {scenario.status}")
+    return result
+
+
+async def run(args) -> list[Result]:
+    process, url, fixtures = start_fake(args)
+
+    os.environ.update({
+        "STORAGE_BACKEND": "supabase",
+        "SUPABASE_URL": url,
+        "SUPABASE_ANON_KEY": jwt.encode({"role": "anon"}, JWT_SECRET, algorithm="HS256"),
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+    })
+    if args.shared_cache:
+        # Кэши с общим уровнем, как у воркеров serve.py
+        os.environ["SHARED_CACHE_PATH"] = os.path.join(tempfile.mkdtemp(), "shared-cache.sqlite")
+    import main
+
+    results = []
+    try:
+        async with main.lifespan(main.app):
+            clients = {
+                "anonymous": await login(main.app, None),
+                "owner": await login(main.app, "owner@bench.local"),
+                "guest": await login(main.app, "guest@bench.local"),
+            }
+            res = await clients["anonymous"].get("/public")
+            fixtures["public_cursor"] = re.search(r"after=([\w-]+)", res.text).group(1)
+
+            counter = httpx.AsyncClient(base_url=url)
+            for scenario in SCENARIOS:
+                if args.only and scenario.name not in args.only:
+                    continue
+                results.append(
+                    await run_scenario(scenario, clients[scenario.client], counter, fixtures, args)
+                )
+            for client in (counter, *clients.values()):
+                await client.aclose()
+    finally:
+        process.terminate()
+    return results
+
+
+def report(results: list[Result]) -> None:
+    header = f"{'сценарий':<24}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>9}{'RT':>5}  "
+    print(header)
+    print("─" * len(header))
+    for result in results:
+        row = result.as_dict()
+        status = "ok" if not result.violations else "; ".join(result.violations)
+        print(
+            f"{row['name']:<24}{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}"
+            f"{row['p99_ms']:>9.2f}{row['rps']:>9.1f}{row['round_trips']:>5}  {status}"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency", type=float, default=0.005, help="задержка бэкенда, с")
+    parser.add_argument("--jitter", type=float, default=0.0, help="случайная добавка к задержке, с")
+    parser.add_argument("--requests", type=int, default=200, help="запросов на сценарий")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--samples", type=int, default=3, help="последовательных запросов для подсчёта обращений")
+    parser.add_argument("--no-rpc", action="store_true", help="бэкенд без функций и колонок из sql/ (запасные пути)")
+    parser.add_argument("--shared-cache", action="store_true", help="кэши с общим уровнем SQLite (как в serve.py)")
+    parser.add_argument("--overhead-ms", type=float, help="общий бюджет p95 сверх задержки бэкенда, мс")
+    parser.add_argument("--only", nargs="*", help="запустить только эти сценарии")
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    report(results)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump([r.as_dict() for r in results], f, ensure_ascii=False, indent=2)
+    return 1 if any(r.violations for r in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Время холодного старта: от импорта main до первого ответа.
+
+    python -m bench.startup [--runs 5] [--backend memory|supabase]
+                            [--budget-ms 1500] [--json startup.json]
+
+Каждый прогон — новый интерпретатор (как новый воркер или --reload):
+импорт main, lifespan (хранилище, пул, шаблоны) и первый GET /login.
+Бэкенд supabase — локальная замена из bench.fake_supabase. Код выхода 1 —
+медиана «импорт → первый ответ» вышла за бюджет.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import jwt
+
+from bench.run import JWT_SECRET, start_fake
+
+
+# Выполняется в дочернем процессе; печатает замеры фаз в мс одной строкой JSON
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import httpx
+import main
+imported = time.perf_counter()
+
+async def probe():
+    async with main.lifespan(main.app):
+        ready = time.perf_counter()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            res = await client.get("/login")
+        answered = time.perf_counter()
+    return res.status_code, ready, answered
+
+status, ready, answered = asyncio.run(probe())
+print(json.dumps({
+    "status": status,
+    "import_ms": (imported - started) * 1000,
+    "lifespan_ms": (ready - imported) * 1000,
+    "first_response_ms": (answered - ready) * 1000,
+    "total_ms": (answered - started) * 1000,
+}))
+"""
+
+PHASES = ("import_ms", "lifespan_ms", "first_response_ms", "total_ms", "process_ms")
+
+
+def probe(env: dict) -> dict:
+    started = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Последняя строка — замеры; выше может быть лог старта воркера
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+    # Вместе с запуском интерпретатора
+    result["process_ms"] = (time.perf_counter() - started) * 1000
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--backend", choices=("memory", "supabase"), default="memory")
+    parser.add_argument("--latency", type=float, default=0.005, help="задержка замены Supabase, с")
+    parser.add_argument("--budget-ms", type=float, default=1500, help="бюджет медианы «импорт → первый ответ», мс")
+    parser.add_argument("--json", help="сохранить результаты в файл")
+    args = parser.parse_args()
+    args.jitter, args.no_rpc = 0.0, False
+
+    env = {**os.environ, "SUPABASE_JWT_SECRET": JWT_SECRET, "LOG_LEVEL": "WARNING"}
+    process = None
+    if args.backend == "supabase":
+        process, url, _ = start_fake(args)
+        env.update({
+            "STORAGE_BACKEND": "supabase",
+            "SUPABASE_URL": url,
+            "SUPABASE_ANON_KEY": jwt.encode({"role": "anon"}, JWT_SECRET, algorithm="HS256"),
+        })
+    else:
+        env["STORAGE_BACKEND"] = "memory"
+
+    try:
+        runs = [probe(env) for _ in range(args.runs)]
+    finally:
+        if process is not None:
+            process.terminate()
+
+    print(f"{'фаза':<20}{'медиана':>10}{'max':>10}")
+    print("─" * 40)
+    for phase in PHASES:
+        values = [r[phase] for r in runs]
+        print(f"{phase:<20}{statistics.median(values):>10.1f}{max(values):>10.1f}")
+
+    total = statistics.median(r["total_ms"] for r in runs)
+    violations = []
+    if any(r["status"] != 200 for r in runs):
+        violations.append("первый ответ не 200")
+    if total > args.budget_ms:
+        violations.append(f"импорт → первый ответ {total:.1f} мс > {args.budget_ms:.1f} мс")
+    print("ok" if not violations else "; ".join(violations))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"backend": args.backend, "runs": runs, "violations": violations}, f, indent=2)
+    return 1 if violations else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
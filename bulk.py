@@ -0,0 +1,227 @@
+import csv
+import io
+import json
+import math
+import re
+from typing import AsyncIterator, BinaryIO, Iterator, Optional, TextIO
+
+# Поля предмета, которые принимает импорт и отдаёт выгрузка
+ITEM_FIELDS = ("title", "description", "url", "price", "currency", "priority")
+EXPORT_FIELDS = ITEM_FIELDS + ("created_at",)
+FORMATS = ("csv", "json", "ndjson")
+# JSON читается кусками; одно значение (предмет) не может быть больше JSON_MAX_VALUE
+JSON_CHUNK = 64 * 1024
+JSON_MAX_VALUE = 1024 * 1024
+JSON_SPACE = re.compile(r"[ \t\r\n]*")
+
+
+def optional_text(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def clean_item(raw: dict) -> dict:
+    """Поля предмета по правилам формы add-item; ValueError — строка не годится."""
+    title = optional_text(raw.get("title"))
+    if not title:
+        raise ValueError("Не указано название")
+
+    price = raw.get("price")
+    if price is not None and str(price).strip() != "":
+        try:
+            price = float(str(price).strip().replace(",", "."))
+        except ValueError:
+            raise ValueError(f"Цена должна быть числом: {raw['price']}")
+        if not math.isfinite(price):
+            raise ValueError(f"Цена должна быть числом: {raw['price']}")
+    else:
+        price = None
+
+    priority = raw.get("priority")
+    if priority is None or str(priority).strip() == "":
+        priority = 3
+    else:
+        try:
+            priority = int(str(priority).strip())
+        except ValueError:
+            raise ValueError(f"Приоритет должен быть целым числом: {raw['priority']}")
+    if not 1 <= priority <= 5:
+        raise ValueError(f"Приоритет должен быть от 1 до 5: {priority}")
+
+    return {
+        "title": title,
+        "description": optional_text(raw.get("description")),
+        "url": optional_text(raw.get("url")),
+        "price": price,
+        "currency": optional_text(raw.get("currency")) or "€",
+        "priority": priority,
+    }
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    for kind in FORMATS:
+        if name.endswith("." + kind):
+            return kind
+    if name.endswith(".jsonl"):
+        return "ndjson"
+    content_type = (content_type or "").split(";")[0].strip()
+    return {
+        "text/csv": "csv",
+        "application/json": "json",
+        "application/x-ndjson": "ndjson",
+    }.get(content_type)
+
+
+def read_rows(stream: BinaryIO, kind: str) -> Iterator[dict]:
+    """Сырые строки файла по одной; все форматы читаются потоково.
+
+    JSON — массив предметов или выгрузка {"items": [...]}; ValueError —
+    файл дальше не разбирается (строки до ошибки уже отданы).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if kind == "csv":
+        yield from csv.DictReader(text)
+        return
+
+    if kind == "ndjson":
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"Строка {number}: некорректный JSON")
+            # Первая строка выгрузки — сам список, не предмет
+            if isinstance(row, dict) and "wishlist" in row:
+                continue
+            yield row
+        return
+
+    yield from read_json_items(JSONReader(text))
+
+
+class JSONReader:
+    """Разбор JSON по значениям: в памяти текущий кусок файла, а не весь файл."""
+
+    def __init__(self, text: TextIO):
+        self.text = text
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        # Дочитывает кусок, отбрасывая разобранное; False — файл кончился
+        if self.eof:
+            return False
+        chunk = self.text.read(JSON_CHUNK)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        # Следующий символ после пробелов; "" — конец файла
+        while True:
+            self.pos = JSON_SPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self.fill():
+                return self.buffer[self.pos:self.pos + 1]
+
+    def expect(self, chars: str) -> str:
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Некорректный JSON: ожидалось {' или '.join(repr(c) for c in chars)}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError as e:
+                # Значение могло оборваться на границе куска
+                if len(self.buffer) - self.pos <= JSON_MAX_VALUE and self.fill():
+                    continue
+                raise ValueError(f"Некорректный JSON: {e.msg}")
+            # Число у края куска тоже могло оборваться ("1." + "5") — разбираем с продолжением
+            tail = self.buffer[end:]
+            if isinstance(value, (int, float)) and all(c in "0123456789.eE+-" for c in tail) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def array(self) -> Iterator:
+        # Элементы массива после "[" — по одному, до "]"
+        if self.peek() == "]":
+            self.expect("]")
+            return
+        while True:
+            yield self.value()
+            if self.expect(",]") == "]":
+                return
+
+
+def read_json_items(reader: JSONReader) -> Iterator:
+    start = reader.peek()
+    if start == "[":
+        reader.expect("[")
+        yield from reader.array()
+    elif start == "{":
+        # Поля рядом с items пропускаются по одному значению
+        reader.expect("{")
+        found = False
+        if reader.peek() == "}":
+            reader.expect("}")
+        else:
+            while True:
+                key = reader.value()
+                if not isinstance(key, str):
+                    raise ValueError("Некорректный JSON: ключ объекта должен быть строкой")
+                reader.expect(":")
+                if key == "items":
+                    if reader.peek() != "[":
+                        raise ValueError("Ожидался массив предметов")
+                    reader.expect("[")
+                    yield from reader.array()
+                    found = True
+                else:
+                    reader.value()
+                if reader.expect(",}") == "}":
+                    break
+        if not found:
+            raise ValueError("Ожидался массив предметов")
+    else:
+        raise ValueError("Ожидался массив предметов")
+    if reader.peek():
+        raise ValueError("Некорректный JSON: лишние данные после массива")
+
+
+def export_row(item: dict) -> dict:
+    return {field: item.get(field) for field in EXPORT_FIELDS}
+
+
+async def export_ndjson(wishlist: dict, pages: AsyncIterator[list[dict]]) -> AsyncIterator[str]:
+    # Первая строка — список, дальше по предмету на строку
+    header = {k: wishlist.get(k) for k in ("id", "title", "description", "created_at")}
+    yield json.dumps({"wishlist": header}, ensure_ascii=False) + "\n"
+    async for page in pages:
+        yield "".join(json.dumps(export_row(i), ensure_ascii=False) + "\n" for i in page)
+
+
+async def export_csv(pages: AsyncIterator[list[dict]]) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    async for page in pages:
+        writer.writerows(export_row(i) for i in page)
+        # Буфер очищается после каждой страницы: в памяти не больше одной страницы
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,99 @@
+from collections import Counter
+from typing import Any, Hashable
+
+from cachetools import TTLCache
+
+
+MISSING = object()
+
+
+class ReadCache:
+    """Кэш чтений внутри процесса: ограничен по размеру, TTL + вытеснение LRU.
+
+    Ключи — кортежи вида (пространство, ...), например ("wishlist", id)
+    или ("public", cursor). Обработчики записи сбрасывают затронутые ключи
+    явно через invalidate()/invalidate_namespace().
+
+    shared (SharedCache) — второй уровень, общий для воркеров хоста: промах
+    здесь ищется там, а сброс ключа рассылается всем воркерам под именем name.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30, name: str = "read", shared=None):
+        self.entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.invalidations: Counter = Counter()
+        self.channel = f"invalidate:{name}"
+        self.shared = shared
+        if shared is not None:
+            shared.subscribe(self.channel, self.apply)
+
+    def get(self, key: tuple) -> Any:
+        if self.shared is not None:
+            # Сначала сбросы из других воркеров — локальная копия не переживает их
+            self.shared.poll()
+        value = self.entries.get(key, MISSING)
+        if value is MISSING and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not MISSING:
+                self.entries[key] = value
+        if value is MISSING:
+            self.misses[key[0]] += 1
+        else:
+            self.hits[key[0]] += 1
+        return value
+
+    def set(self, key: tuple, value: Any, share: bool = True) -> Any:
+        # share=False — значение дёшево получить заново, общий уровень не нужен
+        self.entries[key] = value
+        if share and self.shared is not None:
+            self.shared.set(key, value, self.entries.ttl)
+        return value
+
+    def invalidate(self, *keys: tuple) -> None:
+        self.drop(keys)
+        if self.shared is not None:
+            self.shared.delete(*keys)
+            self.shared.publish(self.channel, {"keys": keys})
+
+    def invalidate_namespace(self, namespace: Hashable) -> None:
+        self.drop_namespace(namespace)
+        if self.shared is not None:
+            self.shared.delete_namespace(namespace)
+            self.shared.publish(self.channel, {"namespace": namespace})
+
+    def drop(self, keys) -> None:
+        for key in keys:
+            if self.entries.pop(key, MISSING) is not MISSING:
+                self.invalidations[key[0]] += 1
+
+    def drop_namespace(self, namespace: Hashable) -> None:
+        self.drop([k for k in list(self.entries.keys()) if k[0] == namespace])
+
+    def apply(self, message: dict) -> None:
+        # Сброс, разосланный другим воркером: только локальная копия
+        if "namespace" in message:
+            self.drop_namespace(message["namespace"])
+        else:
+            self.drop(tuple(key) for key in message["keys"])
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict:
+        namespaces = set(self.hits) | set(self.misses) | set(self.invalidations)
+        return {
+            "size": self.entries.currsize,
+            "maxsize": self.entries.maxsize,
+            "ttl": self.entries.ttl,
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "namespaces": {
+                ns: {
+                    "hits": self.hits[ns],
+                    "misses": self.misses[ns],
+                    "invalidations": self.invalidations[ns],
+                }
+                for ns in sorted(namespaces, key=str)
+            },
+        }
@@ -0,0 +1,85 @@
+import gzip
+
+from starlette.datastructures import MutableHeaders
+
+from assets import accepted_encodings
+
+try:
+    import brotli
+except ImportError:  # Без brotli — только gzip
+    brotli = None
+
+
+# Сжимаются только страницы и JSON; статика уже лежит сжатой (assets.py),
+# выгрузки и SSE идут потоком
+COMPRESSIBLE_TYPES = ("text/html", "application/json", "text/plain")
+# Быстрые уровни: ответ сжимается на каждый запрос, а не один раз при сборке
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: br или gzip для HTML и JSON не меньше minimum_size байт.
+
+    Трогает только ответы одним сообщением (обычные Response) без своего
+    Content-Encoding; потоковые ответы и 304 проходят как есть.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        accepted = accepted_encodings(scope)
+        if brotli is not None and "br" in accepted:
+            encoding = "br"
+        elif "gzip" in accepted:
+            encoding = "gzip"
+        else:
+            return await self.app(scope, receive, send)
+
+        start = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, passthrough
+            if passthrough or message["type"] not in ("http.response.start", "http.response.body"):
+                return await send(message)
+
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                media_type = headers.get("content-type", "").split(";")[0].strip()
+                if "content-encoding" in headers or media_type not in COMPRESSIBLE_TYPES:
+                    passthrough = True
+                    return await send(message)
+                # Ждём тело: решение зависит от его размера
+                start = message
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False) or len(body) < self.minimum_size:
+                # Потоковый ответ или слишком маленький — без сжатия
+                passthrough = True
+                await send(start)
+                return await send(message)
+
+            packed = compress(body, encoding)
+            headers = MutableHeaders(raw=start["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(packed) < len(body):
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(packed))
+                body = packed
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
@@ -0,0 +1,133 @@
+import logging
+from typing import Optional
+
+import httpx
+from postgrest.exceptions import APIError
+from supabase import AsyncClient, AsyncClientOptions, acreate_client
+
+from metrics import InstrumentedTransport
+from singleflight import SingleFlight
+
+
+logger = logging.getLogger(__name__)
+
+
+class Database:
+    """Асинхронный клиент Supabase поверх общего пула HTTP/2-соединений.
+
+    Клиент создаётся один раз на воркер (в lifespan приложения) и
+    переиспользует соединения между запросами.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        key: str,
+        pool_size: int = 20,
+        timeout: float = 10.0,
+        connect_timeout: float = 5.0,
+        pool_timeout: float = 5.0,
+    ):
+        self.url = url
+        self.key = key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.pool_timeout = pool_timeout
+        self.http: Optional[httpx.AsyncClient] = None
+        self._client: Optional[AsyncClient] = None
+        # RPC, которых нет в базе (миграция из sql/ не применена)
+        self.missing_rpcs: set[str] = set()
+        # Колонки "таблица.колонка", которых нет в базе (то же самое для ALTER TABLE)
+        self.missing_columns: set[str] = set()
+        self.flights = SingleFlight()
+
+    async def connect(self) -> AsyncClient:
+        if self._client is not None:
+            return self._client
+        # Транспорт обёрнут в InstrumentedTransport: каждое обращение
+        # к PostgREST/Auth попадает в /metrics
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=self.pool_size,
+                max_keepalive_connections=self.pool_size,
+            ),
+        )
+        self.http = httpx.AsyncClient(
+            transport=InstrumentedTransport(transport),
+            # Таймауты действуют на каждый вызов PostgREST/Auth отдельно,
+            # pool — сколько ждать свободное соединение из пула
+            timeout=httpx.Timeout(
+                self.timeout, connect=self.connect_timeout, pool=self.pool_timeout
+            ),
+            follow_redirects=True,
+        )
+        self._client = await acreate_client(
+            self.url,
+            self.key,
+            options=AsyncClientOptions(httpx_client=self.http),
+        )
+        return self._client
+
+    async def warm(self) -> None:
+        # Первое соединение пула (TCP + TLS + HTTP/2) открывается при старте
+        # воркера, а не на первом запросе пользователя. Ответ не важен:
+        # недоступная база — не повод не стартовать
+        try:
+            await self.http.get(f"{self.url}/auth/v1/health", headers={"apikey": self.key})
+        except httpx.HTTPError as e:
+            logger.warning("Не удалось заранее открыть соединение с Supabase: %s", e)
+
+    async def close(self) -> None:
+        if self.http is not None:
+            await self.http.aclose()
+        self.http = None
+        self._client = None
+
+    @property
+    def client(self) -> AsyncClient:
+        if self._client is None:
+            raise RuntimeError("База не подключена: вызовите Database.connect()")
+        return self._client
+
+    @property
+    def auth(self):
+        return self.client.auth
+
+    def table(self, name: str):
+        return self.client.table(name)
+
+    def rpc(self, fn: str, params: Optional[dict] = None):
+        return self.client.rpc(fn, params or {})
+
+    async def call(self, fn: str, params: Optional[dict] = None):
+        # None — функция ещё не создана в базе, вызывающий идёт по запасному пути.
+        # PostgREST подбирает перегрузку по именам параметров, поэтому промах
+        # запоминается для сигнатуры, а не для имени функции
+        signature = f"{fn}({', '.join(sorted(params or {}))})"
+        if signature in self.missing_rpcs:
+            return None
+        try:
+            return await self.rpc(fn, params).execute()
+        except APIError as e:
+            if e.code != "PGRST202":
+                raise
+            self.missing_rpcs.add(signature)
+            return None
+
+    async def read(self, query):
+        # Одинаковые одновременные чтения (таблица, фильтры, порядок и токен)
+        # ждут один запрос к PostgREST и получают общий ответ
+        request = query.request
+        if request.http_method not in ("GET", "HEAD"):
+            return await query.execute()
+        key = (
+            request.http_method,
+            str(request.path),
+            str(request.params),
+            request.headers.get("Accept"),
+            request.headers.get("Prefer"),
+            request.headers.get("Authorization"),
+        )
+        return await self.flights.do(key, query.execute)
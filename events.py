@@ -0,0 +1,155 @@
+import asyncio
+import json
+from collections import deque
+from typing import AsyncIterator, Callable, Optional
+
+
+# Событие, которое получает подписчик, не успевший забрать очередь:
+# часть событий потеряна, страницу нужно перечитать
+RESYNC = {"type": "resync"}
+
+
+class Subscription:
+    """Один зритель списка: ограниченная очередь событий и флаг ожидания.
+
+    Простаивающее соединение держит только этот объект — без отдельной
+    задачи и asyncio.Queue; при переполнении старые события вытесняются,
+    а подписчик получает RESYNC.
+    """
+
+    __slots__ = ("topic", "is_owner", "user_id", "events", "overflowed", "ready")
+
+    def __init__(self, topic: str, is_owner: bool, maxsize: int, user_id: Optional[str] = None):
+        self.topic = topic
+        self.is_owner = is_owner
+        self.user_id = user_id
+        self.events: deque = deque(maxlen=maxsize)
+        self.overflowed = False
+        self.ready = asyncio.Event()
+
+    def push(self, event: dict) -> None:
+        if len(self.events) == self.events.maxlen:
+            self.overflowed = True
+        self.events.append(event)
+        self.ready.set()
+
+    def drain(self) -> list[dict]:
+        if self.overflowed:
+            events = [RESYNC]
+        else:
+            events = list(self.events)
+        self.events.clear()
+        self.overflowed = False
+        self.ready.clear()
+        return events
+
+
+class Hub:
+    """Pub/sub внутри процесса воркера: topic (id списка) → подписчики.
+
+    publish() не ждёт медленных подписчиков: событие кладётся в очередь
+    каждого и будит его поток SSE. relay(topic, event, owner_only) — пересылка
+    другим воркерам; то, что пришло от них, раздаётся через deliver().
+    """
+
+    def __init__(self, queue_size: int = 32, max_subscribers: int = 10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.topics: dict[str, set[Subscription]] = {}
+        self.count = 0
+        self.published = 0
+        self.resyncs = 0
+        self.relay: Optional[Callable[[str, dict, bool], None]] = None
+
+    def full(self) -> bool:
+        # Воркер уже держит max_subscribers соединений
+        return self.count >= self.max_subscribers
+
+    def subscribe(self, topic: str, is_owner: bool = False, user_id: Optional[str] = None) -> Optional[Subscription]:
+        # None — мест нет (full())
+        if self.full():
+            return None
+        sub = Subscription(topic, is_owner, self.queue_size, user_id)
+        self.topics.setdefault(topic, set()).add(sub)
+        self.count += 1
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        subs = self.topics.get(sub.topic)
+        if subs is None or sub not in subs:
+            return
+        subs.discard(sub)
+        self.count -= 1
+        if not subs:
+            del self.topics[sub.topic]
+
+    def publish(self, topic: str, event: dict, owner_only: bool = False) -> int:
+        if self.relay is not None:
+            self.relay(topic, event, owner_only)
+        return self.deliver(topic, event, owner_only)
+
+    def deliver(self, topic: str, event: dict, owner_only: bool = False) -> int:
+        delivered = 0
+        for sub in self.topics.get(topic, ()):
+            if owner_only and not sub.is_owner:
+                continue
+            if len(sub.events) == sub.events.maxlen and not sub.overflowed:
+                self.resyncs += 1
+            sub.push(event)
+            delivered += 1
+        self.published += 1
+        return delivered
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self.count,
+            "topics": len(self.topics),
+            "published": self.published,
+            "resyncs": self.resyncs,
+        }
+
+
+def for_viewer(event: dict, sub: Subscription) -> dict:
+    # id бронирующего не уходит зрителям (в том числе анонимным):
+    # каждый получает только mine — его ли это бронь
+    if "reserved_by" not in event:
+        return event
+    event = dict(event)
+    reserved_by = event.pop("reserved_by")
+    event["mine"] = reserved_by is not None and reserved_by == sub.user_id
+    return event
+
+
+def format_event(event: dict) -> str:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def stream(
+    hub: Hub, topic: str, is_owner: bool = False, user_id: Optional[str] = None, heartbeat: float = 15
+) -> AsyncIterator[str]:
+    """Поток SSE одного подписчика; при отключении клиента генератор
+    отменяется и подписка снимается.
+
+    Подписка создаётся в самом генераторе, сразу перед try: если клиент
+    ушёл до первой итерации, генератор не запускался и очереди нет.
+    """
+    sub = hub.subscribe(topic, is_owner=is_owner, user_id=user_id)
+    if sub is None:
+        # Места заняли после проверки в обработчике — EventSource переподключится
+        yield "retry: 3000\n\n"
+        return
+    try:
+        # retry — через сколько мс EventSource переподключится после обрыва
+        yield "retry: 3000\n\n"
+        while True:
+            try:
+                # asyncio.timeout, а не wait_for: ожидание без лишней задачи на соединение
+                async with asyncio.timeout(heartbeat):
+                    await sub.ready.wait()
+            except TimeoutError:
+                # Комментарий SSE: держит соединение живым через прокси
+                yield ": ping\n\n"
+                continue
+            yield "".join(format_event(for_viewer(e, sub)) for e in sub.drain())
+    finally:
+        hub.unsubscribe(sub)
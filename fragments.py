@@ -0,0 +1,46 @@
+from jinja2 import Environment
+from markupsafe import Markup
+
+from cache import MISSING, ReadCache
+
+
+class FragmentCache:
+    """Готовый HTML повторяющихся карточек (предмет, список) внутри процесса.
+
+    В шаблоне: {{ fragment("wishlist_item_card.html", item=item, is_owner=is_owner) }}.
+    Ключ — имя шаблона и весь контекст фрагмента: строка (dict) входит как
+    id и версия, остальное (роль зрителя) — как есть. Поэтому во фрагмент
+    передаётся только то, от чего зависит его разметка, а изменённая строка
+    получает новый ключ — сбрасывать ничего не нужно.
+    """
+
+    def __init__(self, env: Environment, maxsize: int = 20000, ttl: float = 3600):
+        self.env = env
+        self.cache = ReadCache(maxsize=maxsize, ttl=ttl, name="fragments")
+        env.globals["fragment"] = self.render
+
+    def render(self, name: str, **context) -> Markup:
+        key = (name, *((k, row_version(v) if isinstance(v, dict) else v) for k, v in sorted(context.items())))
+        # Шаблон в ключе не участвует, но сверяется: после правки файла
+        # (auto_reload) Jinja отдаёт новый объект, и фрагмент рисуется заново
+        template = self.env.get_template(name)
+        cached = self.cache.get(key)
+        if cached is not MISSING and cached[0] is template:
+            return cached[1]
+        html = Markup(template.render(**context))
+        self.cache.set(key, (template, html))
+        return html
+
+    def stats(self) -> dict:
+        return self.cache.stats()
+
+
+def row_version(row: dict) -> tuple:
+    # Колонка version, если она есть (wishlists после sql/008_wishlist_version.sql),
+    # иначе отпечаток содержимого строки: кэш живёт в одном процессе, встроенного
+    # hash хватает. repr зависит от порядка ключей, но строки одной выборки
+    # приходят с одинаковым порядком — в худшем случае лишний промах
+    version = row.get("version")
+    if version is None:
+        version = hash(repr(row))
+    return str(row.get("id")), version
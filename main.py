@@ -1,144 +1,501 @@
-import os
-from fastapi import FastAPI, Request, Form, HTTPException
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from supabase import create_client, Client
+import asyncio
+import base64
+import csv
+import hashlib
+import hmac
+import json
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Body, FastAPI, Request, File, Form, HTTPException, Query, UploadFile
+from fastapi.responses import (
+    HTMLResponse,
+    JSONResponse,
+    PlainTextResponse,
+    RedirectResponse,
+    Response,
+    StreamingResponse,
+)
 from datetime import datetime, date
 from dateutil.relativedelta import relativedelta
-from dotenv import load_dotenv
-from fastapi.staticfiles import StaticFiles
+from jinja2 import FileSystemBytecodeCache
+
+from assets import AssetFiles, Assets
+from auth import TokenVerifier
+from bulk import clean_item, detect_format, export_csv, export_ndjson, read_rows
+from cache import MISSING, ReadCache
+from compression import CompressionMiddleware
+from events import Hub, stream as event_stream
+from fragments import FragmentCache
+from metrics import AUTH_SECONDS, REGISTRY, MetricsMiddleware, TimedTemplates
+from profiling import ProfilingMiddleware
+from recurrence import describe as describe_recurrence, resolve_rule
+from settings import Settings
+from shared_cache import SharedCache, run_poller
+from storage import (
+    FORBIDDEN,
+    NOT_FOUND,
+    RELEASED,
+    RESERVED,
+    TAKEN,
+    AuthError,
+    Storage,
+    create_storage,
+)
+
+
+logger = logging.getLogger("wishlist")
+
+
+def build_storage(settings: Settings) -> Storage:
+    if settings.storage_backend == "memory":
+        # Локальный бэкенд без Supabase: для разработки и бенчмарков
+        return create_storage(
+            "memory", jwt_secret=settings.supabase_jwt_secret, seed_path=settings.memory_seed
+        )
+
+    if not settings.supabase_url or not settings.supabase_anon_key:
+        raise ValueError("SUPABASE_URL и SUPABASE_ANON_KEY должны быть в .env")
+
+    return create_storage(
+        settings.storage_backend,
+        url=settings.supabase_url,
+        key=settings.supabase_anon_key,
+        pool_size=settings.db_pool_size,
+        timeout=settings.db_timeout,
+        pool_timeout=settings.db_pool_timeout,
+    )
+
+
+def build_templates(settings: Settings, assets: Assets) -> TimedTemplates:
+    templates = TimedTemplates(directory=settings.templates_dir)
+    if settings.template_cache_dir:
+        # Байткод по имени и контрольной сумме исходника: новый воркер не компилирует
+        # шаблоны заново, а изменённый шаблон просто получает новую запись
+        Path(settings.template_cache_dir).mkdir(mode=0o700, parents=True, exist_ok=True)
+        templates.env.bytecode_cache = FileSystemBytecodeCache(settings.template_cache_dir)
+    templates.env.filters["recurrence"] = describe_recurrence
+    templates.env.globals["static"] = assets.url
+    # Все шаблоны компилируются при старте воркера, а не на первом запросе к странице
+    for name in templates.env.list_templates(extensions=["html"]):
+        templates.env.get_template(name)
+    return templates
+
+
+def render_fingerprint(templates: TimedTemplates, assets: Assets) -> str:
+    digest = hashlib.sha1()
+    for name in sorted(templates.env.list_templates(extensions=["html"])):
+        source, _, _ = templates.env.loader.get_source(templates.env, name)
+        digest.update(f"{name}\0{source}\0".encode())
+    digest.update(json.dumps(assets.files, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+class AppState:
+    """Состояние одного приложения: клиент хранилища, шаблоны, кэши и SSE.
+
+    Создаётся в lifespan и лежит в app.state.ctx; обработчики берут его
+    через app_state(request), вспомогательные функции — параметром state.
+    """
+
+    def __init__(self, settings: Settings, assets: Assets):
+        self.settings = settings
+        # Второй уровень кэшей и рассылка между воркерами (None — один процесс)
+        self.shared = SharedCache(settings.shared_cache_path) if settings.shared_cache_path else None
+        self.storage = build_storage(settings)
+        self.templates = build_templates(settings, assets)
+        # Отпечаток шаблонов и статики: входит в ETag страниц, чтобы после выкладки
+        # браузер не получил 304 на страницу в старой разметке
+        self.render_version = render_fingerprint(self.templates, assets)
+        # Готовый HTML карточек предметов и списков (fragment() в шаблонах)
+        self.fragment_cache = FragmentCache(
+            self.templates.env, maxsize=settings.fragment_cache_size, ttl=settings.fragment_cache_ttl
+        )
+        # Есть ли у строк wishlists колонка version (sql/008_wishlist_version.sql);
+        # без неё условный запрос не ждёт строку списка отдельно от предметов
+        self.versioned = True
+        self.token_verifier = TokenVerifier(
+            settings.supabase_url or "",
+            jwt_secret=settings.supabase_jwt_secret or self.storage.jwt_secret,
+            cache_size=settings.auth_cache_size,
+            cache_ttl=settings.auth_cache_ttl,
+            shared=self.shared,
+        )
+        # Публичная лента и снимки публичных вишлистов (список + предметы)
+        self.read_cache = ReadCache(
+            maxsize=settings.read_cache_size, ttl=settings.read_cache_ttl, name="read", shared=self.shared
+        )
+        # wishlist_id → owner_id: владелец списка не меняется, сбрасываем только при удалении
+        self.owner_cache = ReadCache(
+            maxsize=settings.owner_cache_size, ttl=settings.owner_cache_ttl, name="owners", shared=self.shared
+        )
+        # Живые обновления открытых страниц списков (/wishlist/{id}/events)
+        self.hub = Hub(queue_size=settings.sse_queue_size, max_subscribers=settings.sse_max_subscribers)
+
+    def relay_event(self, topic: str, event: dict, owner_only: bool) -> None:
+        self.shared.publish("events", {"topic": topic, "event": event, "owner_only": owner_only})
+
+    def deliver_event(self, message: dict) -> None:
+        self.hub.deliver(message["topic"], message["event"], message["owner_only"])
+
+
+def app_state(request: Request) -> AppState:
+    return request.app.state.ctx
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Клиент хранилища (и пул соединений), шаблоны и кэши — по одному на приложение
+    started = time.perf_counter()
+    state = app.state.ctx = AppState(app.state.settings, app.state.assets)
+
+    poller = None
+    if state.shared is not None:
+        # События SSE из других воркеров — зрителям, подключённым к этому
+        state.hub.relay = state.relay_event
+        state.shared.subscribe("events", state.deliver_event)
+        poller = asyncio.create_task(run_poller(state.shared, state.settings.shared_cache_poll))
+
+    await state.storage.connect()
+    try:
+        await state.storage.warm()
+        logger.info("Воркер готов за %.0f мс", (time.perf_counter() - started) * 1000)
+        yield
+    finally:
+        if poller is not None:
+            poller.cancel()
+        await state.storage.close()
+        if state.shared is not None:
+            state.shared.close()
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Приложение с настройками settings (по умолчанию — из окружения).
+
+    Состояние каждого приложения своё (AppState в app.state), поэтому
+    приложений в процессе может быть несколько — например, в тестах.
+    """
+    settings = settings or Settings.from_env()
+
+    logging.basicConfig(
+        level=settings.log_level,
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    # httpx пишет каждый запрос к Supabase на INFO; они и так есть в логе медленных запросов
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    app = FastAPI(title="Wishlist App", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.assets = Assets(settings.assets_dir)
+    # Первым — значит ближе всех к обработчикам: сжатие входит во время запроса
+    app.add_middleware(CompressionMiddleware, minimum_size=settings.compress_min_size)
+    app.add_middleware(MetricsMiddleware)
+    app.add_middleware(
+        ProfilingMiddleware,
+        slow_ms=settings.slow_request_ms,
+        profile_token=settings.profile_token,
+        profile_dir=settings.profile_dir,
+    )
+    app.add_exception_handler(httpx.TimeoutException, backend_timeout)
+    app.mount(
+        "/static",
+        AssetFiles(app.state.assets, directory=settings.assets_dir, fallback=settings.static_dir),
+        name="static",
+    )
+    app.include_router(router)
+    app.include_router(api)
+    return app
+
+
+def invalidate_wishlist(state: AppState, wishlist_id: str, feed: bool = False):
+    # Вызывается обработчиками записи; feed=True — изменилась карточка в /public
+    state.read_cache.invalidate(("wishlist", str(wishlist_id)))
+    if feed:
+        state.read_cache.invalidate_namespace("public")
+
 
-app = FastAPI(title="Wishlist App")
-app.mount("/static", StaticFiles(directory="static"), name="static")
-templates = Jinja2Templates(directory="templates")
+def item_event(item: dict) -> dict:
+    # Поля предмета для зрителей страницы — то, что рисует карточка
+    # Кто забронировал, зрителям не сообщается — только факт брони
+    fields = ("id", "title", "url", "price", "currency", "description", "priority", "suggested_by")
+    event = {k: item.get(k) for k in fields}
+    event["reserved"] = bool(item.get("reserved_by"))
+    return {"type": "item_added", "item": event}
 
 
-load_dotenv()
+# Условные GET: no-cache — браузер хранит ответ, но каждый раз сверяет ETag
+REVALIDATE = "private, no-cache"
 
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_ANON_KEY = os.getenv("SUPABASE_ANON_KEY")
-TELEGRAM_BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 
-if not SUPABASE_URL or not SUPABASE_ANON_KEY:
-    raise ValueError("SUPABASE_URL и SUPABASE_ANON_KEY должны быть в .env")
+def page_etag(state: AppState, *parts) -> str:
+    # Версия данных и зритель → слабый ETag (тело сжимается по-разному)
+    raw = "|".join(str(p) for p in (state.render_version, *parts))
+    return f'W/"{hashlib.sha1(raw.encode()).hexdigest()[:16]}"'
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_ANON_KEY)
 
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return "*" in tags or etag.removeprefix("W/") in tags
 
 
-def get_current_user(request: Request):
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+def conditional(request: Request, response: Response, etag: Optional[str] = None) -> Response:
+    # Без версии данных ETag считается по готовому телу: рендер остаётся,
+    # но повторно тело не отправляется
+    if etag is None:
+        etag = f'W/"{hashlib.sha1(response.body).hexdigest()[:16]}"'
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = REVALIDATE
+    return response
+
+
+def remember_owner(state: AppState, wishlist: dict):
+    state.owner_cache.set(("owner", str(wishlist["id"])), str(wishlist["user_id"]))
+
+
+async def wishlist_owner(state: AppState, wishlist_id: str):
+    owner = state.owner_cache.get(("owner", wishlist_id))
+    if owner is MISSING:
+        owner = await state.storage.wishlists.owner(wishlist_id)
+        if owner is None:
+            return None
+        state.owner_cache.set(("owner", wishlist_id), owner)
+    return owner
+
+
+async def require_owner(state: AppState, wishlist_id: str, user, message: str = "Это не ваш список"):
+    # Проверка владельца без похода в базу, если владелец уже известен процессу
+    if await wishlist_owner(state, wishlist_id) != str(user.id):
+        raise HTTPException(403, message)
+
+
+async def get_current_user(request: Request, remote: bool = False):
+    # По умолчанию токен проверяется локально (подпись + exp) и кэшируется.
+    # remote=True — для действий, где важен отзыв сессии: идём в Auth API.
+    state = app_state(request)
     token = request.cookies.get("access_token")
     if not token:
         return None
-    try:
-        response = supabase.auth.get_user(token)
-        return response.user
-    except Exception:
+
+    started = time.perf_counter()
+    if not remote and state.token_verifier.can_verify(token):
+        user = await state.token_verifier.verify(token)
+        if user is not None:
+            AUTH_SECONDS.observe(time.perf_counter() - started, "local")
+            return user
+        # Истёкший токен не спасёт и Auth API; иначе (ключ, JWKS, подпись)
+        # решает Auth API, а не выход из аккаунта
+        if state.token_verifier.expired(token):
+            return None
+
+    if not remote:
+        cached = state.token_verifier.cached(token)
+        if cached:
+            AUTH_SECONDS.observe(time.perf_counter() - started, "cached")
+            return cached
+
+    user = await state.storage.auth.get_user(token)
+    AUTH_SECONDS.observe(time.perf_counter() - started, "remote")
+    if not user:
+        state.token_verifier.forget(token)
         return None
+    return state.token_verifier.remember(token, user)
+
+
+async def backend_timeout(request: Request, exc: httpx.TimeoutException):
+    return PlainTextResponse("База данных не ответила вовремя", status_code=504)
+
+
+router = APIRouter()
+
 
+# ── Служебное ────────────────────────────────────────────────────────────
+@router.get("/cache/stats")
+async def cache_stats(request: Request):
+    # Ключи кэшей, хранилище и подписчики SSE — только с токеном профилирования:
+    # Authorization: Bearer <PROFILE_TOKEN>; без PROFILE_TOKEN страницы нет
+    state = app_state(request)
+    token = state.settings.profile_token
+    given = request.headers.get("authorization", "").encode()
+    if not token or not hmac.compare_digest(given, f"Bearer {token}".encode()):
+        raise HTTPException(404)
+    return {
+        **state.read_cache.stats(),
+        "owners": state.owner_cache.stats(),
+        "storage": state.storage.stats(),
+        "events": state.hub.stats(),
+        "auth": state.token_verifier.cache.stats(),
+        "fragments": state.fragment_cache.stats(),
+        "shared": state.shared.stats() if state.shared is not None else None,
+    }
+
+
+@router.get("/metrics")
+async def metrics():
+    # Формат Prometheus text exposition 0.0.4; метрики — на процесс воркера
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
-@app.get("/", response_class=HTMLResponse)
+
+# ── Главная ──────────────────────────────────────────────────────────────
+@router.get("/", response_class=HTMLResponse)
 async def root(request: Request):
-    user = get_current_user(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
     return RedirectResponse("/wishlist")
 
 
 # ── Аутентификация ───────────────────────────────────────────────────────
-@app.get("/login", response_class=HTMLResponse)
+@router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
+    state = app_state(request)
+    return state.templates.TemplateResponse("login.html", {"request": request})
 
 
-@app.post("/login")
+@router.post("/login")
 async def login(request: Request, email: str = Form(...), password: str = Form(...)):
+    state = app_state(request)
     try:
-        res = supabase.auth.sign_in_with_password({"email": email, "password": password})
-        if not res.session:
-            raise Exception("Не удалось войти")
+        access_token, expires_in = await state.storage.auth.sign_in(email, password)
         response = RedirectResponse("/wishlist", status_code=303)
         response.set_cookie(
             key="access_token",
-            value=res.session.access_token,
+            value=access_token,
             httponly=True,
-            max_age=res.session.expires_in,
+            max_age=expires_in,
             secure=False,
             samesite="lax"
         )
         return response
-    except Exception as e:
+    except AuthError as e:
         msg = "Неверный email или пароль" if "invalid" in str(e).lower() else str(e)
-        return templates.TemplateResponse(
+        return state.templates.TemplateResponse(
             "login.html", {"request": request, "error": msg}, status_code=400
         )
 
 
-@app.get("/register", response_class=HTMLResponse)
+@router.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+    state = app_state(request)
+    return state.templates.TemplateResponse("register.html", {"request": request})
 
 
-@app.post("/register")
+@router.post("/register")
 async def register(
     request: Request,
     email: str = Form(...),
     password: str = Form(...),
     password_confirm: str = Form(...)
 ):
+    state = app_state(request)
     if password != password_confirm:
-        return templates.TemplateResponse(
+        return state.templates.TemplateResponse(
             "register.html",
             {"request": request, "error": "Пароли не совпадают"},
             status_code=400
         )
     try:
-        supabase.auth.sign_up({"email": email, "password": password})
-        return templates.TemplateResponse(
+        await state.storage.auth.sign_up(email, password)
+        return state.templates.TemplateResponse(
             "register_success.html",
             {"request": request, "email": email}
         )
-    except Exception as e:
+    except AuthError as e:
         msg = "Пользователь уже существует" if "duplicate" in str(e).lower() else str(e)
-        return templates.TemplateResponse(
+        return state.templates.TemplateResponse(
             "register.html",
             {"request": request, "error": msg},
             status_code=400
         )
 
 
-@app.get("/logout")
-async def logout():
+@router.get("/logout")
+async def logout(request: Request):
+    state = app_state(request)
+    token = request.cookies.get("access_token")
+    if token:
+        state.token_verifier.forget(token)
     resp = RedirectResponse("/login")
     resp.delete_cookie("access_token")
     return resp
 
 
 # ── Публичные списки ─────────────────────────────────────────────────────
-@app.get("/public", response_class=HTMLResponse)
-async def public_wishlists(request: Request):
-    result = (
-        supabase.table("wishlists")
-        .select("id, title, description, created_at, user_id")
-        .eq("is_shared", True)
-        .order("created_at", desc=True)
-        .execute()
-    )
-    
-    return templates.TemplateResponse(
-        "public_wishlists.html",
+def encode_cursor(row: dict) -> str:
+    raw = f"{row['created_at']}|{row['id']}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, str]:
+    # Части курсора подставляются в фильтр PostgREST (list_public): принимаем
+    # только настоящие дату и UUID, иначе курсор мог бы дописать условие
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, wishlist_id = raw.split("|", 1)
+        datetime.fromisoformat(created_at)
+        wishlist_id = str(uuid.UUID(wishlist_id))
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "Неверный курсор страницы")
+    return created_at, wishlist_id
+
+
+@router.get("/public", response_class=HTMLResponse)
+async def public_wishlists(request: Request, after: str = None, partial: bool = False):
+    state = app_state(request)
+    page = state.read_cache.get(("public", after or ""))
+    if page is MISSING:
+        page = state.read_cache.set(("public", after or ""), await fetch_public_page(state, after))
+    wishlists, next_cursor = page
+
+    # Страница одна для всех зрителей: ETag по её данным, 304 — без рендера
+    etag = page_etag(state, "public", after, partial, json.dumps(page, sort_keys=True, default=str))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # partial=1 — только карточки и ссылка дальше, для бесконечной прокрутки
+    template = "public_wishlists_cards.html" if partial else "public_wishlists.html"
+    response = state.templates.TemplateResponse(
+        template,
         {
             "request": request,
-            "wishlists": result.data or []
+            "wishlists": wishlists,
+            "next_cursor": next_cursor,
+            "is_first_page": not after
         }
     )
+    return conditional(request, response, etag)
+
+
+async def fetch_public_page(state: AppState, after: str = None):
+    cursor = decode_cursor(after) if after else None
+    wishlists = await state.storage.wishlists.list_public(cursor, state.settings.public_page_size + 1)
+
+    next_cursor = None
+    if len(wishlists) > state.settings.public_page_size:
+        wishlists = wishlists[:state.settings.public_page_size]
+        next_cursor = encode_cursor(wishlists[-1])
+
+    return wishlists, next_cursor
 
 
 # ── Календарь праздников ──────────────────────────────────────────────────
-@app.get("/calendar", response_class=HTMLResponse)
+@router.get("/calendar", response_class=HTMLResponse)
 async def calendar_view(request: Request, month: int = None, year: int = None):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
@@ -149,29 +506,14 @@ async def calendar_view(request: Request, month: int = None, year: int = None):
     start_date = date(target_year, target_month, 1)
     end_date = start_date + relativedelta(months=1) - relativedelta(days=1)
 
-    holidays_res = supabase.table("holidays")\
-        .select("id, title, date, description")\
-        .eq("user_id", user.id)\
-        .gte("date", start_date.isoformat())\
-        .lte("date", end_date.isoformat())\
-        .order("date")\
-        .execute()
+    # Праздники месяца вместе с привязанными вишлистами — одним запросом
+    holidays = await state.storage.holidays.in_range(user.id, start_date, end_date)
 
     calendar_data = {}
-    for h in holidays_res.data or []:
-        d = h["date"]
-        if d not in calendar_data:
-            calendar_data[d] = []
+    for h in holidays:
+        calendar_data.setdefault(h["date"], []).append(h)
 
-        links_res = supabase.table("holiday_wishlists")\
-            .select("wishlist_id, wishlists(title)")\
-            .eq("holiday_id", h["id"])\
-            .execute()
-
-        h["holiday_wishlists"] = links_res.data or []
-        calendar_data[d].append(h)
-
-    return templates.TemplateResponse("calendar.html", {
+    return state.templates.TemplateResponse("calendar.html", {
         "request": request,
         "current_month": target_month,
         "current_year": target_year,
@@ -182,57 +524,88 @@ async def calendar_view(request: Request, month: int = None, year: int = None):
 
 
 # ── API для календаря (цветные точки) ─────────────────────────────────────
-@app.get("/calendar/events/{year}/{month}")
+@router.get("/calendar/events/{year}/{month}")
 async def get_calendar_events(year: int, month: int, request: Request):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return {}
 
     start = date(year, month, 1)
     end = start + relativedelta(months=1) - relativedelta(days=1)
 
-    res = supabase.table("holidays")\
-        .select("date, holiday_wishlists(count)")\
-        .eq("user_id", user.id)\
-        .gte("date", start.isoformat())\
-        .lte("date", end.isoformat())\
-        .execute()
+    counts = await state.storage.holidays.counts(user.id, start, end)
+
+    return conditional(request, JSONResponse(
+        {d.split('-')[2].lstrip('0'): count for d, count in counts.items()}
+    ))
 
-    counts = {}
-    for h in res.data or []:
-        day = h["date"].split('-')[2].lstrip('0')
-        counts[day] = h["holiday_wishlists"][0]["count"]
 
-    return counts
+def parse_month(value: str) -> date:
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(400, "Неверный формат месяца (YYYY-MM)")
+
+
+@router.get("/calendar/events")
+async def get_calendar_events_range(request: Request, from_: str = Query(..., alias="from"), to: str = None):
+    # Счётчики по дням сразу для нескольких месяцев одним запросом:
+    # {"2026-01": {"7": 2}, "2026-02": {}, ...} — пустые месяцы тоже в ответе,
+    # чтобы клиент их закэшировал
+    state = app_state(request)
+    user = await get_current_user(request)
+    if not user:
+        return {}
 
+    start = parse_month(from_)
+    last = parse_month(to) if to else start
+    months = (last.year - start.year) * 12 + last.month - start.month + 1
+    if months < 1 or months > state.settings.calendar_range_months:
+        raise HTTPException(400, f"Диапазон — от 1 до {state.settings.calendar_range_months} месяцев")
+    end = last + relativedelta(months=1) - relativedelta(days=1)
 
-@app.get("/calendar/add", response_class=HTMLResponse)
+    counts = await state.storage.holidays.counts(user.id, start, end)
+
+    result = {
+        (start + relativedelta(months=n)).strftime("%Y-%m"): {}
+        for n in range(months)
+    }
+    for d, count in sorted(counts.items()):
+        year, month, day = d.split('-')
+        result[f"{year}-{month}"][day.lstrip('0')] = count
+
+    body = json.dumps(result, separators=(",", ":"))
+    return conditional(request, Response(body, media_type="application/json"))
+
+
+@router.get("/calendar/add", response_class=HTMLResponse)
 async def add_holiday_form(request: Request):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
-    wishlists_res = supabase.table("wishlists")\
-        .select("id, title")\
-        .eq("user_id", user.id)\
-        .execute()
+    wishlists = await state.storage.wishlists.list_for_user(user.id, "id, title")
 
-    return templates.TemplateResponse("add_holiday.html", {
+    return state.templates.TemplateResponse("add_holiday.html", {
         "request": request,
-        "wishlists": wishlists_res.data or [],
+        "wishlists": wishlists,
         "preselected_date": request.query_params.get("date")
     })
 
 
-@app.post("/calendar/add")
+@router.post("/calendar/add")
 async def add_holiday(
     request: Request,
     title: str = Form(...),
     date_str: str = Form(...),
     description: str = Form(None),
-    wishlist_ids: list[str] = Form(None)
+    wishlist_ids: list[str] = Form(None),
+    recurrence: str = Form(None)
 ):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
@@ -241,83 +614,61 @@ async def add_holiday(
     except:
         raise HTTPException(400, "Неверный формат даты (YYYY-MM-DD)")
 
-    holiday_res = supabase.table("holidays").insert({
-        "user_id": user.id,
-        "title": title.strip(),
-        "date": holiday_date.isoformat(),
-        "description": description.strip() if description else None
-    }).execute()
-
-    holiday_id = holiday_res.data[0]["id"]
-
-    if wishlist_ids:
-        valid_res = supabase.table("wishlists")\
-            .select("id")\
-            .eq("user_id", user.id)\
-            .in_("id", wishlist_ids)\
-            .execute()
-
-        valid_ids = {w["id"] for w in valid_res.data or []}
-
-        for wid in wishlist_ids:
-            if wid in valid_ids:
-                supabase.table("holiday_wishlists").insert({
-                    "holiday_id": holiday_id,
-                    "wishlist_id": wid
-                }).execute()
-            else:
-                print(f"Пропущен недействительный wishlist_id: {wid}")
+    # Вариант из формы ("monthly:last") → правило по дате ("monthly:last-fri")
+    try:
+        rule = resolve_rule(recurrence, holiday_date) if recurrence else None
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    await state.storage.holidays.create(
+        user.id,
+        title.strip(),
+        holiday_date,
+        description.strip() if description else None,
+        wishlist_ids or [],
+        rule,
+    )
 
     return RedirectResponse("/calendar", status_code=303)
 
 
 # ── Поделиться вишлистом через Telegram ──────────────────────────────────
-@app.get("/share-via-telegram", response_class=HTMLResponse)
+@router.get("/share-via-telegram", response_class=HTMLResponse)
 async def share_via_telegram_form(request: Request):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
-    wishlists = supabase.table("wishlists")\
-        .select("id, title")\
-        .eq("user_id", user.id)\
-        .execute()
+    wishlists = await state.storage.wishlists.list_for_user(user.id, "id, title")
 
-    return templates.TemplateResponse("share_telegram_simple.html", {
+    return state.templates.TemplateResponse("share_telegram_simple.html", {
         "request": request,
-        "wishlists": wishlists.data or []
+        "wishlists": wishlists
     })
 
 
-@app.post("/share-via-telegram")
+@router.post("/share-via-telegram")
 async def generate_telegram_link(
     request: Request,
     wishlist_id: str = Form(...),
     telegram_username: str = Form(...)
 ):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
     # Проверяем вишлист
-    wl = supabase.table("wishlists")\
-        .select("id, title, is_shared")\
-        .eq("id", wishlist_id)\
-        .eq("user_id", user.id)\
-        .single()\
-        .execute()
-
-    if not wl.data:
-        raise HTTPException(404, "Вишлист не найден или не ваш")
+    wishlist = await state.storage.wishlists.get_owned(wishlist_id, user.id)
 
-    wishlist = wl.data
+    if not wishlist:
+        raise HTTPException(404, "Вишлист не найден или не ваш")
 
     # Делаем публичным
     if not wishlist["is_shared"]:
-        supabase.table("wishlists")\
-            .update({"is_shared": True})\
-            .eq("id", wishlist_id)\
-            .execute()
+        await state.storage.wishlists.share(wishlist_id, user.id)
+        invalidate_wishlist(state, wishlist_id, feed=True)
 
     # Формируем ссылку на вишлист
     base_url = str(request.base_url).rstrip('/')
@@ -342,50 +693,58 @@ async def generate_telegram_link(
 
 
 # ── Мои списки ───────────────────────────────────────────────────────────
-@app.get("/wishlist", response_class=HTMLResponse)
+@router.get("/wishlist", response_class=HTMLResponse)
 async def my_wishlists(request: Request):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
-    result = supabase.table("wishlists")\
-        .select("*")\
-        .eq("user_id", user.id)\
-        .order("created_at", desc=True)\
-        .execute()
+    # Карточки с числом подарков, броней и суммами по валютам — одним запросом
+    wishlists = await state.storage.wishlists.overview(user.id)
 
-    return templates.TemplateResponse("wishlist.html", {
+    for wl in wishlists:
+        remember_owner(state, wl)
+
+    return state.templates.TemplateResponse("wishlist.html", {
         "request": request,
-        "wishlists": result.data or [],
+        "wishlists": wishlists,
         "user_email": user.email
     })
 
 
-@app.post("/wishlist/create")
+@router.post("/wishlist/create")
 async def create_wishlist(request: Request, title: str = Form(...), description: str = Form(None)):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
-    supabase.table("wishlists").insert({
-        "user_id": user.id,
-        "title": title.strip(),
-        "description": description.strip() if description else None
-    }).execute()
+    created = await state.storage.wishlists.create(
+        user.id,
+        title.strip(),
+        description.strip() if description else None
+    )
+    remember_owner(state, created)
 
     return RedirectResponse("/wishlist", status_code=303)
 
 
 # ── Детальная страница вишлиста ──────────────────────────────────────────
-@app.get("/wishlist/{wishlist_id}", response_class=HTMLResponse)
+@router.get("/wishlist/{wishlist_id}", response_class=HTMLResponse)
 async def view_wishlist(request: Request, wishlist_id: str):
-    user = get_current_user(request)
-
-    wl_res = supabase.table("wishlists").select("*").eq("id", wishlist_id).execute()
-    if not wl_res.data:
-        raise HTTPException(404, "Список не найден")
-
-    wishlist = wl_res.data[0]
+    state = app_state(request)
+    user = await get_current_user(request)
+
+    snapshot = state.read_cache.get(("wishlist", wishlist_id))
+    if snapshot is not MISSING:
+        wishlist, items = snapshot
+    elif state.versioned and request.headers.get("if-none-match"):
+        # Условный запрос: сначала только строка списка — если версия
+        # не изменилась, предметы не нужны
+        wishlist, items = await fetch_wishlist(state, wishlist_id), None
+    else:
+        wishlist, items = await fetch_wishlist_snapshot(state, wishlist_id)
 
     is_owner = user and str(user.id) == str(wishlist["user_id"])
     can_view = is_owner or wishlist.get("is_shared", False)
@@ -393,50 +752,100 @@ async def view_wishlist(request: Request, wishlist_id: str):
     if not can_view:
         raise HTTPException(403, "Нет доступа к этому списку")
 
-    items_res = supabase.table("wishlist_items")\
-        .select("*")\
-        .eq("wishlist_id", wishlist_id)\
-        .order("priority", desc=True)\
-        .order("created_at")\
-        .execute()
-
-    return templates.TemplateResponse("wishlist_detail.html", {
+    # Версия (sql/008_wishlist_version.sql) растёт при любом изменении списка,
+    # предметов и предложений; страница зависит ещё и от зрителя
+    etag = None
+    if wishlist.get("version") is None:
+        state.versioned = False
+    else:
+        etag = page_etag(state, "wishlist", wishlist_id, wishlist["version"], user.id if user else "")
+        if etag_matches(request, etag):
+            return not_modified(etag)
+
+    if items is None:
+        items = await state.storage.items.list(wishlist_id)
+    # В общий кэш попадают только публичные списки
+    if snapshot is MISSING and wishlist.get("is_shared"):
+        state.read_cache.set(("wishlist", wishlist_id), (wishlist, items))
+
+    response = state.templates.TemplateResponse("wishlist_detail.html", {
         "request": request,
         "wishlist": wishlist,
-        "items": items_res.data or [],
+        "items": items,
         "is_owner": is_owner,
         "current_user_email": user.email if user else None,
         "current_user_id": str(user.id) if user else None
     })
+    return conditional(request, response, etag)
 
 
-@app.post("/wishlist/{wishlist_id}/toggle-share")
-async def toggle_share(request: Request, wishlist_id: str):
-    user = get_current_user(request)
-    if not user:
-        raise HTTPException(401)
+@router.get("/wishlist/{wishlist_id}/events")
+async def wishlist_events(request: Request, wishlist_id: str):
+    # SSE: брони, новые предметы и (владельцу) предложения — без перезагрузки страницы
+    state = app_state(request)
+    user = await get_current_user(request)
+
+    wishlist = await state.storage.wishlists.get(wishlist_id)
+    if not wishlist:
+        raise HTTPException(404, "Список не найден")
+    remember_owner(state, wishlist)
+
+    is_owner = bool(user) and str(user.id) == str(wishlist["user_id"])
+    if not (is_owner or wishlist.get("is_shared", False)):
+        raise HTTPException(403, "Нет доступа к этому списку")
+
+    if state.hub.full():
+        # retry из потока не придёт — EventSource переподключится по своему таймеру
+        raise HTTPException(503, "Слишком много подключений")
+
+    return StreamingResponse(
+        event_stream(state.hub, wishlist_id, is_owner, str(user.id) if user else None, state.settings.sse_heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def fetch_wishlist_snapshot(state: AppState, wishlist_id: str):
+    # Список и его предметы запрашиваем параллельно
+    wishlist, items = await asyncio.gather(
+        fetch_wishlist(state, wishlist_id),
+        state.storage.items.list(wishlist_id),
+    )
+    return wishlist, items
+
+
+async def fetch_wishlist(state: AppState, wishlist_id: str) -> dict:
+    wishlist = await state.storage.wishlists.get(wishlist_id)
+    if not wishlist:
+        raise HTTPException(404, "Список не найден")
+
+    remember_owner(state, wishlist)
+    return wishlist
 
-    wl = supabase.table("wishlists")\
-        .select("user_id, is_shared")\
-        .eq("id", wishlist_id)\
-        .eq("user_id", user.id)\
-        .single()\
-        .execute()
 
-    if not wl.data:
+# Действия над списком общие для HTML-форм и JSON API (/api/v1): форма
+# получает редирект и перерисовку страницы, API — только изменённую сущность
+async def apply_toggle_share(state: AppState, wishlist_id: str, user) -> dict:
+    is_shared = await state.storage.wishlists.toggle_share(wishlist_id, user.id)
+    if is_shared is None:
         raise HTTPException(403, "Это не ваш список")
+    invalidate_wishlist(state, wishlist_id, feed=True)
+    return {"id": wishlist_id, "is_shared": is_shared}
 
-    new_state = not wl.data["is_shared"]
 
-    supabase.table("wishlists")\
-        .update({"is_shared": new_state})\
-        .eq("id", wishlist_id)\
-        .execute()
+@router.post("/wishlist/{wishlist_id}/toggle-share")
+async def toggle_share(request: Request, wishlist_id: str):
+    state = app_state(request)
+    user = await get_current_user(request, remote=True)
+    if not user:
+        raise HTTPException(401)
+
+    await apply_toggle_share(state, wishlist_id, user)
 
     return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
 
 
-@app.post("/wishlist/{wishlist_id}/add-item")
+@router.post("/wishlist/{wishlist_id}/add-item")
 async def add_item(
     request: Request,
     wishlist_id: str,
@@ -447,61 +856,137 @@ async def add_item(
     currency: str = Form("€"),
     priority: int = Form(3, ge=1, le=5)
 ):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
-    wl = supabase.table("wishlists")\
-        .select("user_id")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
+    await require_owner(state, wishlist_id, user, "Добавлять можно только в свои списки")
+
+    # Те же правила, что и у импорта (bulk.clean_item)
+    try:
+        fields = clean_item({
+            "title": title,
+            "description": description,
+            "url": url,
+            "price": price,
+            "currency": currency,
+            "priority": priority,
+        })
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    item = await state.storage.items.add(wishlist_id, fields)
+    invalidate_wishlist(state, wishlist_id)
+    state.hub.publish(wishlist_id, item_event(item))
 
-    if not wl.data or str(wl.data["user_id"]) != str(user.id):
-        raise HTTPException(403, "Добавлять можно только в свои списки")
+    return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
 
-    supabase.table("wishlist_items").insert({
+
+# ── Импорт и выгрузка предметов ───────────────────────────────────────────
+@router.post("/wishlist/{wishlist_id}/import")
+async def import_items(request: Request, wishlist_id: str, file: UploadFile = File(...)):
+    state = app_state(request)
+    user = await get_current_user(request)
+    if not user:
+        raise HTTPException(401)
+
+    await require_owner(state, wishlist_id, user, "Импортировать можно только в свои списки")
+
+    kind = detect_format(file.filename, file.content_type)
+    if not kind:
+        raise HTTPException(400, "Поддерживаются файлы .csv, .json и .ndjson")
+
+    # Строки проверяются по одной и уходят в базу пачками: файл не
+    # разворачивается в память целиком, на пачку — один INSERT
+    imported, errors, chunk = 0, [], []
+    try:
+        for number, raw in enumerate(read_rows(file.file, kind), start=1):
+            if number > state.settings.import_max_rows:
+                errors.append({"row": number, "error": f"Больше {state.settings.import_max_rows} строк, остаток пропущен"})
+                break
+            try:
+                if not isinstance(raw, dict):
+                    raise ValueError("Ожидался объект с полями предмета")
+                chunk.append(clean_item(raw))
+            except ValueError as e:
+                errors.append({"row": number, "error": str(e)})
+                continue
+            if len(chunk) >= state.settings.import_chunk_size:
+                imported += await state.storage.items.add_many(wishlist_id, chunk)
+                chunk = []
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        errors.append({"row": None, "error": f"Файл не разобран: {e}"})
+    if chunk:
+        imported += await state.storage.items.add_many(wishlist_id, chunk)
+
+    if imported:
+        invalidate_wishlist(state, wishlist_id)
+        state.hub.publish(wishlist_id, {"type": "items_imported", "count": imported})
+
+    report = {"imported": imported, "errors": errors}
+    if "application/json" in request.headers.get("accept", ""):
+        return JSONResponse(report, status_code=200 if imported or not errors else 400)
+    return state.templates.TemplateResponse("import_result.html", {
+        "request": request,
         "wishlist_id": wishlist_id,
-        "title": title.strip(),
-        "description": description.strip() if description else None,
-        "url": url.strip() if url else None,
-        "price": price,
-        "currency": currency,
-        "priority": priority
-    }).execute()
+        **report,
+    })
 
-    return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
+
+@router.get("/wishlist/{wishlist_id}/export")
+async def export_items(
+    request: Request,
+    wishlist_id: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+):
+    state = app_state(request)
+    user = await get_current_user(request)
+
+    wishlist = await state.storage.wishlists.get(wishlist_id)
+    if not wishlist:
+        raise HTTPException(404, "Список не найден")
+    remember_owner(state, wishlist)
+
+    is_owner = user and str(user.id) == str(wishlist["user_id"])
+    if not (is_owner or wishlist.get("is_shared", False)):
+        raise HTTPException(403, "Нет доступа к этому списку")
+
+    # Предметы читаются страницами по мере отправки — память не зависит от размера списка
+    pages = state.storage.items.pages(wishlist_id, state.settings.export_page_size)
+    if format == "csv":
+        body, media_type = export_csv(pages), "text/csv; charset=utf-8"
+    else:
+        body, media_type = export_ndjson(wishlist, pages), "application/x-ndjson"
+    return StreamingResponse(body, media_type=media_type, headers={
+        "Content-Disposition": f'attachment; filename="wishlist-{wishlist_id}.{format}"',
+    })
 
 
 # ── Предложить предмет ────────────────────────────────────────────────────
-@app.get("/wishlist/{wishlist_id}/suggest", response_class=HTMLResponse)
+@router.get("/wishlist/{wishlist_id}/suggest", response_class=HTMLResponse)
 async def suggest_form(request: Request, wishlist_id: str):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
-    wl_res = supabase.table("wishlists")\
-        .select("id, title, user_id, is_shared")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
+    wishlist = await state.storage.wishlists.get(wishlist_id)
 
-    if not wl_res.data:
+    if not wishlist:
         raise HTTPException(404, "Список не найден")
 
-    wishlist = wl_res.data
-
     if not (wishlist["is_shared"] or str(wishlist["user_id"]) == str(user.id)):
         raise HTTPException(403, "Нельзя предлагать предметы в этот список")
 
-    return templates.TemplateResponse("suggest_item.html", {
+    return state.templates.TemplateResponse("suggest_item.html", {
         "request": request,
         "wishlist_id": wishlist_id,
         "wishlist_title": wishlist["title"]
     })
 
 
-@app.post("/wishlist/{wishlist_id}/suggest")
+@router.post("/wishlist/{wishlist_id}/suggest")
 async def submit_suggestion(
     request: Request,
     wishlist_id: str,
@@ -512,223 +997,286 @@ async def submit_suggestion(
     currency: str = Form("€"),
     comment: str = Form(None)
 ):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
-    supabase.table("wishlist_suggestions").insert({
-        "wishlist_id": wishlist_id,
-        "suggested_by": user.id,
+    suggestion = await state.storage.suggestions.add(wishlist_id, user.id, {
         "title": title.strip(),
         "description": description.strip() if description else None,
         "url": url.strip() if url else None,
         "price": price,
         "currency": currency,
-        "comment": comment.strip() if comment else None,
-        "status": "pending"
-    }).execute()
+        "comment": comment.strip() if comment else None
+    })
+    # Предложения видит только владелец — остальным зрителям не рассылаем
+    state.hub.publish(wishlist_id, {
+        "type": "suggestion_added",
+        "suggestion": {"id": suggestion["id"], "title": suggestion["title"]},
+    }, owner_only=True)
 
     return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
 
 
 # ── Просмотр предложений ──────────────────────────────────────────────────
-@app.get("/wishlist/{wishlist_id}/suggestions", response_class=HTMLResponse)
+@router.get("/wishlist/{wishlist_id}/suggestions", response_class=HTMLResponse)
 async def view_suggestions(request: Request, wishlist_id: str):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         return RedirectResponse("/login")
 
-    wl = supabase.table("wishlists")\
-        .select("user_id, title")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
+    # Проверка владельца встроена в сам запрос, предложения приходят вложенными
+    wishlist = await state.storage.suggestions.list_for_owner(wishlist_id, user.id)
 
-    if not wl.data or str(wl.data["user_id"]) != str(user.id):
+    if not wishlist:
         raise HTTPException(403, "Это не ваш список")
 
-    suggestions = supabase.table("wishlist_suggestions")\
-        .select("*")\
-        .eq("wishlist_id", wishlist_id)\
-        .order("created_at", desc=True)\
-        .execute()
+    remember_owner(state, wishlist)
+
+    etag = None
+    if wishlist.get("version") is not None:
+        etag = page_etag(state, "suggestions", wishlist_id, wishlist["version"])
+        if etag_matches(request, etag):
+            return not_modified(etag)
 
-    return templates.TemplateResponse("wishlist_suggestions.html", {
+    response = state.templates.TemplateResponse("wishlist_suggestions.html", {
         "request": request,
         "wishlist_id": wishlist_id,
-        "wishlist_title": wl.data["title"],
-        "suggestions": suggestions.data or []
+        "wishlist_title": wishlist["title"],
+        "suggestions": wishlist["wishlist_suggestions"]
     })
+    return conditional(request, response, etag)
 
 
-@app.post("/wishlist/{wishlist_id}/suggestions/{suggestion_id}/accept")
-async def accept_suggestion(request: Request, wishlist_id: str, suggestion_id: str):
-    user = get_current_user(request)
-    if not user:
-        raise HTTPException(401)
-
-    # Проверяем, что это список владельца
-    wl = supabase.table("wishlists")\
-        .select("user_id")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
+async def apply_moderate(state: AppState, wishlist_id: str, user, accept: list[str], reject: list[str]) -> dict:
+    if len(accept) + len(reject) > state.settings.moderate_max_ids:
+        raise HTTPException(400, f"Не больше {state.settings.moderate_max_ids} предложений за раз")
 
-    if not wl.data or str(wl.data["user_id"]) != str(user.id):
+    # Владелец, перенос принятых в wishlist_items (с suggested_by) и статусы —
+    # один вызов и одна транзакция (sql/007_moderate_suggestions.sql)
+    result = await state.storage.suggestions.moderate(wishlist_id, user.id, accept, reject)
+    if result is None:
         raise HTTPException(403, "Это не ваш список")
 
-    # Получаем само предложение
-    sug = supabase.table("wishlist_suggestions")\
-        .select("*")\
-        .eq("id", suggestion_id)\
-        .eq("wishlist_id", wishlist_id)\
-        .single()\
-        .execute()
+    if result["items"]:
+        invalidate_wishlist(state, wishlist_id)
+        for item in result["items"]:
+            state.hub.publish(wishlist_id, item_event(item))
+    return result
 
-    if not sug.data:
-        raise HTTPException(404, "Предложение не найдено")
 
-    suggestion = sug.data
+async def apply_accept(state: AppState, wishlist_id: str, suggestion_id: str, user) -> dict:
+    result = await apply_moderate(state, wishlist_id, user, [suggestion_id], [])
+    if not result["accepted"]:
+        raise HTTPException(404, "Предложение не найдено или уже рассмотрено")
+    return {"suggestion": {"id": suggestion_id, "status": "accepted"}, "item": result["items"][0]}
 
-    # Вот здесь: создаём новую запись в wishlist_items
-    # и обязательно сохраняем, кто предложил (suggested_by)
-    supabase.table("wishlist_items").insert({
-        "wishlist_id": wishlist_id,
-        "title": suggestion["title"],
-        "description": suggestion.get("description"),
-        "url": suggestion.get("url"),
-        "price": suggestion.get("price"),
-        "currency": suggestion.get("currency", "€"),
-        "priority": 3,  # можно сделать динамическим
-        "suggested_by": suggestion["suggested_by"]  # ← кто предложил
-    }).execute()
-
-    # Меняем статус предложения на accepted
-    supabase.table("wishlist_suggestions")\
-        .update({"status": "accepted"})\
-        .eq("id", suggestion_id)\
-        .execute()
+
+async def apply_reject(state: AppState, wishlist_id: str, suggestion_id: str, user) -> dict:
+    result = await apply_moderate(state, wishlist_id, user, [], [suggestion_id])
+    if suggestion_id not in result["rejected"]:
+        raise HTTPException(404, "Предложение не найдено или уже рассмотрено")
+    return {"suggestion": {"id": suggestion_id, "status": "rejected"}}
+
+
+@router.post("/wishlist/{wishlist_id}/suggestions/{suggestion_id}/accept")
+async def accept_suggestion(request: Request, wishlist_id: str, suggestion_id: str):
+    state = app_state(request)
+    user = await get_current_user(request)
+    if not user:
+        raise HTTPException(401)
+
+    await apply_accept(state, wishlist_id, suggestion_id, user)
 
     return RedirectResponse(f"/wishlist/{wishlist_id}/suggestions", status_code=303)
 
-@app.post("/wishlist/{wishlist_id}/delete")
+@router.post("/wishlist/{wishlist_id}/delete")
 async def delete_wishlist(request: Request, wishlist_id: str):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request, remote=True)
     if not user:
         raise HTTPException(401, "Необходима авторизация")
 
-    # Проверяем, что список принадлежит пользователю
-    wl = supabase.table("wishlists")\
-        .select("user_id")\
-        .eq("id", wishlist_id)\
-        .eq("user_id", user.id)\
-        .single()\
-        .execute()
-
-    if not wl.data:
+    # Удаляем только свой список (каскадно удалятся items, suggestions, holiday_wishlists)
+    if not await state.storage.wishlists.delete(wishlist_id, user.id):
         raise HTTPException(403, "Это не ваш список или список не найден")
 
-    # Удаляем список (каскадно удалятся все связанные записи: items, suggestions, holiday_wishlists и т.д.)
-    supabase.table("wishlists")\
-        .delete()\
-        .eq("id", wishlist_id)\
-        .execute()
+    state.owner_cache.invalidate(("owner", wishlist_id))
+    invalidate_wishlist(state, wishlist_id, feed=True)
 
     return RedirectResponse("/wishlist", status_code=303)
 
-@app.post("/wishlist/{wishlist_id}/suggestions/{suggestion_id}/reject")
+@router.post("/wishlist/{wishlist_id}/suggestions/{suggestion_id}/reject")
 async def reject_suggestion(request: Request, wishlist_id: str, suggestion_id: str):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
-    wl = supabase.table("wishlists")\
-        .select("user_id")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
+    await apply_reject(state, wishlist_id, suggestion_id, user)
 
-    if not wl.data or str(wl.data["user_id"]) != str(user.id):
-        raise HTTPException(403, "Это не ваш список")
+    return RedirectResponse(f"/wishlist/{wishlist_id}/suggestions", status_code=303)
 
-    supabase.table("wishlist_suggestions")\
-        .update({"status": "rejected"})\
-        .eq("id", suggestion_id)\
-        .execute()
+
+@router.post("/wishlist/{wishlist_id}/suggestions/moderate")
+async def moderate_suggestions(
+    request: Request,
+    wishlist_id: str,
+    decision: str = Form(...),
+    ids: list[str] = Form(None)
+):
+    state = app_state(request)
+    user = await get_current_user(request)
+    if not user:
+        raise HTTPException(401)
+
+    if decision not in ("accept", "reject"):
+        raise HTTPException(400, "Неизвестное решение")
+
+    ids = ids or []
+    if decision == "accept":
+        await apply_moderate(state, wishlist_id, user, ids, [])
+    else:
+        await apply_moderate(state, wishlist_id, user, [], ids)
 
     return RedirectResponse(f"/wishlist/{wishlist_id}/suggestions", status_code=303)
 
 
 # ── Бронирование подарка ──────────────────────────────────────────────────
-@app.post("/wishlist/{wishlist_id}/item/{item_id}/reserve")
-async def reserve_item(request: Request, wishlist_id: str, item_id: str):
-    user = get_current_user(request)
-    if not user:
-        raise HTTPException(401, "Нужно войти в аккаунт")
-
-    item = supabase.table("wishlist_items")\
-        .select("id, wishlist_id, reserved_by")\
-        .eq("id", item_id)\
-        .eq("wishlist_id", wishlist_id)\
-        .single()\
-        .execute()
+async def apply_reserve(state: AppState, wishlist_id: str, item_id: str, user) -> dict:
+    # Один атомарный вызов: reserved / taken / already_yours / not_found
+    outcome = await state.storage.items.reserve(item_id, wishlist_id, user.id)
 
-    if not item.data:
+    if outcome == NOT_FOUND:
         raise HTTPException(404, "Подарок не найден")
 
-    if item.data["reserved_by"]:
+    if outcome == TAKEN:
         raise HTTPException(400, "Этот подарок уже забронирован")
 
-    supabase.table("wishlist_items")\
-        .update({
-            "reserved_by": user.id,
-            "reserved_at": "now()"
-        })\
-        .eq("id", item_id)\
-        .execute()
+    if outcome == RESERVED:
+        invalidate_wishlist(state, wishlist_id)
+        # reserved_by остаётся на сервере: поток SSE отдаёт каждому зрителю только mine
+        state.hub.publish(wishlist_id, {"type": "item_reserved", "item_id": item_id, "reserved_by": str(user.id)})
+
+    # Состояние брони известно из исхода — перечитывать предмет не нужно
+    return {"id": item_id, "wishlist_id": wishlist_id, "reserved": True, "mine": True}
+
+
+async def apply_release(state: AppState, wishlist_id: str, item_id: str, user) -> dict:
+    # released / not_reserved / forbidden / not_found
+    outcome = await state.storage.items.release(item_id, wishlist_id, user.id)
+
+    if outcome == NOT_FOUND:
+        raise HTTPException(404, "Подарок не найден")
+
+    if outcome == FORBIDDEN:
+        raise HTTPException(403, "Нет прав на отмену брони")
+
+    if outcome == RELEASED:
+        invalidate_wishlist(state, wishlist_id)
+        state.hub.publish(wishlist_id, {"type": "item_unreserved", "item_id": item_id})
+
+    return {"id": item_id, "wishlist_id": wishlist_id, "reserved": False, "mine": False}
+
+
+@router.post("/wishlist/{wishlist_id}/item/{item_id}/reserve")
+async def reserve_item(request: Request, wishlist_id: str, item_id: str):
+    state = app_state(request)
+    user = await get_current_user(request)
+    if not user:
+        raise HTTPException(401, "Нужно войти в аккаунт")
+
+    await apply_reserve(state, wishlist_id, item_id, user)
 
     return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
 
 
-@app.post("/wishlist/{wishlist_id}/item/{item_id}/unreserve")
+@router.post("/wishlist/{wishlist_id}/item/{item_id}/unreserve")
 async def unreserve_item(request: Request, wishlist_id: str, item_id: str):
-    user = get_current_user(request)
+    state = app_state(request)
+    user = await get_current_user(request)
     if not user:
         raise HTTPException(401)
 
-    item = supabase.table("wishlist_items")\
-        .select("id, wishlist_id, reserved_by")\
-        .eq("id", item_id)\
-        .eq("wishlist_id", wishlist_id)\
-        .single()\
-        .execute()
+    await apply_release(state, wishlist_id, item_id, user)
 
-    if not item.data:
-        raise HTTPException(404)
+    return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
 
-    wl = supabase.table("wishlists")\
-        .select("user_id")\
-        .eq("id", wishlist_id)\
-        .single()\
-        .execute()
 
-    is_owner = str(wl.data["user_id"]) == str(user.id)
-    is_reserver = str(item.data["reserved_by"]) == str(user.id)
+# ── JSON API v1 ──────────────────────────────────────────────────────────
+# Те же действия без редиректа и перерисовки: ответ — только изменённая
+# сущность, страница обновляется на месте (static/actions.js). Ошибки —
+# как у FastAPI: {"detail": "..."} с кодом 4xx.
+api = APIRouter(prefix="/api/v1")
 
-    if not (is_owner or is_reserver):
-        raise HTTPException(403, "Нет прав на отмену брони")
 
-    supabase.table("wishlist_items")\
-        .update({
-            "reserved_by": None,
-            "reserved_at": None
-        })\
-        .eq("id", item_id)\
-        .execute()
+async def require_api_user(request: Request, remote: bool = False):
+    user = await get_current_user(request, remote=remote)
+    if not user:
+        raise HTTPException(401, "Нужно войти в аккаунт")
+    return user
+
 
-    return RedirectResponse(f"/wishlist/{wishlist_id}", status_code=303)
+@api.post("/wishlists/{wishlist_id}/toggle-share")
+async def api_toggle_share(request: Request, wishlist_id: str):
+    state = app_state(request)
+    user = await require_api_user(request, remote=True)
+    return await apply_toggle_share(state, wishlist_id, user)
+
+
+@api.post("/wishlists/{wishlist_id}/items/{item_id}/reserve")
+async def api_reserve_item(request: Request, wishlist_id: str, item_id: str):
+    state = app_state(request)
+    user = await require_api_user(request)
+    return await apply_reserve(state, wishlist_id, item_id, user)
+
+
+@api.post("/wishlists/{wishlist_id}/items/{item_id}/unreserve")
+async def api_unreserve_item(request: Request, wishlist_id: str, item_id: str):
+    state = app_state(request)
+    user = await require_api_user(request)
+    return await apply_release(state, wishlist_id, item_id, user)
+
+
+@api.post("/wishlists/{wishlist_id}/suggestions/{suggestion_id}/accept")
+async def api_accept_suggestion(request: Request, wishlist_id: str, suggestion_id: str):
+    state = app_state(request)
+    user = await require_api_user(request)
+    return await apply_accept(state, wishlist_id, suggestion_id, user)
+
+
+@api.post("/wishlists/{wishlist_id}/suggestions/{suggestion_id}/reject")
+async def api_reject_suggestion(request: Request, wishlist_id: str, suggestion_id: str):
+    state = app_state(request)
+    user = await require_api_user(request)
+    return await apply_reject(state, wishlist_id, suggestion_id, user)
+
+
+@api.post("/wishlists/{wishlist_id}/suggestions/moderate")
+async def api_moderate_suggestions(
+    request: Request,
+    wishlist_id: str,
+    accept: list[str] = Body(default=[]),
+    reject: list[str] = Body(default=[]),
+):
+    # {"accept": [id...], "reject": [id...]} → {"items", "accepted", "rejected"}
+    state = app_state(request)
+    user = await require_api_user(request)
+    return await apply_moderate(state, wishlist_id, user, accept, reject)
+
+
+def __getattr__(name: str):
+    # main:app собирается при первом обращении: uvicorn --factory main:create_app
+    # (serve.py) импортирует модуль и не должен строить второе приложение
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 if __name__ == "__main__":
+    # Режим разработки: один процесс с перезагрузкой; боевой запуск — serve.py
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,190 @@
+import time
+from bisect import bisect_left
+from typing import Iterable
+
+import httpx
+from fastapi.templating import Jinja2Templates
+
+from profiling import record_call
+
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{n}="{escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Гистограмма в формате Prometheus: значения меток передаются позиционно.
+
+    observe() — один bisect и три сложения, без блокировок: метрики живут
+    в процессе воркера и обновляются из его цикла событий.
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        # значения меток → [счётчики по корзинам..., +Inf], сумма
+        self.series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *values: str) -> None:
+        series = self.series.get(values)
+        if series is None:
+            series = self.series[values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                labels = format_labels(self.labels, values, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "wishlist_request_duration_seconds",
+    "Время обработки HTTP-запроса по шаблону маршрута",
+    ("method", "route", "status"),
+))
+BACKEND_SECONDS = REGISTRY.register(Histogram(
+    "wishlist_backend_call_duration_seconds",
+    "Время обращения к Supabase по таблице (функции) и операции",
+    ("target", "operation", "status"),
+))
+AUTH_SECONDS = REGISTRY.register(Histogram(
+    "wishlist_auth_verify_duration_seconds",
+    "Время проверки токена: local — подпись JWT, cached — кэш, remote — Auth API",
+    ("method",),
+    buckets=(0.0001, 0.00025, 0.0005) + DEFAULT_BUCKETS,
+))
+TEMPLATE_SECONDS = REGISTRY.register(Histogram(
+    "wishlist_template_render_duration_seconds",
+    "Время рендеринга шаблона Jinja",
+    ("template",),
+    buckets=(0.0001, 0.00025, 0.0005) + DEFAULT_BUCKETS,
+))
+
+OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+def backend_call(request: httpx.Request) -> tuple[str, str]:
+    # /rest/v1/wishlists → (wishlists, select); /rest/v1/rpc/reserve_item → (reserve_item, rpc);
+    # /auth/v1/token → (auth, token)
+    parts = request.url.path.strip("/").split("/")
+    if parts[:1] == ["auth"]:
+        return "auth", parts[-1]
+    if parts[:3] == ["rest", "v1", "rpc"]:
+        return parts[-1], "rpc"
+    if parts[:2] == ["rest", "v1"] and len(parts) > 2:
+        return parts[2], OPERATIONS.get(request.method, request.method.lower())
+    return "other", request.method.lower()
+
+
+class InstrumentedTransport(httpx.AsyncBaseTransport):
+    """Транспорт httpx, который замеряет каждое обращение к Supabase."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        target, operation = backend_call(request)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        else:
+            status = str(response.status_code)
+            return response
+        finally:
+            duration = time.perf_counter() - started
+            BACKEND_SECONDS.observe(duration, target, operation, status)
+            # Для лога медленных запросов: упорядоченный список вызовов запроса
+            record_call(target, operation, status, started, duration)
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время запроса по шаблону маршрута, а не по пути.
+
+    Шаблон (/wishlist/{wishlist_id}) FastAPI кладёт в scope["route"] при
+    маршрутизации; запросы мимо маршрутов считаются одной серией.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = "500"
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - started,
+                scope["method"],
+                getattr(route, "path", "unmatched"),
+                status,
+            )
+
+
+class TimedTemplates(Jinja2Templates):
+    """Jinja2Templates, которые замеряют рендеринг каждого шаблона."""
+
+    def TemplateResponse(self, *args, **kwargs):
+        # Имя шаблона — первая строка среди аргументов (старая и новая сигнатуры)
+        name = kwargs.get("name") or next(a for a in args if isinstance(a, str))
+        started = time.perf_counter()
+        try:
+            return super().TemplateResponse(*args, **kwargs)
+        finally:
+            TEMPLATE_SECONDS.observe(time.perf_counter() - started, name)
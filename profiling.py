@@ -0,0 +1,209 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs
+
+from settings import BASE_DIR
+
+logger = logging.getLogger("wishlist.profiling")
+
+
+@dataclass
+class RequestTrace:
+    started: float = field(default_factory=time.perf_counter)
+    # (смещение от начала запроса, цель, операция, статус, длительность) — в секундах
+    calls: list[tuple] = field(default_factory=list)
+
+
+# Трасса текущего запроса; задачи из asyncio.gather получают тот же объект
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def record_call(target: str, operation: str, status: str, started: float, duration: float) -> None:
+    trace = current_trace.get()
+    if trace is not None:
+        trace.calls.append((started - trace.started, target, operation, status, duration))
+
+
+class Sampler:
+    """Сэмплирующий профайлер одного потока (потока цикла событий).
+
+    Фоновый поток раз в interval снимает стек целевого потока через
+    sys._current_frames(). Профиль «по стене»: ожидание ввода-вывода видно
+    как время в select(), а параллельные запросы того же воркера тоже
+    попадают в сэмплы.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: list[tuple[tuple, float]] = []
+        self.started = 0.0
+        self.stopped = 0.0
+        self.running = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self.running.set()
+        self.thread = threading.Thread(target=self.run, name="profiler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join()
+        self.stopped = time.perf_counter()
+
+    def run(self) -> None:
+        last = time.perf_counter()
+        while self.running.is_set():
+            time.sleep(self.interval)
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_qualname, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            self.samples.append((tuple(reversed(stack)), now - last))
+            last = now
+
+    def speedscope(self, name: str) -> dict:
+        frames: dict[tuple, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.samples:
+            samples.append([frames.setdefault(f, len(frames)) for f in stack])
+            weights.append(weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "wishlist-app",
+            "activeProfileIndex": 0,
+            "shared": {
+                "frames": [{"name": n, "file": f, "line": line} for n, f, line in frames]
+            },
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.stopped - self.started,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+def has_token(scope, token: Optional[str]) -> bool:
+    # Токен из заголовка X-Profile или ?__profile=; сравнение за постоянное время
+    if not token:
+        return False
+    expected = token.encode()
+    headers = dict(scope["headers"])
+    if hmac.compare_digest(headers.get(b"x-profile", b""), expected):
+        return True
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return any(hmac.compare_digest(value.encode(), expected) for value in query.get("__profile", []))
+
+
+def format_calls(trace: RequestTrace) -> str:
+    return "\n".join(
+        f"  +{offset * 1000:8.1f} мс  {target}.{operation} → {status} за {duration * 1000:.1f} мс"
+        for offset, target, operation, status, duration in trace.calls
+    )
+
+
+class ProfilingMiddleware:
+    """Трасса обращений к Supabase для каждого запроса, лог медленных запросов
+    и профиль по требованию.
+
+    Профиль снимается, если PROFILE_TOKEN задан и совпадает с заголовком
+    X-Profile или параметром ?__profile=; speedscope JSON сохраняется в
+    profile_dir, имя файла возвращается в заголовке X-Profile-File.
+    """
+
+    def __init__(
+        self,
+        app,
+        slow_ms: float = 500,
+        profile_token: Optional[str] = None,
+        profile_dir: str = str(BASE_DIR / "profiles"),
+        interval: float = 0.001,
+    ):
+        self.app = app
+        self.slow_ms = slow_ms
+        self.profile_token = profile_token
+        self.profile_dir = profile_dir
+        self.interval = interval
+
+    def wants_profile(self, scope) -> bool:
+        return has_token(scope, self.profile_token)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        trace = RequestTrace()
+        token = current_trace.set(trace)
+        status = 500
+        streaming = False
+        sampler = None
+        filename = None
+
+        if self.wants_profile(scope):
+            sampler = Sampler(threading.get_ident(), self.interval)
+            slug = scope["path"].strip("/").replace("/", "_") or "root"
+            stamp = time.strftime("%Y%m%d-%H%M%S") + f".{time.time_ns() // 1_000_000 % 1000:03d}"
+            filename = f"{stamp}-{scope['method']}-{slug}.speedscope.json"
+
+        async def send_traced(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # SSE живёт сколько угодно долго — это не медленный запрос
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", [])
+                )
+                if filename:
+                    message = {
+                        **message,
+                        "headers": [*message.get("headers", []), (b"x-profile-file", filename.encode())],
+                    }
+            await send(message)
+
+        if sampler:
+            sampler.start()
+        try:
+            await self.app(scope, receive, send_traced)
+        finally:
+            current_trace.reset(token)
+            elapsed_ms = (time.perf_counter() - trace.started) * 1000
+            if sampler:
+                sampler.stop()
+                # Запись профиля не держит цикл событий (и другие запросы воркера)
+                await asyncio.to_thread(self.save, sampler, filename, f"{scope['method']} {scope['path']}")
+            if self.slow_ms and elapsed_ms > self.slow_ms and not streaming:
+                logger.warning(
+                    "Медленный запрос %s %s → %s за %.1f мс, обращений к Supabase: %d\n%s",
+                    scope["method"], scope["path"], status, elapsed_ms,
+                    len(trace.calls), format_calls(trace),
+                )
+
+    def save(self, sampler: Sampler, filename: str, name: str) -> None:
+        os.makedirs(self.profile_dir, exist_ok=True)
+        path = os.path.join(self.profile_dir, filename)
+        with open(path, "w") as f:
+            json.dump(sampler.speedscope(name), f)
+        logger.info("Профиль %s сохранён в %s (%d сэмплов)", name, path, len(sampler.samples))
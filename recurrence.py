@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Iterable, Optional
+
+from dateutil.relativedelta import FR, MO, SA, SU, TH, TU, WE, relativedelta
+
+
+# Правила повтора хранятся в holidays.recurrence строкой:
+#   yearly | monthly | weekly                — тот же день года / месяца / недели
+#   monthly:last-fri, monthly:2-mon          — последняя пятница / 2-й понедельник месяца
+#   yearly:last-mon, yearly:2-sun            — то же, но в месяце исходной даты раз в год
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+RELATIVE_WEEKDAYS = (MO, TU, WE, TH, FR, SA, SU)
+FREQUENCIES = ("yearly", "monthly", "weekly")
+
+# (название, окончание порядкового, «последний» в нужном роде)
+WEEKDAY_NAMES = (
+    ("понедельник", "й", "последний"),
+    ("вторник", "й", "последний"),
+    ("среда", "я", "последняя"),
+    ("четверг", "й", "последний"),
+    ("пятница", "я", "последняя"),
+    ("суббота", "я", "последняя"),
+    ("воскресенье", "е", "последнее"),
+)
+FREQUENCY_NAMES = {"yearly": "каждый год", "monthly": "каждый месяц", "weekly": "каждую неделю"}
+
+
+@dataclass(frozen=True)
+class Rule:
+    freq: str
+    # 1..4 — n-й такой день недели в месяце, -1 — последний; None — тот же день месяца
+    nth: Optional[int] = None
+    weekday: Optional[int] = None
+
+
+@lru_cache(maxsize=256)
+def parse_rule(rule: str) -> Rule:
+    freq, _, position = rule.partition(":")
+    if freq not in FREQUENCIES or (position and freq == "weekly"):
+        raise ValueError(f"Неизвестное правило повтора: {rule}")
+    if not position:
+        return Rule(freq)
+
+    nth, _, weekday = position.partition("-")
+    if weekday not in WEEKDAYS or nth not in ("last", "1", "2", "3", "4"):
+        raise ValueError(f"Неизвестное правило повтора: {rule}")
+    return Rule(freq, -1 if nth == "last" else int(nth), WEEKDAYS.index(weekday))
+
+
+def resolve_rule(choice: str, anchor: date) -> str:
+    # Вариант из формы → правило по исходной дате: "monthly:last" для пятницы
+    # 27.03 становится "monthly:last-fri", "yearly:nth" для 10.05 — "yearly:2-sun"
+    freq, _, position = choice.partition(":")
+    if position in ("nth", "last"):
+        weekday = WEEKDAYS[anchor.weekday()]
+        nth = (anchor.day - 1) // 7 + 1
+        # 5-го такого дня в месяце может не быть — это всегда «последний»
+        if position == "last" or nth == 5:
+            nth = "last"
+        choice = f"{freq}:{nth}-{weekday}"
+    parse_rule(choice)
+    return choice
+
+
+def describe(rule: Optional[str]) -> str:
+    if not rule:
+        return ""
+    parsed = parse_rule(rule)
+    text = FREQUENCY_NAMES[parsed.freq]
+    if parsed.weekday is not None:
+        name, ending, last = WEEKDAY_NAMES[parsed.weekday]
+        position = last if parsed.nth == -1 else f"{parsed.nth}-{ending}"
+        text += f", {position} {name}"
+    return text
+
+
+def month_index(d: date) -> int:
+    return d.year * 12 + d.month - 1
+
+
+def in_month(year: int, month: int, anchor: date, rule: Rule) -> date:
+    first = date(year, month, 1)
+    if rule.weekday is None:
+        # 31-е в коротком месяце — последний день месяца
+        return first + relativedelta(day=anchor.day)
+    if rule.nth == -1:
+        return first + relativedelta(day=31, weekday=RELATIVE_WEEKDAYS[rule.weekday](-1))
+    return first + relativedelta(weekday=RELATIVE_WEEKDAYS[rule.weekday](rule.nth))
+
+
+def occurrences(anchor: date, rule: str, start: date, end: date) -> list[date]:
+    """Даты повторов в [start, end], не раньше исходной даты.
+
+    Перебираются только месяцы (годы, недели) самого диапазона, а не вся
+    история с anchor: стоимость зависит от ширины диапазона.
+    """
+    parsed = parse_rule(rule)
+    start = max(start, anchor)
+    if start > end:
+        return []
+
+    if parsed.freq == "weekly":
+        first = start + timedelta(days=(anchor - start).days % 7)
+        return [first + timedelta(weeks=k) for k in range((end - first).days // 7 + 1)]
+
+    if parsed.freq == "monthly":
+        months = [divmod(i, 12) for i in range(month_index(start), month_index(end) + 1)]
+    else:
+        months = [(year, anchor.month - 1) for year in range(start.year, end.year + 1)]
+
+    dates = (in_month(year, month + 1, anchor, parsed) for year, month in months)
+    return [d for d in dates if start <= d <= end]
+
+
+def expand(holidays: Iterable[dict], start: date, end: date) -> list[dict]:
+    # Разовые праздники проходят как есть, повторяющиеся размножаются по датам
+    # диапазона; first_date — исходная дата серии
+    expanded = []
+    for holiday in holidays:
+        anchor = date.fromisoformat(holiday["date"])
+        rule = holiday.get("recurrence")
+        if not rule:
+            if start <= anchor <= end:
+                expanded.append(holiday)
+            continue
+        for d in occurrences(anchor, rule, start, end):
+            expanded.append({**holiday, "date": d.isoformat(), "first_date": holiday["date"]})
+    expanded.sort(key=lambda h: h["date"])
+    return expanded
@@ -0,0 +1,57 @@
+"""Боевой запуск: несколько воркеров uvicorn и общий кэш хоста.
+
+    python assets.py       # статика с хэшами, .br/.gz и WebP — при каждом деплое
+    python serve.py        # WEB_CONCURRENCY=4 PORT=8000 KEEP_ALIVE=65 ...
+
+Воркеры — отдельные процессы с create_app() каждый; кэши чтений, сессий и
+владельцев общие через SHARED_CACHE_PATH (SQLite WAL), сбросы и события
+SSE рассылаются всем воркерам. Сигналы главному процессу:
+SIGHUP — поочерёдный перезапуск воркеров (новый код и .env),
+SIGTTIN / SIGTTOU — воркером больше / меньше, SIGTERM — мягкая остановка
+с ожиданием текущих запросов до GRACEFUL_TIMEOUT секунд.
+"""
+
+import logging
+import os
+
+import uvicorn
+
+import shared_cache
+from settings import BASE_DIR, Settings
+
+
+logger = logging.getLogger("wishlist.serve")
+
+
+def main() -> None:
+    settings = Settings.from_env()
+    logging.basicConfig(level=settings.log_level, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    if settings.web_concurrency > 1:
+        path = settings.shared_cache_path or str(BASE_DIR / "var" / "shared-cache.sqlite")
+        # Воркеры читают настройки из окружения сами — путь передаётся через него
+        os.environ["SHARED_CACHE_PATH"] = path
+        # Значения прошлого запуска могли записать с другим кодом и схемой
+        shared_cache.remove(path)
+        if settings.storage_backend == "memory":
+            logger.warning("STORAGE_BACKEND=memory: у каждого воркера свои данные")
+
+    uvicorn.run(
+        "main:create_app",
+        factory=True,
+        host=settings.host,
+        port=settings.port,
+        workers=settings.web_concurrency,
+        # Keep-alive дольше простоя балансировщика: он не получит обрыв на переиспользуемом соединении
+        timeout_keep_alive=settings.keep_alive,
+        timeout_graceful_shutdown=settings.graceful_timeout,
+        limit_max_requests=settings.max_requests or None,
+        backlog=settings.backlog,
+        proxy_headers=True,
+        forwarded_allow_ips=settings.forwarded_allow_ips,
+        log_level=settings.log_level.lower(),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import os
+from dataclasses import dataclass, fields
+from pathlib import Path
+from typing import Mapping, Optional, get_args, get_type_hints
+
+from dotenv import load_dotenv
+
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Настройки приложения; по умолчанию — из окружения (и .env, если он есть).
+
+    Ничего не проверяет и не подключает: недостающие ключи Supabase — ошибка
+    старта воркера (lifespan), а не импорта main.
+    """
+
+    storage_backend: str = "supabase"
+    memory_seed: Optional[str] = None
+    supabase_url: Optional[str] = None
+    supabase_anon_key: Optional[str] = None
+    supabase_jwt_secret: Optional[str] = None
+    telegram_bot_token: Optional[str] = None
+    log_level: str = "INFO"
+    # Каталоги шаблонов и статики — от корня проекта, а не от текущего каталога
+    templates_dir: str = str(BASE_DIR / "templates")
+    # Скомпилированные шаблоны переживают перезапуск воркера ("" — без кэша на диске)
+    template_cache_dir: str = str(BASE_DIR / "var" / "jinja")
+    static_dir: str = str(BASE_DIR / "static")
+    # Собранная статика (python assets.py): имена с хэшем, .br/.gz, WebP
+    assets_dir: str = str(BASE_DIR / "build" / "static")
+    # Запросы дольше порога пишутся в лог вместе со списком обращений к Supabase;
+    # profile_token включает профиль по заголовку X-Profile или ?__profile=
+    slow_request_ms: float = 500
+    profile_token: Optional[str] = None
+    profile_dir: str = str(BASE_DIR / "profiles")
+    auth_cache_size: int = 4096
+    auth_cache_ttl: int = 300
+    db_pool_size: int = 20
+    db_timeout: float = 10
+    db_pool_timeout: float = 5
+    public_page_size: int = 24
+    read_cache_size: int = 1024
+    read_cache_ttl: float = 30
+    owner_cache_size: int = 10000
+    owner_cache_ttl: float = 3600
+    # Готовый HTML карточек (fragments.py); ключ меняется вместе со строкой
+    fragment_cache_size: int = 20000
+    fragment_cache_ttl: float = 3600
+    calendar_range_months: int = 24
+    # Импорт предметов пачками по import_chunk_size строк, не больше import_max_rows за раз
+    import_chunk_size: int = 500
+    import_max_rows: int = 5000
+    export_page_size: int = 500
+    # SSE: очередь событий на зрителя, предел соединений на воркер, пинг простоя (с)
+    sse_queue_size: int = 32
+    sse_max_subscribers: int = 10000
+    sse_heartbeat: float = 15
+    # Сколько предложений можно принять/отклонить одним запросом
+    moderate_max_ids: int = 200
+    # HTML и JSON короче порога (байт) отдаются без сжатия
+    compress_min_size: int = 1024
+    # Общий кэш воркеров хоста (SQLite WAL); не задан — кэши только в процессе.
+    # shared_cache_poll — как часто воркер забирает сообщения других (с)
+    shared_cache_path: Optional[str] = None
+    shared_cache_poll: float = 0.05
+    # Боевой запуск (serve.py): воркеры, keep-alive дольше простоя балансировщика,
+    # сколько ждать незавершённые запросы при остановке, перезапуск воркера
+    # после max_requests запросов (0 — не перезапускать)
+    host: str = "0.0.0.0"
+    port: int = 8000
+    web_concurrency: int = 4
+    keep_alive: int = 65
+    graceful_timeout: int = 30
+    max_requests: int = 0
+    backlog: int = 2048
+    forwarded_allow_ips: str = "127.0.0.1"
+
+    @classmethod
+    def from_env(cls, environ: Optional[Mapping[str, str]] = None, dotenv: bool = True) -> "Settings":
+        # Переменная окружения — имя поля в верхнем регистре (DB_POOL_SIZE и т.д.);
+        # .env не перекрывает то, что уже задано в окружении
+        if environ is None:
+            if dotenv:
+                load_dotenv()
+            environ = os.environ
+
+        # Тип — из аннотации поля (float с целым значением по умолчанию
+        # должен принимать "2.5"); Optional[X] → X
+        hints = get_type_hints(cls)
+        values = {}
+        for field in fields(cls):
+            raw = environ.get(field.name.upper())
+            if raw is None:
+                continue
+            kind = hints[field.name]
+            kind = next((a for a in get_args(kind) if a is not type(None)), kind)
+            values[field.name] = kind(raw)
+        return cls(**values)
@@ -0,0 +1,204 @@
+import asyncio
+import json
+import logging
+import os
+import pickle
+import sqlite3
+import time
+from collections import Counter
+from typing import Any, Callable, Hashable, Optional
+
+from cache import MISSING
+
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+create table if not exists entries (
+    namespace text not null,
+    key text not null,
+    value blob not null,
+    expires real not null,
+    primary key (namespace, key)
+) without rowid;
+create table if not exists messages (
+    seq integer primary key autoincrement,
+    sender integer not null,
+    channel text not null,
+    payload text not null,
+    created real not null
+);
+"""
+
+
+class SharedCache:
+    """Кэш для всех воркеров одного хоста: файл SQLite в режиме WAL.
+
+    Читатели не блокируют друг друга и писателя; значения — pickle, поэтому
+    файл создаётся с правами 0600 и лежит в каталоге приложения. Таблица
+    messages — журнал широковещательных сообщений (сброс ключей, события
+    SSE): каждый воркер читает его с места, где остановился, и пропускает
+    свои собственные сообщения.
+
+    Вызовы идут прямо в цикле событий, поэтому busy_timeout короткий, а
+    занятый файл (OperationalError) — не ошибка запроса: промах при чтении,
+    пропущенная запись или сообщение, в лог и в счётчик errors.
+    """
+
+    def __init__(self, path: str, busy_timeout_ms: int = 50, message_ttl: float = 60):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Файл — до sqlite3.connect, чтобы он сразу получил права 0600
+        os.close(os.open(path, os.O_CREAT | os.O_RDWR, 0o600))
+        # Автокоммит: каждая запись — своя короткая транзакция
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.execute(f"pragma busy_timeout = {int(busy_timeout_ms)}")
+        self.conn.execute("pragma journal_mode = wal")
+        # Это кэш: потеря последних записей при сбое питания не страшна
+        self.conn.execute("pragma synchronous = off")
+        self.conn.executescript(SCHEMA)
+
+        self.sender = os.getpid()
+        self.message_ttl = message_ttl
+        self.handlers: dict[str, Callable[[Any], None]] = {}
+        self.seq = self.conn.execute("select coalesce(max(seq), 0) from messages").fetchone()[0]
+        self.version = self.data_version()
+        self.pruned = time.monotonic()
+        self.hits: Counter = Counter()
+        self.misses: Counter = Counter()
+        self.received = 0
+        self.errors = 0
+
+    def execute(self, sql: str, params=(), many: bool = False) -> Optional[sqlite3.Cursor]:
+        # None — файл занят дольше busy_timeout (или другая ошибка SQLite)
+        try:
+            if many:
+                return self.conn.executemany(sql, params)
+            return self.conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            self.errors += 1
+            logger.warning("Общий кэш недоступен: %s", e)
+            return None
+
+    # ── Значения ─────────────────────────────────────────────────────────
+    def get(self, key: tuple) -> Any:
+        cursor = self.execute(
+            "select value, expires from entries where namespace = ? and key = ?",
+            (str(key[0]), encode_key(key)),
+        )
+        row = cursor.fetchone() if cursor is not None else None
+        if row is None or row[1] <= time.time():
+            self.misses[key[0]] += 1
+            return MISSING
+        try:
+            value = pickle.loads(row[0])
+        except Exception:
+            # Значение записал воркер со старым кодом (после SIGHUP) — как промах
+            self.misses[key[0]] += 1
+            return MISSING
+        self.hits[key[0]] += 1
+        return value
+
+    def set(self, key: tuple, value: Any, ttl: float) -> None:
+        self.execute(
+            "insert or replace into entries (namespace, key, value, expires) values (?, ?, ?, ?)",
+            (str(key[0]), encode_key(key), pickle.dumps(value), time.time() + ttl),
+        )
+
+    def delete(self, *keys: tuple) -> None:
+        # Запись в базу уже сделана — сбой здесь не должен превращаться в 500
+        self.execute(
+            "delete from entries where namespace = ? and key = ?",
+            [(str(k[0]), encode_key(k)) for k in keys],
+            many=True,
+        )
+
+    def delete_namespace(self, namespace: Hashable) -> None:
+        self.execute("delete from entries where namespace = ?", (str(namespace),))
+
+    # ── Сообщения между воркерами ────────────────────────────────────────
+    def subscribe(self, channel: str, handler: Callable[[Any], None]) -> None:
+        self.handlers[channel] = handler
+
+    def publish(self, channel: str, payload: Any) -> None:
+        self.execute(
+            "insert into messages (sender, channel, payload, created) values (?, ?, ?, ?)",
+            (self.sender, channel, json.dumps(payload, ensure_ascii=False), time.time()),
+        )
+
+    def data_version(self) -> Optional[int]:
+        # Меняется, когда базу изменило другое соединение; без чтения страниц
+        cursor = self.execute("pragma data_version")
+        return cursor.fetchone()[0] if cursor is not None else None
+
+    def poll(self) -> int:
+        """Доставить обработчикам сообщения других воркеров; число доставленных.
+
+        Вызывается перед чтением локальных кэшей и фоновой задачей воркера:
+        пока другие ничего не писали, это один pragma без обращения к диску.
+        """
+        version = self.data_version()
+        if version is None or version == self.version:
+            return 0
+        cursor = self.execute(
+            "select seq, sender, channel, payload from messages where seq > ? order by seq",
+            (self.seq,),
+        )
+        if cursor is None:
+            # Версию не запоминаем — заберём сообщения при следующем опросе
+            return 0
+        self.version = version
+        rows = cursor.fetchall()
+        delivered = 0
+        for seq, sender, channel, payload in rows:
+            self.seq = seq
+            handler = self.handlers.get(channel)
+            if sender == self.sender or handler is None:
+                continue
+            handler(json.loads(payload))
+            delivered += 1
+        self.received += delivered
+        return delivered
+
+    def prune(self, interval: float = 10) -> None:
+        # Старые сообщения и просроченные значения — не чаще раза в interval секунд
+        if time.monotonic() - self.pruned < interval:
+            return
+        self.pruned = time.monotonic()
+        now = time.time()
+        self.execute("delete from messages where created < ?", (now - self.message_ttl,))
+        self.execute("delete from entries where expires <= ?", (now,))
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def stats(self) -> dict:
+        cursor = self.execute("select count(*) from entries")
+        return {
+            "hits": sum(self.hits.values()),
+            "misses": sum(self.misses.values()),
+            "received": self.received,
+            "errors": self.errors,
+            "entries": cursor.fetchone()[0] if cursor is not None else None,
+        }
+
+
+async def run_poller(shared: SharedCache, interval: float) -> None:
+    # Фоновая задача воркера: сообщения доходят и тогда, когда запросов нет
+    # (события SSE для открытых страниц)
+    while True:
+        await asyncio.sleep(interval)
+        shared.poll()
+        shared.prune()
+
+
+def encode_key(key: tuple) -> str:
+    return json.dumps(key[1:], ensure_ascii=False, default=str)
+
+
+def remove(path: str) -> None:
+    # Файл кэша вместе с журналом WAL и общей памятью — перед стартом воркеров
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,38 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Склейка одинаковых одновременных вызовов.
+
+    Пока вызов с ключом key выполняется, остальные вызовы с тем же ключом
+    ждут его результат (или исключение), а не идут в бэкенд повторно.
+    """
+
+    def __init__(self):
+        self.inflight: dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self.inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            self.calls += 1
+            # Общий вызов — отдельная задача, а не задача первого вызвавшего:
+            # его отмена (клиент ушёл) не должна отменять вызов остальным
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self.finish(key, t))
+        # shield: отмена одного ожидающего (и первого тоже) не отменяет общий вызов
+        return await asyncio.shield(task)
+
+    def finish(self, key: Hashable, task: asyncio.Future) -> None:
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Исключение помечается полученным, даже если все ожидающие ушли
+        if not task.cancelled():
+            task.exception()
@@ -0,0 +1,44 @@
+-- Создание праздника и привязка вишлистов одной транзакцией и одним вызовом.
+-- Применить в SQL Editor Supabase (или через supabase db push).
+
+-- Массовая привязка: только вишлисты владельца, дубликаты пропускаются
+create or replace function public.link_holiday_wishlists(
+    p_holiday_id uuid,
+    p_user_id uuid,
+    p_wishlist_ids uuid[]
+) returns setof uuid
+language sql
+as $$
+    insert into public.holiday_wishlists (holiday_id, wishlist_id)
+    select p_holiday_id, w.id
+    from public.wishlists w
+    where w.user_id = p_user_id
+      and w.id = any(coalesce(p_wishlist_ids, '{}'))
+      and not exists (
+          select 1 from public.holiday_wishlists hw
+          where hw.holiday_id = p_holiday_id and hw.wishlist_id = w.id
+      )
+    returning wishlist_id;
+$$;
+
+create or replace function public.create_holiday_with_links(
+    p_user_id uuid,
+    p_title text,
+    p_date date,
+    p_description text default null,
+    p_wishlist_ids uuid[] default '{}'
+) returns uuid
+language plpgsql
+as $$
+declare
+    v_holiday_id uuid;
+begin
+    insert into public.holidays (user_id, title, date, description)
+    values (p_user_id, p_title, p_date, p_description)
+    returning id into v_holiday_id;
+
+    perform public.link_holiday_wishlists(v_holiday_id, p_user_id, p_wishlist_ids);
+
+    return v_holiday_id;
+end;
+$$;
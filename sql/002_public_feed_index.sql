@@ -0,0 +1,8 @@
+-- Индекс для ленты /public: keyset-пагинация по (created_at, id) среди
+-- публичных списков. Запрос страницы
+--   where is_shared and (created_at, id) < (:created_at, :id)
+--   order by created_at desc, id desc limit :page_size + 1
+-- читает ровно одну страницу индекса независимо от глубины прокрутки.
+create index if not exists wishlists_public_feed_idx
+    on public.wishlists (created_at desc, id desc)
+    where is_shared;
@@ -0,0 +1,73 @@
+-- Атомарное бронирование подарков: одна функция — один вызов и одна транзакция.
+-- Условный UPDATE (reserved_by is null) разрешает гонку двух гостей:
+-- второй UPDATE после коммита первого не найдёт строку и вернёт 'taken'.
+
+create or replace function public.reserve_item(
+    p_item_id uuid,
+    p_wishlist_id uuid,
+    p_user_id uuid
+) returns text
+language plpgsql
+as $$
+declare
+    v_reserved_by uuid;
+begin
+    update public.wishlist_items
+       set reserved_by = p_user_id,
+           reserved_at = now()
+     where id = p_item_id
+       and wishlist_id = p_wishlist_id
+       and reserved_by is null;
+    if found then
+        return 'reserved';
+    end if;
+
+    select reserved_by into v_reserved_by
+      from public.wishlist_items
+     where id = p_item_id and wishlist_id = p_wishlist_id;
+    if not found then
+        return 'not_found';
+    end if;
+    if v_reserved_by = p_user_id then
+        return 'already_yours';
+    end if;
+    return 'taken';
+end;
+$$;
+
+-- Снять бронь может тот, кто бронировал, или владелец списка
+create or replace function public.release_item(
+    p_item_id uuid,
+    p_wishlist_id uuid,
+    p_user_id uuid
+) returns text
+language plpgsql
+as $$
+declare
+    v_reserved_by uuid;
+begin
+    update public.wishlist_items i
+       set reserved_by = null,
+           reserved_at = null
+      from public.wishlists w
+     where i.id = p_item_id
+       and i.wishlist_id = p_wishlist_id
+       and w.id = i.wishlist_id
+       and i.reserved_by is not null
+       and (i.reserved_by = p_user_id or w.user_id = p_user_id);
+    if found then
+        return 'released';
+    end if;
+
+    select reserved_by into v_reserved_by
+      from public.wishlist_items
+     where id = p_item_id and wishlist_id = p_wishlist_id;
+    if not found then
+        return 'not_found';
+    end if;
+    if v_reserved_by is null then
+        return 'not_reserved';
+    end if;
+    return 'forbidden';
+end;
+$$;
@@ -0,0 +1,14 @@
+-- Переключение публичности списка одним вызовом. Владелец проверяется
+-- фильтром самого UPDATE; null — список не найден или не принадлежит p_user_id.
+create or replace function public.toggle_wishlist_share(
+    p_wishlist_id uuid,
+    p_user_id uuid
+) returns boolean
+language sql
+as $$
+    update public.wishlists
+       set is_shared = not is_shared
+     where id = p_wishlist_id
+       and user_id = p_user_id
+    returning is_shared;
+$$;
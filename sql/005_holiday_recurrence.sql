@@ -0,0 +1,48 @@
+-- Повторяющиеся праздники: правило хранится один раз в holidays.recurrence,
+-- даты повторов вычисляются приложением только для просматриваемого диапазона
+-- (recurrence.py). null — разовый праздник.
+
+alter table public.holidays
+    add column if not exists recurrence text;
+
+alter table public.holidays
+    drop constraint if exists holidays_recurrence_check;
+alter table public.holidays
+    add constraint holidays_recurrence_check check (
+        recurrence is null
+        or recurrence in ('yearly', 'monthly', 'weekly')
+        or recurrence ~ '^(yearly|monthly):(last|[1-4])-(mon|tue|wed|thu|fri|sat|sun)$'
+    );
+
+-- Календарь выбирает разовые праздники по диапазону дат, а повторяющиеся —
+-- все, начатые до конца диапазона; второй части хватает маленького индекса
+create index if not exists holidays_recurring_idx
+    on public.holidays (user_id, date)
+    where recurrence is not null;
+
+-- create_holiday_with_links с правилом повтора. Старую сигнатуру удаляем,
+-- чтобы PostgREST не выбирал между двумя перегрузками
+drop function if exists public.create_holiday_with_links(uuid, text, date, text, uuid[]);
+
+create or replace function public.create_holiday_with_links(
+    p_user_id uuid,
+    p_title text,
+    p_date date,
+    p_description text default null,
+    p_wishlist_ids uuid[] default '{}',
+    p_recurrence text default null
+) returns uuid
+language plpgsql
+as $$
+declare
+    v_holiday_id uuid;
+begin
+    insert into public.holidays (user_id, title, date, description, recurrence)
+    values (p_user_id, p_title, p_date, p_description, p_recurrence)
+    returning id into v_holiday_id;
+
+    perform public.link_holiday_wishlists(v_holiday_id, p_user_id, p_wishlist_ids);
+
+    return v_holiday_id;
+end;
+$$;
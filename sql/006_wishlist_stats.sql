@@ -0,0 +1,100 @@
+-- Агрегаты списка для страницы «Мои списки»: число подарков, число
+-- забронированных и суммы цен по валютам — прямо в строке wishlists.
+-- Триггер на wishlist_items поддерживает их инкрементально: каждое изменение
+-- предмета (добавление, бронь, снятие брони, принятое предложение, удаление)
+-- вычитает старый вклад строки и прибавляет новый, без пересчёта по списку.
+
+alter table public.wishlists
+    add column if not exists item_count integer not null default 0,
+    add column if not exists reserved_count integer not null default 0,
+    add column if not exists totals jsonb not null default '{}'::jsonb;
+
+-- Вклад одного предмета со знаком p_sign; нулевые суммы из totals убираются
+create or replace function public.wishlist_stats_apply(
+    p_wishlist_id uuid,
+    p_sign integer,
+    p_reserved boolean,
+    p_price numeric,
+    p_currency text
+) returns void
+language sql
+as $$
+    update public.wishlists w
+       set item_count = w.item_count + p_sign,
+           reserved_count = w.reserved_count + case when p_reserved then p_sign else 0 end,
+           totals = case
+               when p_price is null then w.totals
+               when coalesce((w.totals ->> c.currency)::numeric, 0) + p_sign * p_price = 0
+                   then w.totals - c.currency
+               else jsonb_set(
+                   w.totals,
+                   array[c.currency],
+                   to_jsonb(coalesce((w.totals ->> c.currency)::numeric, 0) + p_sign * p_price)
+               )
+           end
+      from (select coalesce(p_currency, '€') as currency) c
+     where w.id = p_wishlist_id;
+$$;
+
+-- security definer: гость, бронирующий подарок, не может по RLS обновлять
+-- чужой wishlists, а агрегаты владельца должны измениться
+create or replace function public.wishlist_items_stats()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        perform public.wishlist_stats_apply(
+            old.wishlist_id, -1, old.reserved_by is not null, old.price, old.currency
+        );
+    end if;
+    if tg_op in ('INSERT', 'UPDATE') then
+        perform public.wishlist_stats_apply(
+            new.wishlist_id, 1, new.reserved_by is not null, new.price, new.currency
+        );
+    end if;
+    return null;
+end;
+$$;
+
+begin;
+
+-- Пересчёт и включение триггера — атомарно относительно записей в wishlist_items
+lock table public.wishlist_items in share row exclusive mode;
+
+drop trigger if exists wishlist_items_stats on public.wishlist_items;
+create trigger wishlist_items_stats
+    after insert or delete or update of wishlist_id, price, currency, reserved_by
+    on public.wishlist_items
+    for each row execute function public.wishlist_items_stats();
+
+-- Начальные значения для уже существующих списков
+with per_currency as (
+    select wishlist_id,
+           coalesce(currency, '€') as currency,
+           count(*) as item_count,
+           count(reserved_by) as reserved_count,
+           sum(price) as total
+      from public.wishlist_items
+     group by 1, 2
+)
+update public.wishlists w
+   set item_count = s.item_count,
+       reserved_count = s.reserved_count,
+       totals = s.totals
+  from (
+      select wishlist_id,
+             sum(item_count)::integer as item_count,
+             sum(reserved_count)::integer as reserved_count,
+             coalesce(
+                 jsonb_object_agg(currency, total) filter (where total is not null and total <> 0),
+                 '{}'::jsonb
+             ) as totals
+        from per_currency
+       group by wishlist_id
+  ) s
+ where w.id = s.wishlist_id;
+
+commit;
@@ -0,0 +1,64 @@
+-- Модерация предложений пачкой: одна функция — один вызов и одна транзакция.
+-- Принятые переносятся в wishlist_items (с suggested_by) одним INSERT ... SELECT,
+-- статусы меняются одним UPDATE на решение. Трогаются только pending-предложения
+-- этого списка: повторное принятие не создаёт дубликатов.
+-- Результат: {"owner": bool, "items": [...], "accepted": [id...], "rejected": [id...]};
+-- owner = false — список не найден или не принадлежит p_user_id.
+
+create or replace function public.moderate_suggestions(
+    p_wishlist_id uuid,
+    p_user_id uuid,
+    p_accept uuid[] default '{}',
+    p_reject uuid[] default '{}'
+) returns jsonb
+language plpgsql
+as $$
+declare
+    v_items jsonb;
+    v_accepted jsonb;
+    v_rejected jsonb;
+begin
+    if not exists (
+        select 1 from public.wishlists
+         where id = p_wishlist_id and user_id = p_user_id
+    ) then
+        return jsonb_build_object('owner', false);
+    end if;
+
+    with accepted as (
+        update public.wishlist_suggestions s
+           set status = 'accepted'
+         where s.wishlist_id = p_wishlist_id
+           and s.id = any(coalesce(p_accept, '{}'))
+           and s.status = 'pending'
+        returning s.id, s.wishlist_id, s.title, s.description, s.url, s.price, s.currency, s.suggested_by
+    ), inserted as (
+        insert into public.wishlist_items
+            (wishlist_id, title, description, url, price, currency, priority, suggested_by)
+        select wishlist_id, title, description, url, price, coalesce(currency, '€'), 3, suggested_by
+          from accepted
+        returning *
+    )
+    select coalesce((select jsonb_agg(to_jsonb(i)) from inserted i), '[]'::jsonb),
+           coalesce((select jsonb_agg(a.id) from accepted a), '[]'::jsonb)
+      into v_items, v_accepted;
+
+    with rejected as (
+        update public.wishlist_suggestions s
+           set status = 'rejected'
+         where s.wishlist_id = p_wishlist_id
+           and s.id = any(coalesce(p_reject, '{}'))
+           and not (s.id = any(coalesce(p_accept, '{}')))
+           and s.status = 'pending'
+        returning s.id
+    )
+    select coalesce(jsonb_agg(id), '[]'::jsonb) into v_rejected from rejected;
+
+    return jsonb_build_object(
+        'owner', true,
+        'items', v_items,
+        'accepted', v_accepted,
+        'rejected', v_rejected
+    );
+end;
+$$;
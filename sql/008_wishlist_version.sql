@@ -0,0 +1,54 @@
+-- Версия списка для условных GET (ETag): растёт при любом изменении самого
+-- списка, его предметов и предложений. Страница /wishlist/{id} по версии
+-- отвечает 304 Not Modified, не выбирая предметы и не рисуя шаблон.
+
+alter table public.wishlists
+    add column if not exists version bigint not null default 1;
+
+-- Любое изменение строки списка (название, доступ, агрегаты из
+-- sql/006_wishlist_stats.sql) — новая версия, если её не подняли явно
+create or replace function public.wishlists_bump_version()
+returns trigger
+language plpgsql
+as $$
+begin
+    if new.version = old.version then
+        new.version := old.version + 1;
+    end if;
+    return new;
+end;
+$$;
+
+drop trigger if exists wishlists_version on public.wishlists;
+create trigger wishlists_version
+    before update on public.wishlists
+    for each row execute function public.wishlists_bump_version();
+
+-- security definer: гость, бронирующий подарок или предлагающий свой,
+-- не может по RLS обновлять чужой wishlists, а версия должна измениться
+create or replace function public.wishlist_children_version()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if tg_op in ('UPDATE', 'DELETE') then
+        update public.wishlists set version = version + 1 where id = old.wishlist_id;
+    end if;
+    if tg_op = 'INSERT' or (tg_op = 'UPDATE' and new.wishlist_id <> old.wishlist_id) then
+        update public.wishlists set version = version + 1 where id = new.wishlist_id;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists wishlist_items_version on public.wishlist_items;
+create trigger wishlist_items_version
+    after insert or update or delete on public.wishlist_items
+    for each row execute function public.wishlist_children_version();
+
+drop trigger if exists wishlist_suggestions_version on public.wishlist_suggestions;
+create trigger wishlist_suggestions_version
+    after insert or update or delete on public.wishlist_suggestions
+    for each row execute function public.wishlist_children_version();
@@ -0,0 +1,126 @@
+// static/actions.js
+
+// Формы с data-api отправляются в JSON API (/api/v1) и обновляют страницу
+// на месте. Без JS те же формы работают как обычно: POST → редирект → страница.
+
+const updaters = {
+    share(form, data) {
+        const button = form.querySelector("button");
+        button.classList.toggle("shared", data.is_shared);
+        button.textContent = data.is_shared ? "Отключить публичный доступ" : "Сделать публичным";
+        const notice = document.getElementById("publicNotice");
+        if (notice) notice.hidden = !data.is_shared;
+    },
+
+    reserve(form, data) {
+        renderReservation(form.closest(".reservation"), data);
+    },
+
+    unreserve(form, data) {
+        renderReservation(form.closest(".reservation"), data);
+    },
+
+    accept(form, data) {
+        renderSuggestion(form.closest(".suggestion-card"), data.suggestion.status);
+    },
+
+    reject(form, data) {
+        renderSuggestion(form.closest(".suggestion-card"), data.suggestion.status);
+    },
+
+    moderate(form, data) {
+        // Предложения, которые уже рассмотрены в другой вкладке, остаются как есть
+        for (const [ids, status] of [[data.accepted, "accepted"], [data.rejected, "rejected"]]) {
+            for (const id of ids) {
+                const card = document.querySelector(`.suggestion-card[data-suggestion="${id}"]`);
+                if (card) renderSuggestion(card, status);
+            }
+        }
+        if (!document.querySelector(".suggestion-select")) form.remove();
+    },
+};
+
+// Тело запроса для форм, которым мало одного URL
+const payloads = {
+    moderate(form, submitter) {
+        const ids = [...document.querySelectorAll(`input[name="ids"][form="${form.id}"]:checked`)]
+            .map((input) => input.value);
+        return submitter && submitter.value === "reject" ? { accept: [], reject: ids } : { accept: ids, reject: [] };
+    },
+};
+
+function itemForm(item, action, className, label) {
+    // Обычный action остаётся запасным путём, если fetch не удался
+    return `<form method="POST" action="/wishlist/${item.wishlist_id}/item/${item.id}/${action}"` +
+        ` data-api="/api/v1/wishlists/${item.wishlist_id}/items/${item.id}/${action}"` +
+        ` data-action="${action}"><button type="submit" class="${className}">${label}</button></form>`;
+}
+
+function renderReservation(block, item) {
+    // item.reserved / item.mine — из ответа API или события SSE (без id бронирующего);
+    // владелец ли зритель — из атрибута сетки предметов
+    const grid = block.closest("#items");
+    const isOwner = grid.dataset.owner === "true";
+    const isMine = Boolean(item.reserved && item.mine);
+
+    if (item.reserved) {
+        block.innerHTML = `<div class="reserved-notice">Забронировано ${isMine ? "вами" : "кем-то"}</div>` +
+            (isMine || isOwner ? itemForm(item, "unreserve", "unreserve-btn", "Отменить бронь") : "");
+    } else {
+        block.innerHTML = isOwner ? "" : itemForm(item, "reserve", "reserve-btn", "Забронировать");
+    }
+}
+
+function renderSuggestion(card, status) {
+    card.classList.add(status);
+    card.querySelector(".suggestion-status").textContent = status;
+    const actions = card.querySelector(".suggestion-actions");
+    if (actions) actions.remove();
+    const select = card.querySelector(".suggestion-select");
+    if (select) select.remove();
+}
+
+document.addEventListener("change", (event) => {
+    if (event.target.id !== "selectAll") return;
+    for (const input of document.querySelectorAll('input[name="ids"]')) {
+        input.checked = event.target.checked;
+    }
+});
+
+document.addEventListener("submit", async (event) => {
+    const form = event.target;
+    const updater = updaters[form.dataset.action];
+    if (!form.dataset.api || !updater) return;
+
+    event.preventDefault();
+    const button = event.submitter || form.querySelector("button");
+    if (button) button.disabled = true;
+
+    const payload = payloads[form.dataset.action];
+    const body = payload ? JSON.stringify(payload(form, event.submitter)) : undefined;
+
+    try {
+        const res = await fetch(form.dataset.api, {
+            method: "POST",
+            headers: body
+                ? { "Accept": "application/json", "Content-Type": "application/json" }
+                : { "Accept": "application/json" },
+            body,
+            credentials: "same-origin",
+        });
+        const data = await res.json().catch(() => ({}));
+        if (!res.ok) {
+            alert(data.detail || "Не удалось выполнить действие");
+            return;
+        }
+        updater(form, data);
+    } catch (e) {
+        // Сеть недоступна — отправляем форму по-старому, с нажатой кнопкой
+        // (её name/value — решение модерации)
+        if (button) button.disabled = false;
+        delete form.dataset.api;
+        form.requestSubmit(event.submitter);
+    } finally {
+        if (button) button.disabled = false;
+    }
+});
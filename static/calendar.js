@@ -59,49 +59,105 @@ function renderCalendar() {
     loadEvents(year, month + 1);
 }
 
+// Клиентский кэш событий: "YYYY-MM" → { "15": 3, "25": 1 }.
+// Месяцы грузятся окнами через /calendar/events?from=&to=, соседние —
+// заранее, поэтому переход между месяцами не ждёт сети.
+const PREFETCH_MONTHS = 3;
+const eventsCache = new Map();
+const pendingRanges = new Map();
+
+function monthKey(year, month) {
+    // month — 1..12, переполнение переносится на соседний год
+    const d = new Date(year, month - 1, 1);
+    return `${d.getFullYear()}-${String(d.getMonth() + 1).padStart(2, '0')}`;
+}
+
+function fetchRange(fromKey, toKey) {
+    const rangeKey = `${fromKey}/${toKey}`;
+    if (!pendingRanges.has(rangeKey)) {
+        const request = fetch(`/calendar/events?from=${fromKey}&to=${toKey}`)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.json();
+            })
+            .then(months => {
+                Object.entries(months).forEach(([key, events]) => eventsCache.set(key, events));
+            })
+            .finally(() => pendingRanges.delete(rangeKey));
+        pendingRanges.set(rangeKey, request);
+    }
+    return pendingRanges.get(rangeKey);
+}
+
+function ensureMonths(year, month) {
+    // Окно вокруг месяца грузим одним запросом, если в нём есть пробелы
+    const keys = [];
+    for (let offset = -PREFETCH_MONTHS; offset <= PREFETCH_MONTHS; offset++) {
+        keys.push(monthKey(year, month + offset));
+    }
+    if (keys.every(key => eventsCache.has(key))) {
+        return Promise.resolve();
+    }
+    return fetchRange(keys[0], keys[keys.length - 1]);
+}
+
 async function loadEvents(year, month) {
+    const key = monthKey(year, month);
     try {
-        const response = await fetch(`/calendar/events/${year}/${month}`);
-        const events = await response.json(); // { "15": 3, "25": 1 }
-
-        document.querySelectorAll('.calendar-day').forEach(day => {
-            const dayNum = day.textContent.trim();
-            if (events[dayNum]) {
-                day.classList.add('has-events');
-
-                const dotsContainer = document.createElement('div');
-                dotsContainer.className = 'event-dots';
-
-                const count = events[dayNum];
-                for (let i = 0; i < Math.min(count, colors.length); i++) {
-                    const dot = document.createElement('span');
-                    dot.className = 'event-dot';
-                    dot.style.backgroundColor = colors[i];
-                    dotsContainer.appendChild(dot);
-                }
-
-                if (count > colors.length) {
-                    const more = document.createElement('span');
-                    more.textContent = `+${count - colors.length}`;
-                    more.style.fontSize = '0.7rem';
-                    more.style.color = '#ef4444';
-                    dotsContainer.appendChild(more);
-                }
-
-                day.appendChild(dotsContainer);
-            }
-        });
+        if (!eventsCache.has(key)) {
+            await ensureMonths(year, month);
+        } else {
+            // Месяц уже есть — докачиваем соседей в фоне
+            ensureMonths(year, month).catch(error => console.error("Ошибка загрузки событий:", error));
+        }
+
+        // Пока шёл запрос, пользователь мог уйти на другой месяц
+        if (key !== monthKey(currentDate.getFullYear(), currentDate.getMonth() + 1)) return;
+
+        paintEvents(eventsCache.get(key) || {});
     } catch (error) {
         console.error("Ошибка загрузки событий:", error);
     }
 }
 
+function paintEvents(events) {
+    document.querySelectorAll('.calendar-day').forEach(day => {
+        const dayNum = day.textContent.trim();
+        if (events[dayNum]) {
+            day.classList.add('has-events');
+
+            const dotsContainer = document.createElement('div');
+            dotsContainer.className = 'event-dots';
+
+            const count = events[dayNum];
+            for (let i = 0; i < Math.min(count, colors.length); i++) {
+                const dot = document.createElement('span');
+                dot.className = 'event-dot';
+                dot.style.backgroundColor = colors[i];
+                dotsContainer.appendChild(dot);
+            }
+
+            if (count > colors.length) {
+                const more = document.createElement('span');
+                more.textContent = `+${count - colors.length}`;
+                more.style.fontSize = '0.7rem';
+                more.style.color = '#ef4444';
+                dotsContainer.appendChild(more);
+            }
+
+            day.appendChild(dotsContainer);
+        }
+    });
+}
+
 function prevMonth() {
+    currentDate.setDate(1); // 31 января + 1 месяц не должно стать 3 марта
     currentDate.setMonth(currentDate.getMonth() - 1);
     renderCalendar();
 }
 
 function nextMonth() {
+    currentDate.setDate(1); // 31 января + 1 месяц не должно стать 3 марта
     currentDate.setMonth(currentDate.getMonth() + 1);
     renderCalendar();
 }
@@ -0,0 +1,79 @@
+// static/live.js
+
+// Живые обновления страницы списка по SSE (/wishlist/{id}/events):
+// чужие брони, новые предметы и — владельцу — новые предложения.
+// Использует renderReservation и itemForm из actions.js.
+
+(function () {
+    const grid = document.getElementById("items");
+    if (!grid || !window.EventSource) return;
+
+    const wishlistId = grid.dataset.wishlist;
+    const source = new EventSource(`/wishlist/${wishlistId}/events`);
+
+    function escapeHtml(text) {
+        const div = document.createElement("div");
+        div.textContent = text == null ? "" : String(text);
+        return div.innerHTML;
+    }
+
+    function notify(html) {
+        let notice = document.getElementById("liveNotice");
+        if (!notice) {
+            notice = document.createElement("div");
+            notice.id = "liveNotice";
+            notice.className = "public-notice";
+            grid.before(notice);
+        }
+        notice.innerHTML = html;
+    }
+
+    function updateReservation(itemId, reserved, mine) {
+        const block = grid.querySelector(`.reservation[data-item="${itemId}"]`);
+        if (block) renderReservation(block, { id: itemId, wishlist_id: wishlistId, reserved, mine });
+    }
+
+    function addCard(item) {
+        if (grid.querySelector(`.reservation[data-item="${item.id}"]`)) return;
+        const card = document.createElement("div");
+        card.className = "card" + (item.suggested_by ? " suggested-item" : "");
+        card.innerHTML =
+            `<h3>${escapeHtml(item.title)}</h3>` +
+            (item.url ? `<a href="${escapeHtml(item.url)}" target="_blank" class="item-link">Ссылка на товар</a>` : "") +
+            (item.price ? `<p class="price">${escapeHtml(item.price)} ${escapeHtml(item.currency)}</p>` : "") +
+            (item.description ? `<p class="description">${escapeHtml(item.description)}</p>` : "") +
+            `<div class="meta">Приоритет: ${"★".repeat(item.priority || 0)}</div>` +
+            `<div class="reservation" data-item="${item.id}"></div>`;
+        grid.appendChild(card);
+        updateReservation(item.id, item.reserved, false);
+        const empty = document.getElementById("emptyList");
+        if (empty) empty.remove();
+    }
+
+    source.addEventListener("item_reserved", (e) => {
+        const data = JSON.parse(e.data);
+        updateReservation(data.item_id, true, data.mine);
+    });
+
+    source.addEventListener("item_unreserved", (e) => {
+        updateReservation(JSON.parse(e.data).item_id, false, false);
+    });
+
+    source.addEventListener("item_added", (e) => {
+        addCard(JSON.parse(e.data).item);
+    });
+
+    source.addEventListener("items_imported", (e) => {
+        const data = JSON.parse(e.data);
+        notify(`Добавлено желаний: ${data.count} — <a href="">обновить страницу</a>`);
+    });
+
+    source.addEventListener("suggestion_added", (e) => {
+        const data = JSON.parse(e.data);
+        notify(`Новое предложение: «${escapeHtml(data.suggestion.title)}» — ` +
+            `<a href="/wishlist/${wishlistId}/suggestions">посмотреть</a>`);
+    });
+
+    // Часть событий потеряна (очередь переполнилась) — проще перечитать страницу
+    source.addEventListener("resync", () => location.reload());
+})();
@@ -0,0 +1,44 @@
+from storage.base import (
+    ALREADY_YOURS,
+    FORBIDDEN,
+    NOT_FOUND,
+    NOT_RESERVED,
+    RELEASED,
+    RESERVED,
+    TAKEN,
+    AuthError,
+    Storage,
+)
+
+BACKENDS = ("supabase", "memory")
+
+
+def create_storage(backend: str, **options) -> Storage:
+    # Импорты внутри веток: бэкенду memory не нужен клиент Supabase
+    if backend == "supabase":
+        from db import Database
+        from storage.supabase_store import SupabaseStorage
+
+        return SupabaseStorage(Database(**options))
+
+    if backend == "memory":
+        from storage.memory_store import MemoryStorage
+
+        return MemoryStorage(**options)
+
+    raise ValueError(f"Неизвестный STORAGE_BACKEND: {backend} (доступны: {', '.join(BACKENDS)})")
+
+
+__all__ = [
+    "ALREADY_YOURS",
+    "FORBIDDEN",
+    "NOT_FOUND",
+    "NOT_RESERVED",
+    "RELEASED",
+    "RESERVED",
+    "TAKEN",
+    "AuthError",
+    "BACKENDS",
+    "Storage",
+    "create_storage",
+]
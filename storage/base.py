@@ -0,0 +1,184 @@
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import AsyncIterator, Iterable, Optional, Sequence
+
+from auth import AuthUser
+
+
+# Исходы бронирования — общие для всех бэкендов
+RESERVED = "reserved"
+TAKEN = "taken"
+ALREADY_YOURS = "already_yours"
+RELEASED = "released"
+NOT_RESERVED = "not_reserved"
+FORBIDDEN = "forbidden"
+NOT_FOUND = "not_found"
+
+
+class AuthError(Exception):
+    pass
+
+
+def empty_stats() -> dict:
+    return {"item_count": 0, "reserved_count": 0, "totals": {}}
+
+
+def count_item(stats: dict, item: dict, sign: int = 1) -> None:
+    # Вклад предмета в агрегаты списка — то же, что триггер из sql/006_wishlist_stats.sql
+    stats["item_count"] += sign
+    if item.get("reserved_by"):
+        stats["reserved_count"] += sign
+    if item.get("price") is not None:
+        currency = item.get("currency") or "€"
+        total = round(stats["totals"].get(currency, 0) + sign * item["price"], 2)
+        if total:
+            stats["totals"][currency] = total
+        else:
+            stats["totals"].pop(currency, None)
+
+
+class AuthRepository(ABC):
+    @abstractmethod
+    async def sign_in(self, email: str, password: str) -> tuple[str, int]:
+        """Возвращает (access_token, expires_in) или бросает AuthError."""
+
+    @abstractmethod
+    async def sign_up(self, email: str, password: str) -> None: ...
+
+    @abstractmethod
+    async def get_user(self, token: str) -> Optional[AuthUser]: ...
+
+
+class WishlistRepository(ABC):
+    @abstractmethod
+    async def get(self, wishlist_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def get_owned(self, wishlist_id: str, user_id: str) -> Optional[dict]: ...
+
+    @abstractmethod
+    async def owner(self, wishlist_id: str) -> Optional[str]: ...
+
+    @abstractmethod
+    async def list_for_user(self, user_id: str, columns: str = "*") -> list[dict]: ...
+
+    @abstractmethod
+    async def overview(self, user_id: str) -> list[dict]:
+        """Списки пользователя для страницы «Мои списки»: поля карточки
+        и агрегаты item_count, reserved_count, totals (валюта → сумма цен)."""
+
+    @abstractmethod
+    async def list_public(self, after: Optional[tuple[str, str]], limit: int) -> list[dict]:
+        """Публичные списки по убыванию (created_at, id), строго после курсора."""
+
+    @abstractmethod
+    async def create(self, user_id: str, title: str, description: Optional[str]) -> dict: ...
+
+    @abstractmethod
+    async def share(self, wishlist_id: str, user_id: str) -> None: ...
+
+    @abstractmethod
+    async def toggle_share(self, wishlist_id: str, user_id: str) -> Optional[bool]:
+        """Новое значение is_shared; None — список не найден или не принадлежит user_id."""
+
+    @abstractmethod
+    async def delete(self, wishlist_id: str, user_id: str) -> bool: ...
+
+
+class ItemRepository(ABC):
+    @abstractmethod
+    async def list(self, wishlist_id: str) -> list[dict]:
+        """Предметы по убыванию приоритета, затем по дате создания."""
+
+    @abstractmethod
+    async def add(self, wishlist_id: str, fields: dict) -> dict: ...
+
+    @abstractmethod
+    async def add_many(self, wishlist_id: str, rows: Sequence[dict]) -> int:
+        """Многострочная вставка одним обращением; число вставленных строк."""
+
+    @abstractmethod
+    def pages(self, wishlist_id: str, page_size: int) -> AsyncIterator[Sequence[dict]]:
+        """Предметы страницами по (created_at, id) — для выгрузки любого размера."""
+
+    @abstractmethod
+    async def reserve(self, item_id: str, wishlist_id: str, user_id: str) -> str: ...
+
+    @abstractmethod
+    async def release(self, item_id: str, wishlist_id: str, user_id: str) -> str: ...
+
+
+class SuggestionRepository(ABC):
+    @abstractmethod
+    async def add(self, wishlist_id: str, user_id: str, fields: dict) -> dict: ...
+
+    @abstractmethod
+    async def list_for_owner(self, wishlist_id: str, user_id: str) -> Optional[dict]:
+        """Список владельца с вложенными wishlist_suggestions; None — не его список."""
+
+    @abstractmethod
+    async def accept(self, wishlist_id: str, suggestion_id: str) -> Optional[dict]:
+        """Переносит предложение в wishlist_items; None — предложение не найдено."""
+
+    @abstractmethod
+    async def reject(self, wishlist_id: str, suggestion_id: str) -> None: ...
+
+    @abstractmethod
+    async def moderate(
+        self,
+        wishlist_id: str,
+        user_id: str,
+        accept: Sequence[str],
+        reject: Sequence[str],
+    ) -> Optional[dict]:
+        """Решения по pending-предложениям пачкой: {"items": [...], "accepted": [id...],
+        "rejected": [id...]}; id в обоих списках считается принятым.
+        None — список не найден или не принадлежит user_id."""
+
+
+class HolidayRepository(ABC):
+    @abstractmethod
+    async def in_range(self, user_id: str, start: date, end: date) -> list[dict]:
+        """Праздники с вложенными holiday_wishlists → wishlists(id, title),
+        повторяющиеся — развёрнутыми по датам диапазона (см. recurrence.expand)."""
+
+    @abstractmethod
+    async def counts(self, user_id: str, start: date, end: date) -> dict[str, int]:
+        """Дата (YYYY-MM-DD) → число привязанных вишлистов, с учётом повторов."""
+
+    @abstractmethod
+    async def create(
+        self,
+        user_id: str,
+        title: str,
+        holiday_date: date,
+        description: Optional[str],
+        wishlist_ids: Iterable[str],
+        recurrence: Optional[str] = None,
+    ) -> str: ...
+
+    @abstractmethod
+    async def link(self, user_id: str, holiday_id: str, wishlist_ids: Iterable[str]) -> list[str]: ...
+
+
+class Storage(ABC):
+    auth: AuthRepository
+    wishlists: WishlistRepository
+    items: ItemRepository
+    suggestions: SuggestionRepository
+    holidays: HolidayRepository
+    # Секрет, которым бэкенд сам подписывает токены (только у локальных бэкендов)
+    jwt_secret: Optional[str] = None
+
+    async def connect(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    async def warm(self) -> None:
+        # После connect(): заранее открыть то, что иначе откроет первый запрос
+        pass
+
+    def stats(self) -> dict:
+        return {}
@@ -0,0 +1,484 @@
+import hashlib
+import json
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+import jwt
+
+from auth import AuthUser
+from recurrence import expand
+from storage.base import (
+    ALREADY_YOURS,
+    FORBIDDEN,
+    NOT_FOUND,
+    NOT_RESERVED,
+    RELEASED,
+    RESERVED,
+    TAKEN,
+    AuthError,
+    AuthRepository,
+    HolidayRepository,
+    ItemRepository,
+    Storage,
+    SuggestionRepository,
+    WishlistRepository,
+    count_item,
+    empty_stats,
+)
+
+
+def new_id() -> str:
+    return str(uuid.uuid4())
+
+
+def now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def touch(tables, wishlist_id: str) -> None:
+    # Новая версия списка — как триггеры из sql/008_wishlist_version.sql
+    wishlist = tables.wishlists.get(wishlist_id)
+    if wishlist:
+        wishlist["version"] += 1
+
+
+def hash_password(password: str, salt: str) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt.encode(), 100_000).hex()
+
+
+class Tables:
+    """Строки всех таблиц в памяти процесса, по id."""
+
+    def __init__(self):
+        self.users: dict[str, dict] = {}
+        self.wishlists: dict[str, dict] = {}
+        self.wishlist_items: dict[str, dict] = {}
+        self.wishlist_suggestions: dict[str, dict] = {}
+        self.holidays: dict[str, dict] = {}
+        self.holiday_wishlists: list[dict] = []
+
+
+class MemoryAuth(AuthRepository):
+    def __init__(self, tables: Tables, jwt_secret: str, expires_in: int = 3600):
+        self.tables = tables
+        self.jwt_secret = jwt_secret
+        self.expires_in = expires_in
+
+    def issue(self, user: dict) -> str:
+        return jwt.encode(
+            {
+                "sub": user["id"],
+                "email": user["email"],
+                "role": "authenticated",
+                "aud": "authenticated",
+                "exp": int(time.time()) + self.expires_in,
+            },
+            self.jwt_secret,
+            algorithm="HS256",
+        )
+
+    async def sign_in(self, email, password):
+        user = next((u for u in self.tables.users.values() if u["email"] == email), None)
+        if not user or user["password_hash"] != hash_password(password, user["salt"]):
+            raise AuthError("Invalid login credentials")
+        return self.issue(user), self.expires_in
+
+    async def sign_up(self, email, password):
+        if any(u["email"] == email for u in self.tables.users.values()):
+            raise AuthError("duplicate key: user already registered")
+        salt = secrets.token_hex(8)
+        user_id = new_id()
+        self.tables.users[user_id] = {
+            "id": user_id,
+            "email": email,
+            "salt": salt,
+            "password_hash": hash_password(password, salt),
+        }
+
+    async def get_user(self, token):
+        try:
+            claims = jwt.decode(token, self.jwt_secret, algorithms=["HS256"], audience="authenticated")
+        except jwt.PyJWTError:
+            return None
+        if claims["sub"] not in self.tables.users:
+            return None
+        return AuthUser(
+            id=claims["sub"],
+            email=claims.get("email"),
+            role=claims.get("role"),
+            exp=float(claims["exp"]),
+        )
+
+
+class MemoryWishlists(WishlistRepository):
+    def __init__(self, tables: Tables):
+        self.tables = tables
+
+    async def get(self, wishlist_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        return dict(row) if row else None
+
+    async def get_owned(self, wishlist_id, user_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        return dict(row) if row and row["user_id"] == str(user_id) else None
+
+    async def owner(self, wishlist_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        return row["user_id"] if row else None
+
+    async def list_for_user(self, user_id, columns="*"):
+        rows = [w for w in self.tables.wishlists.values() if w["user_id"] == str(user_id)]
+        rows.sort(key=lambda w: w["created_at"], reverse=True)
+        return [dict(w) for w in rows]
+
+    async def overview(self, user_id):
+        # Агрегаты поддерживаются при каждом изменении предметов (MemoryItems)
+        return [
+            {**w, "totals": dict(w["totals"])}
+            for w in await self.list_for_user(user_id)
+        ]
+
+    async def list_public(self, after, limit):
+        rows = [w for w in self.tables.wishlists.values() if w["is_shared"]]
+        if after:
+            rows = [w for w in rows if (w["created_at"], w["id"]) < tuple(after)]
+        rows.sort(key=lambda w: (w["created_at"], w["id"]), reverse=True)
+        return [dict(w) for w in rows[:limit]]
+
+    async def create(self, user_id, title, description):
+        row = {
+            "id": new_id(),
+            "user_id": str(user_id),
+            "title": title,
+            "description": description,
+            "is_shared": False,
+            "created_at": now(),
+            "version": 1,
+            **empty_stats(),
+        }
+        self.tables.wishlists[row["id"]] = row
+        return dict(row)
+
+    async def share(self, wishlist_id, user_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        if row and row["user_id"] == str(user_id):
+            row["is_shared"] = True
+            touch(self.tables, wishlist_id)
+
+    async def toggle_share(self, wishlist_id, user_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        if not row or row["user_id"] != str(user_id):
+            return None
+        row["is_shared"] = not row["is_shared"]
+        touch(self.tables, wishlist_id)
+        return row["is_shared"]
+
+    async def delete(self, wishlist_id, user_id):
+        row = self.tables.wishlists.get(wishlist_id)
+        if not row or row["user_id"] != str(user_id):
+            return False
+        # Каскад, как ON DELETE CASCADE в Supabase
+        del self.tables.wishlists[wishlist_id]
+        for table in (self.tables.wishlist_items, self.tables.wishlist_suggestions):
+            for row_id in [k for k, v in table.items() if v["wishlist_id"] == wishlist_id]:
+                del table[row_id]
+        self.tables.holiday_wishlists = [
+            hw for hw in self.tables.holiday_wishlists if hw["wishlist_id"] != wishlist_id
+        ]
+        return True
+
+
+class MemoryItems(ItemRepository):
+    def __init__(self, tables: Tables):
+        self.tables = tables
+
+    async def list(self, wishlist_id):
+        rows = [i for i in self.tables.wishlist_items.values() if i["wishlist_id"] == wishlist_id]
+        rows.sort(key=lambda i: (-(i["priority"] or 0), i["created_at"]))
+        return [dict(i) for i in rows]
+
+    async def add(self, wishlist_id, fields):
+        row = {
+            "id": new_id(),
+            "wishlist_id": wishlist_id,
+            "title": None,
+            "description": None,
+            "url": None,
+            "price": None,
+            "currency": "€",
+            "priority": 3,
+            "suggested_by": None,
+            "reserved_by": None,
+            "reserved_at": None,
+            "created_at": now(),
+            **fields,
+        }
+        self.tables.wishlist_items[row["id"]] = row
+        if wishlist_id in self.tables.wishlists:
+            count_item(self.tables.wishlists[wishlist_id], row)
+            touch(self.tables, wishlist_id)
+        return dict(row)
+
+    async def add_many(self, wishlist_id, rows):
+        for fields in rows:
+            await self.add(wishlist_id, fields)
+        return len(rows)
+
+    async def pages(self, wishlist_id, page_size):
+        rows = [i for i in self.tables.wishlist_items.values() if i["wishlist_id"] == wishlist_id]
+        rows.sort(key=lambda i: (i["created_at"], i["id"]))
+        for start in range(0, len(rows), page_size):
+            yield [dict(i) for i in rows[start:start + page_size]]
+
+    def set_reservation(self, row: dict, user_id: Optional[str]) -> None:
+        # Снимаем старый вклад предмета в агрегаты списка и добавляем новый
+        wishlist = self.tables.wishlists[row["wishlist_id"]]
+        count_item(wishlist, row, -1)
+        row["reserved_by"] = user_id
+        row["reserved_at"] = now() if user_id else None
+        count_item(wishlist, row)
+        touch(self.tables, row["wishlist_id"])
+
+    def find(self, item_id, wishlist_id):
+        row = self.tables.wishlist_items.get(item_id)
+        return row if row and row["wishlist_id"] == wishlist_id else None
+
+    async def reserve(self, item_id, wishlist_id, user_id):
+        row = self.find(item_id, wishlist_id)
+        if not row:
+            return NOT_FOUND
+        if row["reserved_by"]:
+            return ALREADY_YOURS if row["reserved_by"] == str(user_id) else TAKEN
+        self.set_reservation(row, str(user_id))
+        return RESERVED
+
+    async def release(self, item_id, wishlist_id, user_id):
+        row = self.find(item_id, wishlist_id)
+        wishlist = self.tables.wishlists.get(wishlist_id)
+        if not row or not wishlist:
+            return NOT_FOUND
+        if not row["reserved_by"]:
+            return NOT_RESERVED
+        if str(user_id) not in (row["reserved_by"], wishlist["user_id"]):
+            return FORBIDDEN
+        self.set_reservation(row, None)
+        return RELEASED
+
+
+class MemorySuggestions(SuggestionRepository):
+    def __init__(self, tables: Tables, items: MemoryItems):
+        self.tables = tables
+        self.items = items
+
+    async def add(self, wishlist_id, user_id, fields):
+        row = {
+            "id": new_id(),
+            "wishlist_id": wishlist_id,
+            "suggested_by": str(user_id),
+            "created_at": now(),
+            **fields,
+            "status": "pending",
+        }
+        self.tables.wishlist_suggestions[row["id"]] = row
+        touch(self.tables, wishlist_id)
+        return dict(row)
+
+    async def list_for_owner(self, wishlist_id, user_id):
+        wishlist = self.tables.wishlists.get(wishlist_id)
+        if not wishlist or wishlist["user_id"] != str(user_id):
+            return None
+        suggestions = [
+            dict(s) for s in self.tables.wishlist_suggestions.values()
+            if s["wishlist_id"] == wishlist_id
+        ]
+        suggestions.sort(key=lambda s: s["created_at"], reverse=True)
+        return {
+            "id": wishlist["id"],
+            "user_id": wishlist["user_id"],
+            "title": wishlist["title"],
+            "version": wishlist["version"],
+            "wishlist_suggestions": suggestions,
+        }
+
+    async def accept(self, wishlist_id, suggestion_id):
+        suggestion = self.tables.wishlist_suggestions.get(suggestion_id)
+        if not suggestion or suggestion["wishlist_id"] != wishlist_id:
+            return None
+        item = await self.items.add(wishlist_id, {
+            "title": suggestion["title"],
+            "description": suggestion.get("description"),
+            "url": suggestion.get("url"),
+            "price": suggestion.get("price"),
+            "currency": suggestion.get("currency", "€"),
+            "priority": 3,
+            "suggested_by": suggestion["suggested_by"],
+        })
+        suggestion["status"] = "accepted"
+        touch(self.tables, wishlist_id)
+        return item
+
+    async def reject(self, wishlist_id, suggestion_id):
+        suggestion = self.tables.wishlist_suggestions.get(suggestion_id)
+        if suggestion and suggestion["wishlist_id"] == wishlist_id:
+            suggestion["status"] = "rejected"
+            touch(self.tables, wishlist_id)
+
+    async def moderate(self, wishlist_id, user_id, accept, reject):
+        wishlist = self.tables.wishlists.get(wishlist_id)
+        if not wishlist or wishlist["user_id"] != str(user_id):
+            return None
+
+        def pending(ids):
+            return [
+                s for s in (self.tables.wishlist_suggestions.get(i) for i in dict.fromkeys(ids))
+                if s and s["wishlist_id"] == wishlist_id and s["status"] == "pending"
+            ]
+
+        accepted = pending(accept)
+        rejected = [s for s in pending(reject) if s["id"] not in accept]
+        items = [await self.accept(wishlist_id, s["id"]) for s in accepted]
+        for s in rejected:
+            s["status"] = "rejected"
+        if rejected:
+            touch(self.tables, wishlist_id)
+        return {
+            "items": items,
+            "accepted": [s["id"] for s in accepted],
+            "rejected": [s["id"] for s in rejected],
+        }
+
+
+class MemoryHolidays(HolidayRepository):
+    def __init__(self, tables: Tables):
+        self.tables = tables
+
+    def links(self, holiday_id):
+        return [
+            {
+                "wishlist_id": hw["wishlist_id"],
+                "wishlists": {
+                    "id": hw["wishlist_id"],
+                    "title": self.tables.wishlists[hw["wishlist_id"]]["title"],
+                },
+            }
+            for hw in self.tables.holiday_wishlists
+            if hw["holiday_id"] == holiday_id and hw["wishlist_id"] in self.tables.wishlists
+        ]
+
+    def select(self, user_id, start, end):
+        # Разовые — по дате в диапазоне, повторяющиеся — все начатые до конца диапазона
+        first, last = start.isoformat(), end.isoformat()
+        rows = [
+            h for h in self.tables.holidays.values()
+            if h["user_id"] == str(user_id) and h["date"] <= last
+            and (h.get("recurrence") or h["date"] >= first)
+        ]
+        return expand(rows, start, end)
+
+    async def in_range(self, user_id, start, end):
+        return [
+            {**h, "holiday_wishlists": self.links(h["id"])}
+            for h in self.select(user_id, start, end)
+        ]
+
+    async def counts(self, user_id, start, end):
+        counts = {}
+        for h in self.select(user_id, start, end):
+            counts[h["date"]] = counts.get(h["date"], 0) + len(self.links(h["id"]))
+        return counts
+
+    async def create(self, user_id, title, holiday_date, description, wishlist_ids, recurrence=None):
+        row = {
+            "id": new_id(),
+            "user_id": str(user_id),
+            "title": title,
+            "date": holiday_date.isoformat(),
+            "description": description,
+            "recurrence": recurrence,
+            "created_at": now(),
+        }
+        self.tables.holidays[row["id"]] = row
+        await self.link(user_id, row["id"], wishlist_ids)
+        return row["id"]
+
+    async def link(self, user_id, holiday_id, wishlist_ids):
+        linked = {
+            hw["wishlist_id"] for hw in self.tables.holiday_wishlists
+            if hw["holiday_id"] == holiday_id
+        }
+        added = []
+        for wid in dict.fromkeys(wishlist_ids):
+            wishlist = self.tables.wishlists.get(wid)
+            if wishlist and wishlist["user_id"] == str(user_id) and wid not in linked:
+                self.tables.holiday_wishlists.append({"holiday_id": holiday_id, "wishlist_id": wid})
+                added.append(wid)
+        return added
+
+
+class MemoryStorage(Storage):
+    """Бэкенд в памяти процесса: для локального запуска и бенчмарков без Supabase.
+
+    Данные живут до перезапуска; начальное состояние можно загрузить
+    из JSON (MEMORY_SEED) с ключами users / wishlists / wishlist_items /
+    wishlist_suggestions / holidays / holiday_wishlists.
+    """
+
+    def __init__(self, jwt_secret: Optional[str] = None, seed_path: Optional[str] = None):
+        self.jwt_secret = jwt_secret or secrets.token_urlsafe(32)
+        self.tables = Tables()
+        self.auth = MemoryAuth(self.tables, self.jwt_secret)
+        self.wishlists = MemoryWishlists(self.tables)
+        self.items = MemoryItems(self.tables)
+        self.suggestions = MemorySuggestions(self.tables, self.items)
+        self.holidays = MemoryHolidays(self.tables)
+        if seed_path:
+            with open(seed_path, encoding="utf-8") as f:
+                self.load(json.load(f))
+
+    def load(self, data: dict) -> None:
+        for user in data.get("users", []):
+            salt = secrets.token_hex(8)
+            user_id = str(user.get("id") or new_id())
+            self.tables.users[user_id] = {
+                "id": user_id,
+                "email": user["email"],
+                "salt": salt,
+                "password_hash": hash_password(user["password"], salt),
+            }
+        defaults = {
+            "wishlists": {"description": None, "is_shared": False},
+            "wishlist_items": {
+                "description": None, "url": None, "price": None, "currency": "€",
+                "priority": 3, "suggested_by": None, "reserved_by": None, "reserved_at": None,
+            },
+            "wishlist_suggestions": {"status": "pending"},
+            "holidays": {"description": None, "recurrence": None},
+        }
+        for table, row_defaults in defaults.items():
+            rows = getattr(self.tables, table)
+            for row in data.get(table, []):
+                row = {"id": new_id(), "created_at": now(), **row_defaults, **row}
+                rows[str(row["id"])] = row
+        self.tables.holiday_wishlists.extend(data.get("holiday_wishlists", []))
+
+        # Агрегаты списков по загруженным предметам
+        for wishlist in self.tables.wishlists.values():
+            wishlist.update(empty_stats())
+            wishlist.setdefault("version", 1)
+        for item in self.tables.wishlist_items.values():
+            if item["wishlist_id"] in self.tables.wishlists:
+                count_item(self.tables.wishlists[item["wishlist_id"]], item)
+
+    def stats(self):
+        return {
+            "rows": {
+                "wishlists": len(self.tables.wishlists),
+                "wishlist_items": len(self.tables.wishlist_items),
+                "wishlist_suggestions": len(self.tables.wishlist_suggestions),
+                "holidays": len(self.tables.holidays),
+                "holiday_wishlists": len(self.tables.holiday_wishlists),
+            }
+        }
@@ -0,0 +1,631 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+
+from postgrest.exceptions import APIError
+from postgrest.types import ReturnMethod
+
+from auth import AuthUser, unverified_exp
+from db import Database
+from recurrence import expand
+from storage.base import (
+    ALREADY_YOURS,
+    FORBIDDEN,
+    NOT_FOUND,
+    NOT_RESERVED,
+    RELEASED,
+    RESERVED,
+    TAKEN,
+    AuthError,
+    AuthRepository,
+    HolidayRepository,
+    ItemRepository,
+    Storage,
+    SuggestionRepository,
+    WishlistRepository,
+    count_item,
+    empty_stats,
+)
+
+logger = logging.getLogger(__name__)
+
+# Поля карточки на странице «Мои списки» — без select("*")
+OVERVIEW_COLUMNS = "id, user_id, title, description, is_shared, created_at"
+
+
+class SupabaseAuth(AuthRepository):
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def sign_in(self, email, password):
+        try:
+            res = await self.db.auth.sign_in_with_password({"email": email, "password": password})
+        except Exception as e:
+            raise AuthError(str(e))
+        if not res.session:
+            raise AuthError("Не удалось войти")
+        return res.session.access_token, res.session.expires_in
+
+    async def sign_up(self, email, password):
+        try:
+            await self.db.auth.sign_up({"email": email, "password": password})
+        except Exception as e:
+            raise AuthError(str(e))
+
+    async def get_user(self, token):
+        try:
+            response = await self.db.auth.get_user(token)
+        except Exception:
+            return None
+        if not response or not response.user:
+            return None
+        return AuthUser(
+            id=str(response.user.id),
+            email=response.user.email,
+            role=response.user.role,
+            exp=unverified_exp(token),
+        )
+
+
+class SupabaseWishlists(WishlistRepository):
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def get(self, wishlist_id):
+        res = await self.db.read(
+            self.db.table("wishlists").select("*").eq("id", wishlist_id)
+        )
+        return res.data[0] if res.data else None
+
+    async def get_owned(self, wishlist_id, user_id):
+        res = await self.db.table("wishlists")\
+            .select("id, title, is_shared, user_id")\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return res.data[0] if res.data else None
+
+    async def owner(self, wishlist_id):
+        res = await self.db.read(
+            self.db.table("wishlists").select("user_id").eq("id", wishlist_id)
+        )
+        return str(res.data[0]["user_id"]) if res.data else None
+
+    async def list_for_user(self, user_id, columns="*"):
+        res = await self.db.table("wishlists")\
+            .select(columns)\
+            .eq("user_id", user_id)\
+            .order("created_at", desc=True)\
+            .execute()
+        return res.data or []
+
+    async def overview(self, user_id):
+        # Агрегаты лежат в самой строке wishlists и поддерживаются триггером
+        # (sql/006_wishlist_stats.sql) — один запрос на всю страницу
+        if "wishlists.item_count" not in self.db.missing_columns:
+            try:
+                return await self.list_for_user(
+                    user_id, f"{OVERVIEW_COLUMNS}, item_count, reserved_count, totals"
+                )
+            except APIError as e:
+                # 42703 — колонок нет: миграция не применена
+                if e.code != "42703":
+                    raise
+                self.db.missing_columns.add("wishlists.item_count")
+
+        # Без миграции: все предметы пользователя вторым запросом, агрегаты
+        # считаются здесь — два обращения на страницу, а не одно на список
+        wishlists = await self.list_for_user(user_id, OVERVIEW_COLUMNS)
+        if not wishlists:
+            return wishlists
+        items = await self.db.table("wishlist_items")\
+            .select("wishlist_id, price, currency, reserved_by")\
+            .in_("wishlist_id", [w["id"] for w in wishlists])\
+            .execute()
+        stats = {str(w["id"]): w for w in wishlists}
+        for w in wishlists:
+            w.update(empty_stats())
+        for item in items.data or []:
+            count_item(stats[str(item["wishlist_id"])], item)
+        return wishlists
+
+    async def list_public(self, after, limit):
+        # Keyset-пагинация по (created_at, id): страница любой глубины —
+        # один проход по индексу из sql/002_public_feed_index.sql
+        query = (
+            self.db.table("wishlists")
+            .select("id, title, description, created_at, user_id")
+            .eq("is_shared", True)
+        )
+        if after:
+            created_at, wishlist_id = after
+            query = query.or_(
+                f'created_at.lt."{created_at}",'
+                f'and(created_at.eq."{created_at}",id.lt."{wishlist_id}")'
+            )
+        res = await self.db.read(
+            query
+            .order("created_at", desc=True)
+            .order("id", desc=True)
+            .limit(limit)
+        )
+        return res.data or []
+
+    async def create(self, user_id, title, description):
+        res = await self.db.table("wishlists").insert({
+            "user_id": user_id,
+            "title": title,
+            "description": description
+        }).execute()
+        return res.data[0]
+
+    async def share(self, wishlist_id, user_id):
+        await self.db.table("wishlists")\
+            .update({"is_shared": True})\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+
+    async def toggle_share(self, wishlist_id, user_id):
+        # Один вызов: UPDATE ... SET is_shared = NOT is_shared WHERE id AND user_id
+        res = await self.db.call("toggle_wishlist_share", {
+            "p_wishlist_id": wishlist_id,
+            "p_user_id": user_id,
+        })
+        if res is not None:
+            return res.data
+
+        wl = await self.db.table("wishlists")\
+            .select("user_id, is_shared")\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+
+        if not wl.data:
+            return None
+
+        new_state = not wl.data[0]["is_shared"]
+
+        await self.db.table("wishlists")\
+            .update({"is_shared": new_state})\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return new_state
+
+    async def delete(self, wishlist_id, user_id):
+        # Владелец проверяется фильтром самого DELETE
+        # (каскадно удалятся все связанные записи: items, suggestions, holiday_wishlists и т.д.)
+        res = await self.db.table("wishlists")\
+            .delete()\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        return bool(res.data)
+
+
+class SupabaseItems(ItemRepository):
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def list(self, wishlist_id):
+        res = await self.db.read(
+            self.db.table("wishlist_items")
+            .select("*")
+            .eq("wishlist_id", wishlist_id)
+            .order("priority", desc=True)
+            .order("created_at")
+        )
+        return res.data or []
+
+    async def add(self, wishlist_id, fields):
+        res = await self.db.table("wishlist_items").insert({
+            "wishlist_id": wishlist_id,
+            **fields
+        }).execute()
+        return res.data[0]
+
+    async def add_many(self, wishlist_id, rows):
+        # Один INSERT на пачку; строки обратно не нужны (return=minimal)
+        if not rows:
+            return 0
+        await self.db.table("wishlist_items")\
+            .insert([{"wishlist_id": wishlist_id, **row} for row in rows], returning=ReturnMethod.minimal)\
+            .execute()
+        return len(rows)
+
+    async def pages(self, wishlist_id, page_size):
+        # Keyset по (created_at, id), как в ленте /public: каждая страница —
+        # отдельный запрос, в памяти не больше одной страницы
+        after = None
+        while True:
+            query = self.db.table("wishlist_items")\
+                .select("*")\
+                .eq("wishlist_id", wishlist_id)
+            if after:
+                created_at, item_id = after
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.gt."{item_id}")'
+                )
+            res = await query\
+                .order("created_at")\
+                .order("id")\
+                .limit(page_size)\
+                .execute()
+            page = res.data or []
+            if page:
+                yield page
+            if len(page) < page_size:
+                return
+            after = page[-1]["created_at"], page[-1]["id"]
+
+    async def reserve(self, item_id, wishlist_id, user_id):
+        # Один атомарный вызов (sql/003_reservations.sql)
+        res = await self.db.call("reserve_item", {
+            "p_item_id": item_id,
+            "p_wishlist_id": wishlist_id,
+            "p_user_id": user_id,
+        })
+        if res is not None:
+            return res.data
+
+        # Без RPC: условный UPDATE ... WHERE reserved_by IS NULL, второй запрос —
+        # только если бронь не удалась, чтобы объяснить почему
+        claimed = await self.db.table("wishlist_items")\
+            .update({
+                "reserved_by": user_id,
+                "reserved_at": datetime.now(timezone.utc).isoformat()
+            })\
+            .eq("id", item_id)\
+            .eq("wishlist_id", wishlist_id)\
+            .is_("reserved_by", "null")\
+            .execute()
+        if claimed.data:
+            return RESERVED
+
+        item = await self.db.table("wishlist_items")\
+            .select("reserved_by")\
+            .eq("id", item_id)\
+            .eq("wishlist_id", wishlist_id)\
+            .execute()
+        if not item.data:
+            return NOT_FOUND
+        if str(item.data[0]["reserved_by"]) == str(user_id):
+            return ALREADY_YOURS
+        return TAKEN
+
+    async def release(self, item_id, wishlist_id, user_id):
+        res = await self.db.call("release_item", {
+            "p_item_id": item_id,
+            "p_wishlist_id": wishlist_id,
+            "p_user_id": user_id,
+        })
+        if res is not None:
+            return res.data
+
+        item, wl = await asyncio.gather(
+            self.db.table("wishlist_items")
+            .select("id, wishlist_id, reserved_by")
+            .eq("id", item_id)
+            .eq("wishlist_id", wishlist_id)
+            .execute(),
+            self.db.table("wishlists")
+            .select("user_id")
+            .eq("id", wishlist_id)
+            .execute(),
+        )
+        if not item.data or not wl.data:
+            return NOT_FOUND
+
+        reserved_by = item.data[0]["reserved_by"]
+        if not reserved_by:
+            return NOT_RESERVED
+
+        is_owner = str(wl.data[0]["user_id"]) == str(user_id)
+        is_reserver = str(reserved_by) == str(user_id)
+        if not (is_owner or is_reserver):
+            return FORBIDDEN
+
+        # Снимаем только ту бронь, которую проверили
+        released = await self.db.table("wishlist_items")\
+            .update({
+                "reserved_by": None,
+                "reserved_at": None
+            })\
+            .eq("id", item_id)\
+            .eq("reserved_by", reserved_by)\
+            .execute()
+        return RELEASED if released.data else NOT_RESERVED
+
+
+class SupabaseSuggestions(SuggestionRepository):
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def add(self, wishlist_id, user_id, fields):
+        res = await self.db.table("wishlist_suggestions").insert({
+            "wishlist_id": wishlist_id,
+            "suggested_by": user_id,
+            **fields,
+            "status": "pending"
+        }).execute()
+        return res.data[0]
+
+    async def list_for_owner(self, wishlist_id, user_id):
+        # Проверка владельца встроена в сам запрос: список ищется по id и user_id,
+        # предложения приходят вложенными; * — вместе с version, если
+        # sql/008_wishlist_version.sql применена
+        res = await self.db.table("wishlists")\
+            .select("*, wishlist_suggestions(*)")\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .order("created_at", desc=True, foreign_table="wishlist_suggestions")\
+            .execute()
+        if not res.data:
+            return None
+        wishlist = res.data[0]
+        wishlist["wishlist_suggestions"] = wishlist.get("wishlist_suggestions") or []
+        return wishlist
+
+    async def accept(self, wishlist_id, suggestion_id):
+        sug = await self.db.table("wishlist_suggestions")\
+            .select("*")\
+            .eq("id", suggestion_id)\
+            .eq("wishlist_id", wishlist_id)\
+            .execute()
+
+        if not sug.data:
+            return None
+
+        suggestion = sug.data[0]
+
+        # Создаём новую запись в wishlist_items
+        # и обязательно сохраняем, кто предложил (suggested_by)
+        item = await self.db.table("wishlist_items").insert({
+            "wishlist_id": wishlist_id,
+            "title": suggestion["title"],
+            "description": suggestion.get("description"),
+            "url": suggestion.get("url"),
+            "price": suggestion.get("price"),
+            "currency": suggestion.get("currency", "€"),
+            "priority": 3,  # можно сделать динамическим
+            "suggested_by": suggestion["suggested_by"]  # ← кто предложил
+        }).execute()
+
+        # Меняем статус предложения на accepted
+        await self.db.table("wishlist_suggestions")\
+            .update({"status": "accepted"})\
+            .eq("id", suggestion_id)\
+            .eq("wishlist_id", wishlist_id)\
+            .execute()
+
+        return item.data[0]
+
+    async def reject(self, wishlist_id, suggestion_id):
+        await self.db.table("wishlist_suggestions")\
+            .update({"status": "rejected"})\
+            .eq("id", suggestion_id)\
+            .eq("wishlist_id", wishlist_id)\
+            .execute()
+
+    async def moderate(self, wishlist_id, user_id, accept, reject):
+        # Одна транзакция в базе: INSERT ... SELECT принятых и UPDATE статусов
+        # (sql/007_moderate_suggestions.sql)
+        accept = list(dict.fromkeys(accept))
+        reject = [s for s in dict.fromkeys(reject) if s not in accept]
+        res = await self.db.call("moderate_suggestions", {
+            "p_wishlist_id": wishlist_id,
+            "p_user_id": user_id,
+            "p_accept": accept,
+            "p_reject": reject,
+        })
+        if res is not None:
+            result = res.data
+            if not result["owner"]:
+                return None
+            return {k: result[k] for k in ("items", "accepted", "rejected")}
+
+        # Без RPC — тоже пачкой, но без общей транзакции. Принятые сначала
+        # «захватываются» условным UPDATE ... WHERE status = 'pending': из
+        # двух одновременных модераций предмет создаст только одна
+        owned = await self.db.table("wishlists")\
+            .select("id")\
+            .eq("id", wishlist_id)\
+            .eq("user_id", user_id)\
+            .execute()
+        if not owned.data:
+            return None
+
+        async def claim(ids, status):
+            if not ids:
+                return []
+            res = await self.db.table("wishlist_suggestions")\
+                .update({"status": status})\
+                .eq("wishlist_id", wishlist_id)\
+                .in_("id", ids)\
+                .eq("status", "pending")\
+                .execute()
+            return res.data or []
+
+        accepted, rejected = await asyncio.gather(claim(accept, "accepted"), claim(reject, "rejected"))
+
+        items = []
+        if accepted:
+            try:
+                res = await self.db.table("wishlist_items").insert([
+                    {
+                        "wishlist_id": wishlist_id,
+                        "title": s["title"],
+                        "description": s.get("description"),
+                        "url": s.get("url"),
+                        "price": s.get("price"),
+                        "currency": s.get("currency") or "€",
+                        "priority": 3,
+                        "suggested_by": s["suggested_by"],
+                    }
+                    for s in accepted
+                ]).execute()
+            except Exception:
+                # Предметы не созданы — возвращаем предложения в pending
+                await self.db.table("wishlist_suggestions")\
+                    .update({"status": "pending"})\
+                    .in_("id", [s["id"] for s in accepted])\
+                    .execute()
+                raise
+            items = res.data or []
+
+        return {
+            "items": items,
+            "accepted": [s["id"] for s in accepted],
+            "rejected": [s["id"] for s in rejected],
+        }
+
+
+class SupabaseHolidays(HolidayRepository):
+    def __init__(self, db: Database):
+        self.db = db
+
+    async def select(self, user_id, start, end, columns):
+        # Одним запросом: разовые праздники диапазона и все повторяющиеся,
+        # начатые до его конца; повторы разворачиваются здесь, а не в базе
+        if "holidays.recurrence" not in self.db.missing_columns:
+            try:
+                res = await self.db.read(
+                    self.db.table("holidays")
+                    .select(f"{columns}, recurrence")
+                    .eq("user_id", user_id)
+                    .lte("date", end.isoformat())
+                    .or_(f"date.gte.{start.isoformat()},recurrence.not.is.null")
+                    .order("date")
+                )
+                return expand(res.data or [], start, end)
+            except APIError as e:
+                # 42703 — колонки нет: sql/005_holiday_recurrence.sql не применена
+                if e.code != "42703":
+                    raise
+                self.db.missing_columns.add("holidays.recurrence")
+
+        res = await self.db.read(
+            self.db.table("holidays")
+            .select(columns)
+            .eq("user_id", user_id)
+            .gte("date", start.isoformat())
+            .lte("date", end.isoformat())
+            .order("date")
+        )
+        return res.data or []
+
+    async def in_range(self, user_id, start, end):
+        # Праздники вместе с привязанными вишлистами — одним запросом
+        holidays = await self.select(
+            user_id, start, end,
+            "id, title, date, description, holiday_wishlists(wishlist_id, wishlists(id, title))",
+        )
+        for h in holidays:
+            h["holiday_wishlists"] = h.get("holiday_wishlists") or []
+        return holidays
+
+    async def counts(self, user_id, start, end):
+        counts = {}
+        for h in await self.select(user_id, start, end, "date, holiday_wishlists(count)"):
+            counts[h["date"]] = counts.get(h["date"], 0) + h["holiday_wishlists"][0]["count"]
+        return counts
+
+    async def create(self, user_id, title, holiday_date, description, wishlist_ids, recurrence=None):
+        # Праздник и его связи — одна транзакция в базе (sql/001_holiday_links.sql);
+        # p_recurrence передаётся только для повторяющихся (sql/005_holiday_recurrence.sql)
+        params = {
+            "p_user_id": user_id,
+            "p_title": title,
+            "p_date": holiday_date.isoformat(),
+            "p_description": description,
+            "p_wishlist_ids": list(wishlist_ids),
+        }
+        if recurrence:
+            params["p_recurrence"] = recurrence
+        res = await self.db.call("create_holiday_with_links", params)
+        if res is not None:
+            return res.data
+
+        # Запасной путь без RPC: вставка праздника + одна многострочная вставка связей
+        row = {
+            "user_id": user_id,
+            "title": title,
+            "date": holiday_date.isoformat(),
+            "description": description
+        }
+        if recurrence:
+            row["recurrence"] = recurrence
+        holiday_res = await self.db.table("holidays").insert(row).execute()
+
+        holiday_id = holiday_res.data[0]["id"]
+
+        try:
+            await self.link(user_id, holiday_id, wishlist_ids)
+        except Exception:
+            # Не оставляем праздник с частью связей
+            await self.db.table("holidays").delete().eq("id", holiday_id).execute()
+            raise
+
+        return holiday_id
+
+    async def link(self, user_id, holiday_id, wishlist_ids):
+        # Массовая привязка вишлистов к празднику: только свои списки, один insert
+        wishlist_ids = list(dict.fromkeys(wishlist_ids))
+        if not wishlist_ids:
+            return []
+
+        res = await self.db.call("link_holiday_wishlists", {
+            "p_holiday_id": holiday_id,
+            "p_user_id": user_id,
+            "p_wishlist_ids": wishlist_ids,
+        })
+        if res is not None:
+            return res.data or []
+
+        valid_res = await self.db.table("wishlists")\
+            .select("id")\
+            .eq("user_id", user_id)\
+            .in_("id", wishlist_ids)\
+            .execute()
+
+        valid_ids = {w["id"] for w in valid_res.data or []}
+
+        for wid in wishlist_ids:
+            if wid not in valid_ids:
+                logger.warning("Пропущен недействительный wishlist_id: %s", wid)
+
+        rows = [
+            {"holiday_id": holiday_id, "wishlist_id": wid}
+            for wid in wishlist_ids if wid in valid_ids
+        ]
+        if rows:
+            await self.db.table("holiday_wishlists").insert(rows).execute()
+
+        return [row["wishlist_id"] for row in rows]
+
+
+class SupabaseStorage(Storage):
+    def __init__(self, db: Database):
+        self.db = db
+        self.auth = SupabaseAuth(db)
+        self.wishlists = SupabaseWishlists(db)
+        self.items = SupabaseItems(db)
+        self.suggestions = SupabaseSuggestions(db)
+        self.holidays = SupabaseHolidays(db)
+
+    async def connect(self):
+        await self.db.connect()
+
+    async def close(self):
+        await self.db.close()
+
+    async def warm(self):
+        await self.db.warm()
+
+    def stats(self):
+        return {
+            "singleflight": {"calls": self.db.flights.calls, "shared": self.db.flights.shared},
+            "missing_rpcs": sorted(self.db.missing_rpcs),
+        }
@@ -0,0 +1,106 @@
+"""Число обращений к бэкенду у /calendar не зависит от числа праздников.
+
+Приложение работает с заменой Supabase из bench/ (в этом же процессе, без
+задержки); calls замены — все запросы к PostgREST и Auth.
+"""
+
+import socket
+import threading
+import time
+from datetime import date, timedelta
+
+import httpx
+import jwt
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+import main
+from bench.fake_supabase import FakeSupabase
+from settings import Settings
+
+
+JWT_SECRET = "test-jwt-secret-test-jwt-secret!!"
+PASSWORD = "test-password"
+# Обращений на /calendar после прогрева (с миграциями из sql/ и без):
+# праздники месяца вместе со связями — один вложенный select
+ROUND_TRIPS = {True: 1, False: 1}
+
+
+@pytest.fixture(params=[True, False], ids=["rpc", "no-rpc"])
+def fake(request):
+    # no-rpc — бэкенд без функций и колонок из sql/ (запасные пути)
+    fake = FakeSupabase(JWT_SECRET, rpcs=request.param)
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    host, port = sock.getsockname()
+    server = uvicorn.Server(uvicorn.Config(fake.app, log_level="warning", lifespan="off"))
+    thread = threading.Thread(target=server.run, kwargs={"sockets": [sock]}, daemon=True)
+    thread.start()
+    fake.url = f"http://{host}:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(f"{fake.url}/__bench/calls")
+            break
+        except httpx.TransportError:
+            time.sleep(0.01)
+    yield fake
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def client(fake):
+    settings = Settings(
+        storage_backend="supabase",
+        supabase_url=fake.url,
+        supabase_anon_key=jwt.encode({"role": "anon"}, JWT_SECRET, algorithm="HS256"),
+        supabase_jwt_secret=JWT_SECRET,
+        template_cache_dir="",
+        log_level="WARNING",
+    )
+    with TestClient(main.create_app(settings)) as client:
+        yield client
+
+
+def add_holidays(fake: FakeSupabase, user: dict, wishlists: list[dict], count: int, start: int) -> None:
+    first_day = date.today().replace(day=1)
+    for n in range(start, start + count):
+        holiday = fake.insert("holidays", {
+            "user_id": user["id"],
+            "title": f"Праздник {n}",
+            "date": (first_day + timedelta(days=n % 28)).isoformat(),
+        })
+        for wishlist in wishlists[n % len(wishlists):][:2]:
+            fake.insert("holiday_wishlists", {"holiday_id": holiday["id"], "wishlist_id": wishlist["id"]})
+
+
+def calendar_calls(fake: FakeSupabase, client: TestClient) -> int:
+    today = date.today()
+    before = len(fake.calls)
+    res = client.get(f"/calendar?month={today.month}&year={today.year}")
+    assert res.status_code == 200
+    return len(fake.calls) - before
+
+
+def test_calendar_calls_do_not_grow_with_holidays(fake, client):
+    user = fake.add_user("owner@test.local", PASSWORD)
+    wishlists = [
+        fake.insert("wishlists", {"user_id": user["id"], "title": f"Список {n}"})
+        for n in range(5)
+    ]
+    res = client.post("/login", data={"email": user["email"], "password": PASSWORD}, follow_redirects=False)
+    assert res.status_code == 303
+
+    # Прогрев: без миграций первый запрос ещё и узнаёт, каких колонок нет
+    calendar_calls(fake, client)
+
+    add_holidays(fake, user, wishlists, 1, start=0)
+    one = calendar_calls(fake, client)
+    add_holidays(fake, user, wishlists, 29, start=1)
+    thirty = calendar_calls(fake, client)
+
+    # Ноль тоже не годится: значит, календарь не дошёл до бэкенда или его скрыл кэш
+    assert one == ROUND_TRIPS[fake.rpcs]
+    assert thirty == one
+    assert "Праздник 29" in client.get(f"/calendar?month={date.today().month}&year={date.today().year}").text